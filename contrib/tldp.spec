@@ -28,7 +28,6 @@ Requires: docbook-dsssl-stylesheets
 Requires: docbook-xsl-stylesheets
 Requires: docbook5-xsl-stylesheets
 Requires: libxslt-tools
-Requires: python-networkx
 
 %description
 tldp - automatic publishing tool for DocBook, Linuxdoc and Asciidoc
@@ -21,7 +21,7 @@ setup(
     long_description=readme,
     packages=['tldp', 'tldp/doctypes'],
     test_suite='nose.collector',
-    install_requires=['networkx', 'nose'],
+    install_requires=['nose'],
     include_package_data=True,
     package_data={'extras': ['extras/collateindex.pl'],
                   'extras/xsl': glob.glob('extras/xsl/*.xsl'),
@@ -0,0 +1,152 @@
+# -*- coding: utf8 -*-
+#
+# Copyright (c) 2016 Linux Documentation Project
+
+from __future__ import absolute_import, division, print_function
+from __future__ import unicode_literals
+
+import os
+import sys
+import time
+import subprocess
+import tracemalloc
+
+from tldptesttools import TestToolsFilesystem
+
+# -- Test Data
+import example
+
+# -- SUT
+from tldp.inventory import Inventory
+from tldp.utils import md5file
+
+opj = os.path.join
+
+
+def timed(f, *args, **kwargs):
+    s = time.time()
+    result = f(*args, **kwargs)
+    return time.time() - s, result
+
+
+class TestBenchmarkScanning(TestToolsFilesystem):
+
+    documents = 3000
+    padding = 64 * 1024
+
+    def makeCorpus(self):
+        '''create a synthetic, published corpus of single-file documents'''
+        ex = example.ex_docbook4xml
+        reldir, absdir = self.adddir('corpus')
+        _, pubdir = self.adddir('pubdir')
+        filler = 'x' * self.padding
+        for x in range(self.documents):
+            stem = 'Synthetic-%05d-HOWTO' % (x,)
+            with open(opj(absdir, stem + '.xml'), 'w') as f:
+                f.write(ex.content)
+                f.write('<!-- %s -->' % (filler,))
+            os.mkdir(opj(pubdir, stem))
+        return pubdir, absdir
+
+    def scan(self, pubdir, corpus, **kwargs):
+        '''scan and hash the entire corpus'''
+        inv = Inventory(pubdir, [corpus], **kwargs)
+        inv.stale
+        return inv.source
+
+    def test_scan_hashjobs_speedup(self):
+        pubdir, corpus = self.makeCorpus()
+        self.scan(pubdir, corpus)  # -- warm the page cache
+        serial_t, serial = timed(self.scan, pubdir, corpus)
+        jobs = max(2, min(8, os.cpu_count() or 1))
+        threaded_t, threaded = timed(self.scan, pubdir, corpus,
+                                     scanjobs=jobs, hashjobs=jobs)
+        print('\n%d documents: serial %.3fs, --scan-jobs/--hash-jobs %d '
+              '%.3fs (x%.2f)' %
+              (self.documents, serial_t, jobs, threaded_t,
+               serial_t / threaded_t))
+        self.assertEqual(serial.keys(), threaded.keys())
+        for stem, doc in serial.items():
+            self.assertEqual(doc.md5sums, threaded[stem].md5sums)
+
+
+class TestBenchmarkHashingMemory(TestToolsFilesystem):
+
+    size = 256 * 1024 * 1024
+
+    def makeLargeFile(self):
+        fname = opj(self.tempdir, 'large-figure.pdf')
+        block = os.urandom(1024 * 1024)
+        with open(fname, 'wb') as f:
+            for _ in range(self.size // len(block)):
+                f.write(block)
+        return fname
+
+    def peak(self, f, *args, **kwargs):
+        tracemalloc.start()
+        try:
+            s = time.time()
+            result = f(*args, **kwargs)
+            elapsed = time.time() - s
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return peak, elapsed, result
+
+    def test_md5file_memory_flat(self):
+        fname = self.makeLargeFile()
+        streamed = self.peak(md5file, fname)
+        mapped = self.peak(md5file, fname, mmapsize=1)
+        print('\n%d MiB file: streaming peak %d KiB (%.3fs), '
+              'mmap peak %d KiB (%.3fs)' %
+              (self.size // 2**20, streamed[0] // 1024, streamed[1],
+               mapped[0] // 1024, mapped[1]))
+        self.assertEqual(streamed[2], mapped[2])
+        self.assertLess(streamed[0], 1024 * 1024)
+        self.assertLess(mapped[0], 1024 * 1024)
+
+
+class TestBenchmarkStartup(TestToolsFilesystem):
+
+    runs = 7
+    ldptool = ('import sys; from tldp.driver import run; '
+               'sys.exit(run(sys.argv[1:]))')
+
+    def median(self, program, *args):
+        env = dict(os.environ, XDG_CACHE_HOME=opj(self.tempdir, 'cache'))
+        cmd = [sys.executable, '-c', program] + list(args)
+        walls = list()
+        for _ in range(self.runs):
+            s = time.time()
+            subprocess.check_call(cmd, env=env, stdout=subprocess.DEVNULL)
+            walls.append(time.time() - s)
+        return sorted(walls)[self.runs // 2]
+
+    def test_startup(self):
+        _, sourcedir = self.adddir('sources')
+        _, pubdir = self.adddir('pubdir')
+        interpreter = self.median('pass')
+        invocations = [('--version',), ('--doctypes',),
+                       ('--summary', '--sourcedir', sourcedir,
+                        '--pubdir', pubdir)]
+        for args in invocations:
+            elapsed = self.median(self.ldptool, *args)
+            print('\nldptool %s: %.1fms (interpreter alone %.1fms)' %
+                  (args[0], elapsed * 1000, interpreter * 1000))
+            self.assertLess(elapsed - interpreter, 0.25)
+        # -- nothing looked for any tools, so the tool cache is untouched
+        #
+        toolcache = opj(self.tempdir, 'cache', 'ldptool', 'tools.json')
+        self.assertFalse(os.path.exists(toolcache))
+
+    def test_lazy_imports(self):
+        lazy = ['urllib.request', 'html.parser', 'tldp.htmltext', 'sqlite3',
+                'tldp.buildhistory']
+        program = ('import sys; import tldp.driver; '
+                   'print(" ".join(x for x in %r if x in sys.modules))' %
+                   (lazy,))
+        output = subprocess.check_output([sys.executable, '-c', program])
+        self.assertEqual('', output.decode('ascii').strip())
+
+#
+# -- end of file
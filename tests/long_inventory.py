@@ -16,6 +16,7 @@ import example
 
 # -- SUT
 import tldp.driver
+from tldp.manifest import MANIFEST
 
 opb = os.path.basename
 opj = os.path.join
@@ -44,11 +45,13 @@ class TestInventoryHandling(TestInventoryBase):
         self.assertEqual(exitcode, os.EX_OK)
         inv = tldp.inventory.Inventory(c.pubdir, c.sourcedir)
         self.assertEqual(1, len(inv.published.keys()))
+        self.assertTrue(os.path.isfile(opj(c.pubdir, MANIFEST)))
 
         # -- remove the generated MD5SUMS file, ensure rebuild occurs
         #
         doc = inv.published.values().pop()
         os.unlink(doc.output.MD5SUMS)
+        doc.output.refresh()
         self.assertEqual(dict(), doc.output.md5sums)
         inv = tldp.inventory.Inventory(c.pubdir, c.sourcedir)
         self.assertEqual(1, len(inv.stale.keys()))
@@ -57,6 +60,7 @@ class TestInventoryHandling(TestInventoryBase):
         exitcode = tldp.driver.run(argv)
         inv = tldp.inventory.Inventory(c.pubdir, c.sourcedir)
         self.assertEqual(1, len(inv.published.keys()))
+        self.assertTrue(os.path.isfile(opj(c.pubdir, MANIFEST)))
 
         # -- remove a source file, add a source file, change a source file
         #
@@ -86,6 +90,7 @@ class TestInventoryHandling(TestInventoryBase):
         self.assertEqual(exitcode, os.EX_OK)
         inv = tldp.inventory.Inventory(c.pubdir, c.sourcedir)
         self.assertEqual(1, len(inv.published.keys()))
+        self.assertTrue(os.path.isfile(opj(c.pubdir, MANIFEST)))
 
         # -- remove a file (known extraneous file, build should succeed)
 
@@ -0,0 +1,94 @@
+# -*- coding: utf8 -*-
+#
+# Copyright (c) 2016 Linux Documentation Project
+
+from __future__ import absolute_import, division, print_function
+from __future__ import unicode_literals
+
+import os
+import time
+import errno
+import codecs
+from unittest import mock
+
+from tldptesttools import TestToolsFilesystem
+
+# -- SUT
+from tldp.artifactcache import ArtifactCache, fingerprintkey
+
+opj = os.path.join
+
+
+class TestArtifactCache(TestToolsFilesystem):
+
+    def addoutputs(self, stem, size=10):
+        reldir, absdir = self.adddir(opj('outputs', stem))
+        self.adddir(opj('outputs', stem, 'logs'))
+        self.adddir(opj('outputs', stem, 'images'))
+        for name in (stem + '.html', opj('images', 'logo.png'),
+                     opj('logs', 'build.log')):
+            with codecs.open(opj(absdir, name), 'w', encoding='utf-8') as f:
+                f.write('x' * size)
+        return absdir
+
+    def cache(self, maxsize=10**6):
+        return ArtifactCache(opj(self.tempdir, 'cache'), maxsize)
+
+    def test_fingerprintkey(self):
+        a = fingerprintkey(dict(stem='A', md5sums={'a.xml': '0'}))
+        b = fingerprintkey(dict(md5sums={'a.xml': '0'}, stem='A'))
+        c = fingerprintkey(dict(md5sums={'a.xml': '1'}, stem='A'))
+        self.assertEqual(a, b)
+        self.assertNotEqual(a, c)
+
+    def test_miss(self):
+        cache = self.cache()
+        self.assertFalse(cache.restore('0' * 64, self.tempdir))
+        self.assertEqual(list(), cache.entries())
+
+    def test_roundtrip(self):
+        cache = self.cache()
+        src = self.addoutputs('A-HOWTO')
+        self.assertTrue(cache.store('a', src, exclude=[opj(src, 'logs')],
+                                    stem='A-HOWTO'))
+        self.assertFalse(cache.store('a', src))
+        _, dst = self.adddir('restored')
+        self.assertTrue(cache.restore('a', dst))
+        self.assertTrue(os.path.isfile(opj(dst, 'A-HOWTO.html')))
+        self.assertTrue(os.path.isfile(opj(dst, 'images', 'logo.png')))
+        self.assertFalse(os.path.exists(opj(dst, 'logs')))
+        self.assertEqual(os.stat(opj(src, 'A-HOWTO.html')).st_ino,
+                         os.stat(opj(dst, 'A-HOWTO.html')).st_ino)
+        [(key, meta, _)] = cache.entries()
+        self.assertEqual(('a', 'A-HOWTO', 20, 1),
+                         (key, meta['stem'], meta['size'], meta['hits']))
+
+    def test_copy_reported_once(self):
+        cache = self.cache()
+        src = self.addoutputs('A-HOWTO')
+        _, dst = self.adddir('restored')
+        crossdevice = OSError(errno.EXDEV, os.strerror(errno.EXDEV))
+        with mock.patch('os.link', side_effect=crossdevice):
+            with self.assertLogs('tldp.artifactcache') as logs:
+                self.assertTrue(cache.store('a', src, stem='A-HOWTO'))
+                self.assertTrue(cache.restore('a', dst))
+        self.assertEqual(1, len(logs.output))
+        self.assertTrue(os.path.isfile(opj(dst, 'A-HOWTO.html')))
+        self.assertNotEqual(os.stat(opj(src, 'A-HOWTO.html')).st_ino,
+                            os.stat(opj(dst, 'A-HOWTO.html')).st_ino)
+
+    def test_trim_least_recently_used(self):
+        cache = self.cache(maxsize=50)
+        for key in ('a', 'b', 'c'):
+            src = self.addoutputs(key)
+            cache.store(key, src, exclude=[opj(src, 'logs')])
+        past = time.time() - 3600
+        for key, when in (('a', past + 20), ('b', past), ('c', past + 10)):
+            os.utime(opj(cache.dirname, key, 'artifact.json'), (when, when))
+        self.assertEqual(1, cache.trim())
+        self.assertEqual(['a', 'c'], [x[0] for x in cache.entries()])
+        cache.maxsize = 0
+        self.assertEqual(2, cache.trim())
+
+#
+# -- end of file
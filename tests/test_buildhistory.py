@@ -0,0 +1,88 @@
+# -*- coding: utf8 -*-
+#
+# Copyright (c) 2016 Linux Documentation Project
+
+from __future__ import absolute_import, division, print_function
+from __future__ import unicode_literals
+
+import os
+
+from tldptesttools import TestToolsFilesystem
+
+# -- SUT
+from tldp.buildhistory import BuildHistory
+from tldp.doctypes.common import Timing
+
+opj = os.path.join
+
+
+class TestBuildHistory(TestToolsFilesystem):
+
+    def history(self):
+        return BuildHistory(opj(self.tempdir, 'history.sqlite'))
+
+    def addrun(self, builds):
+        history = self.history()
+        for stem, wall, status in builds:
+            steps = [Timing('make_html', wall / 2, 0.1, status)]
+            history.record(stem, 'Linuxdoc', Timing(stem, wall, 0.5, status),
+                           steps)
+        history.close()
+
+    def test_empty(self):
+        history = self.history()
+        self.assertEqual(dict(), history.estimates())
+        self.assertEqual(list(), history.documents())
+        history.close()
+
+    def test_estimates_across_runs(self):
+        self.addrun([('A-HOWTO', 1.0, 0), ('B-HOWTO', 5.0, 0)])
+        self.addrun([('A-HOWTO', 3.0, 0), ('C-HOWTO', 9.0, 1)])
+        history = self.history()
+        self.assertEqual(dict([('A-HOWTO', 2.0), ('B-HOWTO', 5.0)]),
+                         history.estimates())
+        documents = history.documents()
+        self.assertEqual(['B-HOWTO', 'A-HOWTO'], [x.name for x in documents])
+        self.assertEqual([1.0, 3.0], documents[1].walls)
+        self.assertEqual(3.0, documents[1].last)
+        steps = history.steps()
+        self.assertEqual(['B-HOWTO.make_html', 'A-HOWTO.make_html'],
+                         [x.name for x in steps])
+        history.close()
+
+    def test_recent_runs_only(self):
+        for wall in (100.0, 1.0, 2.0, 3.0):
+            self.addrun([('A-HOWTO', wall, 0)])
+        history = self.history()
+        self.assertEqual(dict([('A-HOWTO', 2.0)]), history.estimates(runs=3))
+        history.close()
+
+    def test_old_runs_forgotten(self):
+        for wall in (1.0, 2.0, 3.0):
+            history = self.history()
+            history.keep = 2
+            history.record('A-HOWTO', 'Linuxdoc', Timing('A', wall, 0, 0), [])
+            history.close()
+        history = self.history()
+        self.assertEqual([2.0, 3.0], history.documents()[0].walls)
+        history.close()
+
+    def test_backends(self):
+        history = self.history()
+        self.assertIsNone(history.backend('A-HOWTO', 'pdf', 'k1'))
+        history.recordbackend('A-HOWTO', 'pdf', 'k1', 'dblatex')
+        history.recordbackend('B-HOWTO', 'pdf', 'k2', 'fop')
+        history.close()
+        history = self.history()
+        self.assertEqual('dblatex', history.backend('A-HOWTO', 'pdf', 'k1'))
+        self.assertIsNone(history.backend('A-HOWTO', 'pdf', 'k2'))
+        self.assertEqual(dict(pdf='fop'), history.backends('B-HOWTO'))
+        self.assertEqual(1, history.forgetbackends(['A-HOWTO', 'C-HOWTO']))
+        history.close()
+        history = self.history()
+        self.assertEqual(dict(), history.backends('A-HOWTO'))
+        self.assertEqual(dict(pdf='fop'), history.backends('B-HOWTO'))
+        history.close()
+
+#
+# -- end of file
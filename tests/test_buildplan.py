@@ -0,0 +1,146 @@
+# -*- coding: utf8 -*-
+#
+# Copyright (c) 2016 Linux Documentation Project
+
+from __future__ import absolute_import, division, print_function
+from __future__ import unicode_literals
+
+import io
+import os
+import codecs
+import unittest
+import subprocess
+from argparse import Namespace
+
+from tldptesttools import TestToolsFilesystem
+from tldp.utils import which
+
+# -- Test Data
+import example
+
+# -- SUT
+from tldp.buildplan import ninja, makefile, shellcommand, PlanStep
+from tldp.doctypes.common import BaseDoctype, depends
+from tldp.sources import SourceDocument
+from tldp.outputs import OutputDirectory
+
+opj = os.path.join
+
+
+class Diamond(BaseDoctype):
+    '''a -> (b, c) -> d, each step appending to a file in the output dir'''
+    required = dict()
+
+    def a(self, **kwargs):
+        return self.shellscript('echo a >> "{output.dirname}/a.txt"', **kwargs)
+
+    @depends(a)
+    def b(self, **kwargs):
+        return self.shellscript('cat a.txt > b.txt', **kwargs)
+
+    @depends(a)
+    def c(self, **kwargs):
+        return self.shellscript('''cat \\
+                                     a.txt \\
+                                     > c.txt''', **kwargs)
+
+    @depends(b, c)
+    def d(self, **kwargs):
+        return self.shellscript('cat b.txt c.txt > "$(basename d.txt)"',
+                                **kwargs)
+
+
+class TestBuildPlan(TestToolsFilesystem):
+
+    def plan(self, fmt):
+        stem = 'Frobnitz-HOWTO'
+        reldir, absdir = self.adddir(stem)
+        _, fname = self.addfile(reldir, example.ex_linuxdoc.filename,
+                                stem=stem)
+        source = SourceDocument(fname)
+        _, pubdir = self.adddir('pubdir')
+        output = OutputDirectory.fromsource(pubdir, source)
+        config = Namespace(script=True, build=False, resources=['images'],
+                           script_format=fmt)
+        runner = Diamond(source=source, output=output, config=config)
+        self.assertTrue(runner.generate())
+        return runner.buildplan()
+
+    def test_shellcommand(self):
+        scripts = ['# comment\nif true; then\n  echo \\\n    "$PWD"\nfi',
+                   'cat <<EOF\nwabbit\nEOF',
+                   "for x in 'a b'; do echo \"$x\"; done"]
+        step = PlanStep('x', [], self.tempdir, scripts)
+        command = shellcommand(step)
+        self.assertFalse('\n' in command)
+        # -- /bin/sh, as ninja uses; a Makefile recipe runs in bash
+        output = subprocess.check_output(command, shell=True)
+        expected = '%s\nwabbit\na b\n' % (self.tempdir,)
+        self.assertEqual(expected, output.decode('utf-8'))
+        self.assertEqual('', shellcommand(PlanStep('x', [], '/tmp', [])))
+
+    def test_plan(self):
+        plan = self.plan('make')
+        self.assertEqual('Frobnitz-HOWTO', plan.stem)
+        steps = dict((x.name, x) for x in plan.steps)
+        self.assertEqual('prepare', plan.steps[0].name)
+        self.assertEqual(set(['prepare', 'a', 'b', 'c', 'd']), set(steps))
+        self.assertEqual(['prepare'], steps['a'].depends)
+        self.assertEqual(['b', 'c'], sorted(steps['d'].depends))
+        self.assertTrue(plan.inputs[0].endswith('Frobnitz-HOWTO.sgml'))
+        self.assertEqual(opj(self.tempdir, 'ldptool-build', 'stamps',
+                             'Frobnitz-HOWTO'), plan.stampdir)
+        self.assertEqual(5, len(plan.outputs))
+
+    def test_ninja(self):
+        plan = self.plan('ninja')
+        stdout = io.StringIO()
+        ninja([plan], file=stdout)
+        data = stdout.getvalue()
+        self.assertTrue('rule ldpstep' in data)
+        self.assertTrue('build Frobnitz-HOWTO: phony ' in data)
+        self.assertTrue('"$$(basename d.txt)"' in data)
+        prepare = [x for x in data.splitlines() if 'prepare.stamp ' in x]
+        self.assertTrue(all(x in prepare[0] for x in plan.outputs))
+        self.assertTrue(data.rstrip().endswith('default Frobnitz-HOWTO'))
+
+    @unittest.skipUnless(which('make'), 'requires make')
+    def test_makefile_runs_incrementally(self):
+        plan = self.plan('make')
+        fname = opj(self.tempdir, 'Makefile')
+        with codecs.open(fname, 'w', encoding='utf-8') as f:
+            makefile([plan], file=f)
+        for x in range(2):
+            subprocess.check_call(['make', '--silent', '-j', '2', '-f', fname],
+                                  cwd=self.tempdir)
+        dirname = opj(self.tempdir, 'pubdir', 'Frobnitz-HOWTO')
+        with codecs.open(opj(dirname, 'd.txt'), encoding='utf-8') as f:
+            self.assertEqual('a\na\n', f.read())
+
+    @unittest.skipUnless(which('make'), 'requires make')
+    def test_makefile_rebuilds_missing_output(self):
+        plan = self.plan('make')
+        fname = opj(self.tempdir, 'Makefile')
+        with codecs.open(fname, 'w', encoding='utf-8') as f:
+            makefile([plan], file=f)
+        make = ['make', '--silent', '-f', fname]
+        subprocess.check_call(make, cwd=self.tempdir)
+        logdir = opj(self.tempdir, 'pubdir', 'Frobnitz-HOWTO',
+                     'tldp-document-build-logs')
+        self.assertEqual([], os.listdir(logdir))
+        self.assertTrue(os.path.isfile(opj(plan.stampdir, 'd.stamp')))
+        # -- as if the steps had written the outputs
+        for name in plan.outputs:
+            with open(name, 'w'):
+                pass
+        question = make + ['--question']
+        self.assertEqual(0, subprocess.call(question, cwd=self.tempdir))
+        os.unlink(plan.outputs[0])
+        self.assertEqual(1, subprocess.call(question, cwd=self.tempdir))
+        # -- prepare clears the output directory; all the steps run again
+        subprocess.check_call(make, cwd=self.tempdir)
+        dirname = opj(self.tempdir, 'pubdir', 'Frobnitz-HOWTO')
+        self.assertTrue(os.path.isfile(opj(dirname, 'd.txt')))
+
+#
+# -- end of file
@@ -0,0 +1,151 @@
+# -*- coding: utf8 -*-
+#
+# Copyright (c) 2016 Linux Documentation Project
+
+from __future__ import absolute_import, division, print_function
+from __future__ import unicode_literals
+
+import os
+import codecs
+import unittest
+import subprocess
+from argparse import Namespace
+
+from tldptesttools import TestToolsFilesystem
+from tldp.utils import which
+
+# -- SUT
+from tldp.catalog import XMLCatalog
+import tldp.driver
+
+opj = os.path.join
+
+xslprefix = 'http://docbook.sourceforge.net/release/xsl/current/'
+dtdprefix = 'http://www.oasis-open.org/docbook/xml/4.5/'
+
+dtd = '''<!ELEMENT article (para*)>
+<!ELEMENT para (#PCDATA)>
+'''
+
+document = '''<?xml version="1.0"?>
+<!DOCTYPE article PUBLIC "-//OASIS//DTD DocBook XML V4.5//EN"
+  "http://www.oasis-open.org/docbook/xml/4.5/docbookx.dtd">
+<article><para>Frobnitz</para></article>
+'''
+
+stylesheet = '''<?xml version="1.0"?>
+<xsl:stylesheet version="1.0"
+    xmlns:xsl="http://www.w3.org/1999/XSL/Transform">
+<xsl:import href="http://docbook.sourceforge.net/release/xsl/current/fo/docbook.xsl"/>
+<xsl:import href="http://example.org/wabbit.xsl"/>
+</xsl:stylesheet>
+'''
+
+
+class FakeDoctype(object):
+    required = {'fake_xslprint': None, 'fake_tool': None}
+
+
+class TestXMLCatalog(TestToolsFilesystem):
+
+    def setUp(self):
+        super(TestXMLCatalog, self).setUp()
+        self.xmlcatalogfiles = os.environ.get('XML_CATALOG_FILES')
+        _, self.system = self.adddir('system')
+        _, self.mirror = self.adddir('mirror')
+        self.rewrites = [(xslprefix, [opj(self.system, 'xsl')]),
+                         (dtdprefix, [opj(self.system, 'dtd')])]
+        self.writefile(opj(self.system, 'xsl', 'fo', 'docbook.xsl'), '')
+        self.writefile(opj(self.system, 'dtd', 'docbookx.dtd'), dtd)
+
+    def tearDown(self):
+        if self.xmlcatalogfiles is None:
+            os.environ.pop('XML_CATALOG_FILES', None)
+        else:
+            os.environ['XML_CATALOG_FILES'] = self.xmlcatalogfiles
+        super(TestXMLCatalog, self).tearDown()
+
+    def writefile(self, fname, content):
+        if not os.path.isdir(os.path.dirname(fname)):
+            os.makedirs(os.path.dirname(fname))
+        with codecs.open(fname, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return fname
+
+    def catalog(self, mirrors=()):
+        return XMLCatalog(opj(self.tempdir, 'cache', 'catalog.xml'),
+                          mirrors=mirrors, rewrites=self.rewrites)
+
+    def test_resolve(self):
+        catalog = self.catalog()
+        self.assertEqual(opj(self.system, 'xsl', 'fo', 'docbook.xsl'),
+                         catalog.resolve(xslprefix + 'fo/docbook.xsl'))
+        self.assertIsNone(catalog.resolve(xslprefix + 'fo/wabbit.xsl'))
+        self.assertIsNone(catalog.resolve('http://example.org/wabbit.xsl'))
+
+    def test_mirror_first(self):
+        fname = opj(self.mirror, 'docbook.sourceforge.net', 'release', 'xsl',
+                    'current', 'fo', 'docbook.xsl')
+        self.writefile(fname, '')
+        catalog = self.catalog(mirrors=[self.mirror])
+        self.assertEqual(fname, catalog.resolve(xslprefix + 'fo/docbook.xsl'))
+
+    def test_unresolvable(self):
+        xsl = self.writefile(opj(self.tempdir, 'print.xsl'), stylesheet)
+        doc = self.writefile(opj(self.tempdir, 'doc.xml'), document)
+        catalog = self.catalog()
+        self.assertEqual({'http://example.org/wabbit.xsl': xsl},
+                         catalog.unresolvable([xsl, doc]))
+        self.rewrites.pop()
+        catalog = self.catalog()
+        self.assertEqual(doc, catalog.unresolvable([xsl, doc])[dtdprefix +
+                                                               'docbookx.dtd'])
+
+    @unittest.skipUnless(which('xmllint'), 'requires xmllint')
+    def test_xmllint_offline(self):
+        doc = self.writefile(opj(self.tempdir, 'doc.xml'), document)
+        catalog = self.catalog()
+        self.assertTrue(catalog.save())
+        env = dict(os.environ)
+        env['XML_CATALOG_FILES'] = catalog.catalogfiles(environ=dict())
+        result = subprocess.call([which('xmllint'), '--nonet', '--noout',
+                                  '--valid', doc], env=env)
+        self.assertEqual(0, result)
+
+    def test_setup(self):
+        fname = opj(self.mirror, 'docbook.sourceforge.net', 'release', 'xsl',
+                    'current', 'fo', 'docbook.xsl')
+        self.writefile(fname, '')
+        xsl = self.writefile(opj(self.tempdir, 'print.xsl'), stylesheet)
+        doc = self.writefile(opj(self.tempdir, 'doc.xml'), document)
+        config = Namespace(xml_catalog=opj(self.tempdir, 'catalog.xml'),
+                           xml_mirror=[self.mirror],
+                           fake_xslprint=xslprefix + 'fo/docbook.xsl',
+                           fake_tool=xsl)
+        docs = [Namespace(doctype=FakeDoctype, filename=doc)]
+        with self.assertLogs('tldp.driver', level='WARNING') as logs:
+            catalog = tldp.driver.xmlcatalog_setup(config, docs)
+        self.assertIsNotNone(catalog)
+        self.assertEqual(fname, config.fake_xslprint)
+        self.assertEqual(xsl, config.fake_tool)
+        self.assertTrue(os.path.isfile(config.xml_catalog))
+        self.assertTrue(os.environ['XML_CATALOG_FILES'].startswith(
+            'file://' + config.xml_catalog))
+        warnings = '\n'.join(logs.output)
+        self.assertTrue('http://example.org/wabbit.xsl' in warnings)
+        self.assertTrue(config.nonet)
+
+    def test_setup_network_allowed(self):
+        config = Namespace(xml_catalog=opj(self.tempdir, 'catalog.xml'),
+                           nonet=False)
+        self.assertIsNotNone(tldp.driver.xmlcatalog_setup(config, []))
+        self.assertFalse(config.nonet)
+
+    def test_setup_disabled(self):
+        config = Namespace(no_xml_catalog=True,
+                           xml_catalog=opj(self.tempdir, 'catalog.xml'))
+        self.assertIsNone(tldp.driver.xmlcatalog_setup(config, []))
+        self.assertFalse(os.path.exists(config.xml_catalog))
+
+#
+# -- end of file
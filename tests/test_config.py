@@ -11,6 +11,7 @@ from argparse import Namespace
 
 # -- SUT
 from tldp.config import collectconfiguration
+from tldp.utils import LazyDefault
 
 
 class TestConfigWorks(unittest.TestCase):
@@ -31,5 +32,13 @@ class TestConfigWorks(unittest.TestCase):
         e = ecm.exception
         self.assertTrue("/path/to/nonexistent/directory" in e.args[0])
 
+    def test_tools_not_probed(self):
+        config, args = collectconfiguration('tag', [])
+        self.assertIsInstance(config.docbook4xml_xsltproc, LazyDefault)
+        self.assertIsInstance(config.docbook4xml_xslchunk, LazyDefault)
+        argv = ['--docbook4xml-xsltproc', '/bin/sh']
+        config, args = collectconfiguration('tag', argv)
+        self.assertEqual('/bin/sh', config.docbook4xml_xsltproc)
+
 #
 # -- end of file
@@ -0,0 +1,518 @@
+# -*- coding: utf8 -*-
+#
+# Copyright (c) 2016 Linux Documentation Project
+
+from __future__ import absolute_import, division, print_function
+from __future__ import unicode_literals
+
+import io
+import os
+import codecs
+import shutil
+import threading
+import unittest
+from argparse import Namespace
+from concurrent.futures import ThreadPoolExecutor
+
+from tldptesttools import TestToolsFilesystem
+
+# -- Test Data
+import example
+
+# -- SUT
+from tldp.doctypes.common import BaseDoctype, depends, Command, commandline
+from tldp.sources import SourceDocument
+from tldp.outputs import OutputDirectory
+from tldp.artifactcache import ArtifactCache
+from tldp.buildhistory import BuildHistory
+from tldp.catalog import XMLCatalog
+
+opj = os.path.join
+
+
+class FanOut(BaseDoctype):
+    '''a -> (b, c) -> d, where b and c must run at the same time'''
+
+    def __init__(self, *args, **kwargs):
+        super(FanOut, self).__init__(*args, **kwargs)
+        self.barrier = threading.Barrier(2, timeout=10)
+        self.called = list()
+        self.failing = kwargs.get('failing', ())
+
+    def step(self, name):
+        self.called.append(name)
+        return name not in self.failing
+
+    def a(self, **kwargs):
+        return self.step('a')
+
+    @depends(a)
+    def b(self, **kwargs):
+        self.barrier.wait()
+        return self.step('b')
+
+    @depends(a)
+    def c(self, **kwargs):
+        self.barrier.wait()
+        return self.step('c')
+
+    @depends(b, c)
+    def d(self, **kwargs):
+        return self.step('d')
+
+
+def elsewhere(self, **kwargs):
+    return True
+
+
+class TestBuildOrder(unittest.TestCase):
+
+    def test_class_order(self):
+        self.assertEqual(('a', 'b', 'c', 'd'), FanOut.buildorder)
+        runner = TestBuildConcurrent().runner()
+        self.assertEqual(['a', 'b', 'c', 'd'],
+                         [x.__name__ for x in runner.determinebuildorder()])
+
+    def test_subclass_override(self):
+        class Later(FanOut):
+            @depends(FanOut.d)
+            def e(self, **kwargs):
+                return True
+
+            @depends(FanOut.a)
+            def c(self, **kwargs):
+                return True
+        self.assertEqual(('a', 'b', 'c', 'd', 'e'), Later.buildorder)
+
+    def test_unknown_step(self):
+        with self.assertRaises(ValueError) as ecm:
+            class Unknown(BaseDoctype):
+                @depends(elsewhere)
+                def a(self, **kwargs):
+                    return True
+        self.assertTrue('unknown step elsewhere' in ecm.exception.args[0])
+
+    def test_cycle(self):
+        def a(self, **kwargs):
+            return True
+
+        @depends(a)
+        def b(self, **kwargs):
+            return True
+        a = depends(b)(a)
+        with self.assertRaises(ValueError) as ecm:
+            type(str('Cycle'), (BaseDoctype,), dict(a=a, b=b))
+        self.assertTrue('cycle' in ecm.exception.args[0])
+
+
+class TestBuildConcurrent(unittest.TestCase):
+
+    def runner(self, **kwargs):
+        config = Namespace(script=False, build=True, step_jobs=4)
+        source = Namespace(stem='Frobnitz-HOWTO')
+        output = Namespace(stem='Frobnitz-HOWTO')
+        return FanOut(source=source, output=output, config=config, **kwargs)
+
+    def test_independent_steps_overlap(self):
+        runner = self.runner()
+        self.assertTrue(runner.build_fullrun())
+        self.assertEqual('a', runner.called[0])
+        self.assertEqual(set(['b', 'c']), set(runner.called[1:3]))
+        self.assertEqual('d', runner.called[3])
+        self.assertEqual(set('abcd'), set([x.name for x in runner.timings]))
+
+    def test_fail_fast_first_step(self):
+        runner = self.runner(failing=('a',))
+        self.assertFalse(runner.build_fullrun())
+        self.assertEqual(['a'], runner.called)
+
+    def test_fail_fast_running_steps_finish(self):
+        runner = self.runner(failing=('b',))
+        self.assertFalse(runner.build_fullrun())
+        self.assertEqual(set(['a', 'b', 'c']), set(runner.called))
+        statuses = dict((x.name, x.status) for x in runner.timings)
+        self.assertEqual(dict(a=0, b=1, c=0), statuses)
+
+
+class Pwd(BaseDoctype):
+    '''record the working directory of the build commands'''
+    required = dict()
+
+    def make_pwd(self, **kwargs):
+        return self.shellscript('pwd > pwd.txt', **kwargs)
+
+    @depends(make_pwd)
+    def make_copy(self, **kwargs):
+        return self.shellscript('cp pwd.txt "{output.dirname}/copy.txt"',
+                                **kwargs)
+
+
+class TestGenerateWorkingDirectory(TestToolsFilesystem):
+
+    def build(self, stem):
+        reldir, absdir = self.adddir(stem)
+        _, fname = self.addfile(reldir, example.ex_linuxdoc.filename,
+                                stem=stem)
+        source = SourceDocument(fname)
+        _, pubdir = self.adddir('pubdir')
+        output = OutputDirectory.fromsource(pubdir, source)
+        config = Namespace(script=False, build=True, resources=['images'])
+        runner = Pwd(source=source, output=output, config=config)
+        return runner.generate(), runner
+
+    def test_no_chdir_in_threads(self):
+        cwd = os.getcwd()
+        stems = ['Document-%d-HOWTO' % (x,) for x in range(4)]
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(self.build, stems))
+        self.assertEqual(cwd, os.getcwd())
+        for result, runner in results:
+            output = runner.output
+            self.assertTrue(result)
+            self.assertEqual(0, runner.timing.status)
+            self.assertEqual(['make_pwd', 'make_copy'],
+                             [x.name for x in runner.timings][-2:])
+            fname = os.path.join(output.dirname, 'copy.txt')
+            with codecs.open(fname, encoding='utf-8') as f:
+                self.assertEqual(os.path.realpath(output.dirname),
+                                 os.path.realpath(f.read().strip()))
+
+
+class Commanded(BaseDoctype):
+    '''run plain commands, without any shell'''
+    required = dict()
+
+    def make_copy(self, **kwargs):
+        argv = ['cat', '{source.filename}']
+        return self.command(argv, stdout='{source.stem} copy.txt', **kwargs)
+
+    @depends(make_copy)
+    def make_failure(self, **kwargs):
+        return self.command(['false'], **kwargs)
+
+
+class TestCommand(TestToolsFilesystem):
+
+    def runner(self, **kwargs):
+        stem = 'Frobnitz-HOWTO'
+        reldir, absdir = self.adddir(stem)
+        _, fname = self.addfile(reldir, example.ex_linuxdoc.filename,
+                                stem=stem)
+        source = SourceDocument(fname)
+        _, pubdir = self.adddir('pubdir')
+        output = OutputDirectory.fromsource(pubdir, source)
+        config = Namespace(script=False, build=True, resources=['images'])
+        for k, v in kwargs.items():
+            setattr(config, k, v)
+        return Commanded(source=source, output=output, config=config)
+
+    def test_commandline(self):
+        command = Command(['cat', 'a b'], stdout='c.txt', cwd='/tmp')
+        self.assertEqual("(cd -- /tmp && cat 'a b' > c.txt)",
+                         commandline(command))
+
+    def test_capture_output(self):
+        runner = self.runner(capture_output=True)
+        self.assertFalse(runner.generate())
+        self.assertEqual(1, runner.timings[-1].status)
+        output = runner.output
+        with codecs.open(opj(output.dirname, 'Frobnitz-HOWTO copy.txt'),
+                         encoding='utf-8') as f:
+            self.assertEqual(example.ex_linuxdoc.content, f.read())
+        # -- no scripts; only the failed command left (empty) logs behind
+        #
+        logs = sorted(os.listdir(output.logdir))
+        self.assertEqual(2, len(logs))
+        self.assertTrue(all(x.startswith('false.') for x in logs))
+
+    def test_script(self):
+        f = io.StringIO()
+        runner = self.runner(script=True, build=False)
+        self.assertTrue(runner.generate(file=f))
+        expected = "cat %s > 'Frobnitz-HOWTO copy.txt'" % \
+            (runner.source.filename,)
+        self.assertTrue(expected in f.getvalue())
+
+
+class Counting(BaseDoctype):
+    '''count the runs of the (only) build step'''
+    required = dict()
+    runs = 0
+
+    def make_validated_source(self, **kwargs):
+        return True
+
+    @depends(make_validated_source)
+    def make_html(self, **kwargs):
+        Counting.runs += 1
+        fname = os.path.join(self.output.dirname, self.source.stem + '.html')
+        with codecs.open(fname, 'w', encoding='utf-8') as f:
+            f.write('<html/>')
+        return True
+
+
+class TestGenerateArtifactCache(TestToolsFilesystem):
+
+    def runner(self, cache):
+        reldir, absdir = self.adddir('Frobnitz-HOWTO')
+        _, fname = self.addfile(reldir, example.ex_linuxdoc.filename,
+                                stem='Frobnitz-HOWTO')
+        source = SourceDocument(fname)
+        _, pubdir = self.adddir('pubdir')
+        output = OutputDirectory.fromsource(pubdir, source)
+        config = Namespace(script=False, build=True, resources=['images'],
+                           artifactcache=cache)
+        return Counting(source=source, output=output, config=config)
+
+    def test_rebuild_from_cache(self):
+        cache = ArtifactCache(os.path.join(self.tempdir, 'cache'), 10**6)
+        Counting.runs = 0
+        runner = self.runner(cache)
+        self.assertTrue(runner.generate())
+        self.assertEqual(1, Counting.runs)
+        self.assertEqual(1, len(cache.entries()))
+        html = os.path.join(runner.output.dirname, 'Frobnitz-HOWTO.html')
+        shutil.rmtree(runner.output.dirname)
+        runner = self.runner(cache)
+        self.assertTrue(runner.generate())
+        self.assertEqual(1, Counting.runs)
+        self.assertTrue(os.path.isfile(html))
+        self.assertTrue(os.path.isfile(runner.output.MD5SUMS))
+        self.assertEqual('restored', runner.shortcut)
+
+    def test_no_cache(self):
+        Counting.runs = 0
+        for x in range(2):
+            self.assertTrue(self.runner(None).generate())
+        self.assertEqual(2, Counting.runs)
+
+
+class Stylesheets(Counting):
+    required = dict(counting_xsl=None)
+
+
+class TestFingerprint(TestToolsFilesystem):
+
+    def writefile(self, fname, content):
+        if not os.path.isdir(os.path.dirname(fname)):
+            os.makedirs(os.path.dirname(fname))
+        with codecs.open(fname, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return fname
+
+    def runner(self, **kwargs):
+        _, fname = self.addfile('', example.ex_linuxdoc.filename,
+                                stem='Frobnitz-HOWTO')
+        source = SourceDocument(fname)
+        _, pubdir = self.adddir('pubdir')
+        output = OutputDirectory.fromsource(pubdir, source)
+        config = Namespace(script=False, build=True, resources=['images'],
+                           **kwargs)
+        return Stylesheets(source=source, output=output, config=config)
+
+    def test_imported_stylesheet(self):
+        inner = self.writefile(opj(self.tempdir, 'xsl', 'fo', 'inner.xsl'),
+                               '<xsl:stylesheet/>')
+        self.writefile(opj(self.tempdir, 'xsl', 'fo', 'docbook.xsl'),
+                       '<xsl:include href="inner.xsl"/>')
+        xsl = self.writefile(opj(self.tempdir, 'ldp.xsl'),
+                             '<xsl:import href="xsl/fo/docbook.xsl"/>')
+        before = self.runner(counting_xsl=xsl).fingerprint()
+        self.writefile(inner, '<xsl:stylesheet version="1.0"/>')
+        after = self.runner(counting_xsl=xsl).fingerprint()
+        self.assertNotEqual(before, after)
+        self.assertEqual(inner, after['tools']['counting_xsl'][3][0])
+
+    def test_single_file_resources(self):
+        image = self.writefile(opj(self.tempdir, 'images', 'a.png'), 'a')
+        before = self.runner().fingerprint()
+        self.assertEqual(['images/a.png'], list(before['resourcefiles']))
+        self.writefile(image, 'b')
+        self.assertNotEqual(before, self.runner().fingerprint())
+
+    def test_settings(self):
+        catalog = opj(self.tempdir, 'catalog.xml')
+        before = self.runner().fingerprint()
+        for setting in (dict(nonet=True), dict(xslt_engine='lxml'),
+                        dict(text_engine='builtin'),
+                        dict(xmlcatalog=XMLCatalog(catalog, rewrites=[]))):
+            self.assertNotEqual(before, self.runner(**setting).fingerprint())
+
+
+class Backends(BaseDoctype):
+    '''create a PDF with FOP or dblatex; FOP fails unless config.fop_works'''
+    required = dict(fop='unused', dblatex='unused')
+
+    def make_pdf_with_fop(self, **kwargs):
+        self.calls.append('fop')
+        return self.config.fop_works
+
+    def make_pdf_with_dblatex(self, **kwargs):
+        self.calls.append('dblatex')
+        return True
+
+    def make_name_pdf(self, **kwargs):
+        self.calls = list()
+        backends = [('fop', self.make_pdf_with_fop),
+                    ('dblatex', self.make_pdf_with_dblatex)]
+        return self.firstsuccessful('pdf', backends, ['fop', 'dblatex'])
+
+
+class TestFirstSuccessful(TestToolsFilesystem):
+
+    def runner(self, history, fop_works=False, fop='fop'):
+        reldir, absdir = self.adddir('Frobnitz-HOWTO')
+        _, fname = self.addfile(reldir, example.ex_linuxdoc.filename,
+                                stem='Frobnitz-HOWTO')
+        source = SourceDocument(fname)
+        _, pubdir = self.adddir('pubdir')
+        output = OutputDirectory.fromsource(pubdir, source)
+        config = Namespace(script=False, build=True, buildhistory=history,
+                           fop_works=fop_works, fop=fop, dblatex='dblatex')
+        return Backends(source=source, output=output, config=config)
+
+    def build(self, history, **kwargs):
+        runner = self.runner(history, **kwargs)
+        self.assertTrue(runner.make_name_pdf())
+        for name, (key, backend) in runner.backends.items():
+            history.recordbackend('Frobnitz-HOWTO', name, key, backend)
+        return runner.calls
+
+    def test_remembered(self):
+        history = BuildHistory(opj(self.tempdir, 'history.sqlite'))
+        self.assertEqual(['fop', 'dblatex'], self.build(history))
+        self.assertEqual(['dblatex'], self.build(history))
+        history.close()
+        history = BuildHistory(opj(self.tempdir, 'history.sqlite'))
+        self.assertEqual(dict(pdf='dblatex'),
+                         history.backends('Frobnitz-HOWTO'))
+        self.assertEqual(['dblatex'], self.build(history, fop_works=True))
+        # -- a different tool is a new chance for FOP
+        self.assertEqual(['fop'], self.build(history, fop_works=True,
+                                             fop='/usr/local/bin/fop'))
+        self.assertEqual(['fop'], self.build(history, fop_works=True,
+                                             fop='/usr/local/bin/fop'))
+        history.close()
+
+    def test_no_history(self):
+        runner = self.runner(None)
+        self.assertTrue(runner.make_name_pdf())
+        self.assertEqual(['fop', 'dblatex'], runner.calls)
+        self.assertEqual(dict(), runner.backends)
+
+
+class Shaped(BaseDoctype):
+    '''the build graph of a Linuxdoc document, writing placeholder files'''
+    required = dict()
+
+    def __init__(self, *args, **kwargs):
+        super(Shaped, self).__init__(*args, **kwargs)
+        self.called = list()
+
+    def write(self, name, prop=None):
+        self.called.append(name)
+        if prop:
+            with codecs.open(getattr(self.output, prop), 'w') as f:
+                f.write(name)
+        return True
+
+    def validate_source(self, **kwargs):
+        return self.write('validate_source')
+
+    @depends(validate_source)
+    def make_name_htmls(self, **kwargs):
+        return self.write('make_name_htmls', 'name_htmls')
+
+    @depends(make_name_htmls)
+    def make_name_txt(self, **kwargs):
+        return self.write('make_name_txt', 'name_txt')
+
+    @depends(make_name_htmls)
+    def make_name_pdf(self, **kwargs):
+        return self.write('make_name_pdf', 'name_pdf')
+
+    @depends(validate_source)
+    def make_name_html(self, **kwargs):
+        return self.write('make_name_html', 'name_html')
+
+    @depends(make_name_html)
+    def make_name_indexhtml(self, **kwargs):
+        return self.write('make_name_indexhtml', 'name_indexhtml')
+
+    @depends(make_name_txt, make_name_pdf, make_name_indexhtml)
+    def remove_validated_source(self, **kwargs):
+        return self.write('remove_validated_source')
+
+
+class TestPartialBuild(TestToolsFilesystem):
+
+    def runner(self, missing, step_jobs=1, partial_rebuild=True):
+        stem = 'Frobnitz-HOWTO'
+        reldir, absdir = self.adddir(stem)
+        _, fname = self.addfile(reldir, example.ex_linuxdoc.filename,
+                                stem=stem)
+        source = SourceDocument(fname)
+        _, pubdir = self.adddir('pubdir')
+        source.output = OutputDirectory.fromsource(pubdir, source)
+        os.mkdir(source.output.dirname)
+        self.adddir(opj('pubdir', stem, 'chunks'))
+        for prop in source.output.expected + ['name_html']:
+            if prop not in missing:
+                with codecs.open(getattr(source.output, prop), 'w') as f:
+                    f.write('old ' + prop)
+        with codecs.open(opj(source.output.dirname, 'chunks', 'a.html'),
+                         'w') as f:
+            f.write('old chunk')
+        source.status = 'broken'
+        _, builddir = self.adddir('builddir')
+        working = OutputDirectory.fromsource(builddir, source)
+        config = Namespace(script=False, build=True, resources=['images'],
+                           partial_rebuild=partial_rebuild,
+                           step_jobs=step_jobs)
+        return Shaped(source=source, output=working, config=config)
+
+    def content(self, runner, prop):
+        with codecs.open(getattr(runner.output, prop)) as f:
+            return f.read()
+
+    def test_missing_pdf(self):
+        runner = self.runner(['name_pdf'])
+        self.assertTrue(runner.generate())
+        self.assertEqual(['validate_source', 'make_name_htmls',
+                          'make_name_pdf', 'remove_validated_source'],
+                         runner.called)
+        self.assertTrue(runner.output.iscomplete)
+        self.assertEqual('make_name_pdf', self.content(runner, 'name_pdf'))
+        self.assertEqual('old name_txt', self.content(runner, 'name_txt'))
+        chunk = opj(runner.output.dirname, 'chunks', 'a.html')
+        self.assertTrue(os.path.isfile(chunk))
+
+    def test_missing_pdf_concurrent(self):
+        runner = self.runner(['name_pdf'], step_jobs=4)
+        self.assertTrue(runner.generate())
+        self.assertEqual(set(['validate_source', 'make_name_htmls',
+                              'make_name_pdf', 'remove_validated_source']),
+                         set(runner.called))
+        self.assertTrue(runner.output.iscomplete)
+
+    def test_missing_index(self):
+        runner = self.runner(['name_indexhtml'])
+        self.assertTrue(runner.generate())
+        self.assertEqual(['validate_source', 'make_name_html',
+                          'make_name_indexhtml', 'remove_validated_source'],
+                         runner.called)
+        self.assertEqual('make_name_html', self.content(runner, 'name_html'))
+
+    def test_disabled(self):
+        runner = self.runner(['name_pdf'], partial_rebuild=False)
+        self.assertTrue(runner.generate())
+        self.assertEqual(7, len(runner.called))
+
+    def test_not_broken(self):
+        runner = self.runner(['name_pdf'])
+        runner.source.status = 'stale'
+        self.assertTrue(runner.generate())
+        self.assertEqual(7, len(runner.called))
+
+#
+# -- end of file
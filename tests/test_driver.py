@@ -12,6 +12,7 @@ import uuid
 import errno
 import codecs
 import random
+import logging
 import unittest
 from tempfile import NamedTemporaryFile as ntf
 from argparse import Namespace
@@ -21,6 +22,8 @@ from tldp.typeguesser import knowndoctypes
 from tldp.inventory import stypes, status_types
 from tldp.sources import SourceDocument
 from tldp.outputs import OutputDirectory
+from tldp.buildhistory import BuildHistory
+from tldp.doctypes.common import Timing
 from tldp import VERSION
 
 # -- Test Data
@@ -124,6 +127,14 @@ class TestDriverShowStatustypes(TestToolsFilesystem):
         result = tldp.driver.show_statustypes(Namespace(), 'bogus')
         self.assertTrue('Extra arguments' in result)
 
+    def test_run_doctypes_unwritable_toolcache(self):
+        notadir = opj(self.tempdir, 'notadir')
+        open(notadir, 'w').close()
+        argv = ['--tool-cache', opj(notadir, 'tools.json'), '--doctypes']
+        with self.assertLogs('tldp.toolcache', level='WARNING'):
+            exitcode = tldp.driver.run(argv)
+        self.assertEqual(exitcode, os.EX_OK)
+
     def test_run_statustypes(self):
         exitcode = tldp.driver.run(['--statustypes'])
         self.assertEqual(exitcode, os.EX_OK)
@@ -158,6 +169,16 @@ class TestDriverSummary(TestInventoryBase):
         exitcode = tldp.driver.run(argv)
         self.assertEqual(exitcode, os.EX_OK)
 
+    def test_run_summary_unwritable_hashcache(self):
+        self.add_published('Published-HOWTO', example.ex_linuxdoc)
+        notadir = opj(self.tempdir, 'notadir')
+        open(notadir, 'w').close()
+        argv = self.argv
+        argv.extend(['--hash-cache', opj(notadir, 'cache.json'), '--summary'])
+        with self.assertLogs('tldp.hashcache', level='WARNING'):
+            exitcode = tldp.driver.run(argv)
+        self.assertEqual(exitcode, os.EX_OK)
+
     def test_summary_extraargs(self):
         result = tldp.driver.summary(Namespace(), 'bogus')
         self.assertTrue('Extra arguments' in result)
@@ -423,6 +444,216 @@ class TestDriverProcessSkips(TestInventoryBase):
         self.assertEqual(len(inc) + 1, len(inv.all.keys()))
 
 
+class TestDriverCollectWorkset(TestInventoryBase):
+
+    def test_collectWorkset_stems(self):
+        c = self.config
+        ex = example.ex_linuxdoc
+        self.add_published('Published-HOWTO', ex)
+        self.add_new('New-HOWTO', ex)
+        self.add_orphan('Orphan-HOWTO', ex)
+        docs, error = tldp.driver.collectWorkset(c, ['Published-HOWTO',
+                                                     'Orphan-HOWTO'])
+        self.assertIsNone(error)
+        self.assertEqual(['Orphan-HOWTO', 'Published-HOWTO'],
+                         [x.stem for x in docs])
+        self.assertEqual(['orphan', 'published'], [x.status for x in docs])
+
+    def test_collectWorkset_unknown_stem(self):
+        c = self.config
+        self.add_new('New-HOWTO', example.ex_linuxdoc)
+        docs, error = tldp.driver.collectWorkset(c, ['Nonexistent-HOWTO'])
+        self.assertIsNone(docs)
+        self.assertTrue('Nonexistent-HOWTO' in error)
+
+
+class FakeDoctype(object):
+    '''stands in for a real doctype; logs from (and reports) the worker pid'''
+
+    def __init__(self, source=None, output=None, config=None):
+        self.source = source
+
+    def generate(self, **kwargs):
+        log = logging.getLogger('tldp.test.fakedoctype')
+        log.warning('%s start %d', self.source.stem, os.getpid())
+        log.warning('%s end', self.source.stem)
+        return 'Failing' not in self.source.stem
+
+
+class RecordingHandler(logging.Handler):
+
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.messages = list()
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+class TestDriverDocbuildParallel(TestInventoryBase):
+
+    def test_docbuild_jobs(self):
+        c = self.config
+        c.build, c.script, c.jobs = True, False, 3
+        ex = example.ex_linuxdoc
+        stems = ['A-HOWTO', 'B-Failing-HOWTO', 'C-HOWTO', 'D-HOWTO']
+        for stem in stems:
+            self.add_new(stem, ex)
+        inv = tldp.inventory.Inventory(c.pubdir, c.sourcedir)
+        docs = inv.new.values()
+        for doc in docs:
+            doc.doctype = FakeDoctype
+        handler = RecordingHandler()
+        root = logging.getLogger()
+        level = root.level
+        root.setLevel(logging.WARNING)
+        root.addHandler(handler)
+        try:
+            success, results = tldp.driver.docbuild(c, docs)
+        finally:
+            root.removeHandler(handler)
+            root.setLevel(level)
+        self.assertFalse(success)
+        self.assertEqual([True, False, True, True], [x for x, _ in results])
+        self.assertEqual(stems, [doc.stem for _, doc in results])
+        # -- each document's records arrive together, in document order
+        #
+        messages = [x for x in handler.messages if ' start ' in x or
+                    x.endswith(' end')]
+        self.assertEqual(2 * len(stems), len(messages))
+        for stem, start, end in zip(stems, messages[::2], messages[1::2]):
+            self.assertTrue(start.startswith(stem + ' start '))
+            self.assertEqual(stem + ' end', end)
+            self.assertNotEqual(os.getpid(), int(start.split()[-1]))
+
+
+class TestDriverBuildHistory(TestInventoryBase):
+
+    def history(self, builds):
+        c = self.config
+        c.timing_db = opj(self.tempdir, 'history.sqlite')
+        history = BuildHistory(c.timing_db)
+        for stem, wall in builds:
+            history.record(stem, 'Linuxdoc', Timing(stem, wall, 0.1, 0),
+                           [Timing('make_html', wall, 0.1, 0)])
+        return history
+
+    def test_buildschedule_longest_first(self):
+        c = self.config
+        c.buildhistory = self.history([('A-HOWTO', 1.0), ('B-HOWTO', 9.0),
+                                       ('C-HOWTO', 3.0)])
+        docs = [Namespace(stem=x) for x in
+                ('A-HOWTO', 'B-HOWTO', 'C-HOWTO', 'New-HOWTO')]
+        self.assertEqual([3, 1, 2, 0], tldp.driver.buildschedule(c, docs))
+        c.buildhistory.close()
+
+    def test_recordtimings_skips_shortcuts(self):
+        c = self.config
+        c.buildhistory = self.history([('A-HOWTO', 9.0)])
+        source = Namespace(stem='A-HOWTO', doctype=Namespace(__name__='X'))
+        for shortcut in ('restored', 'partial', None):
+            runner = Namespace(timing=Timing('A-HOWTO', 0.5, 0.1, 0),
+                               timings=[], backends=dict(),
+                               shortcut=shortcut)
+            tldp.driver.recordtimings(c, source, runner)
+            self.assertEqual(9.0 if shortcut else (9.0 + 0.5) / 2,
+                             c.buildhistory.estimates()['A-HOWTO'])
+        c.buildhistory.close()
+
+    def test_buildschedule_no_history(self):
+        c = self.config
+        c.buildhistory = None
+        docs = [Namespace(stem=x) for x in ('B-HOWTO', 'A-HOWTO')]
+        self.assertEqual([0, 1], tldp.driver.buildschedule(c, docs))
+
+    def test_timing_report(self):
+        c = self.config
+        self.history([('A-HOWTO', 1.0), ('B-HOWTO', 9.0)]).close()
+        self.history([('A-HOWTO', 2.0)]).close()
+        stdout = io.StringIO()
+        result = tldp.driver.timing_report(c, file=stdout)
+        self.assertEqual(os.EX_OK, result)
+        stdout.seek(0)
+        lines = stdout.read().splitlines()
+        documents = lines[2:4]
+        self.assertTrue(documents[0].startswith('B-HOWTO'))
+        self.assertTrue(documents[1].startswith('A-HOWTO'))
+        self.assertTrue('+100%' in documents[1])
+        self.assertTrue('B-HOWTO.make_html' in lines[7])
+
+    def test_timing_report_no_history(self):
+        c = self.config
+        c.timing_db = opj(self.tempdir, 'nonexistent.sqlite')
+        result = tldp.driver.timing_report(c)
+        self.assertTrue('No build history' in result)
+
+    def test_timing_report_extraargs(self):
+        result = tldp.driver.timing_report(self.config, 'bogus')
+        self.assertTrue('Extra arguments' in result)
+
+    def test_backends_detail_and_forget(self):
+        c = self.config
+        self.add_new('A-HOWTO', example.ex_docbook4xml)
+        self.add_new('B-HOWTO', example.ex_docbook4xml)
+        history = self.history([])
+        history.recordbackend('A-HOWTO', 'pdf', 'key', 'dblatex')
+        history.recordbackend('B-HOWTO', 'pdf', 'key', 'fop')
+        history.close()
+        c.verbose = True
+        docs = tldp.inventory.Inventory(c.pubdir, c.sourcedir).all.values()
+        stdout = io.StringIO()
+        tldp.driver.detail(c, docs, file=stdout)
+        self.assertTrue('     pdf backend dblatex' in stdout.getvalue())
+        argv = self.argv + ['--timing-db', c.timing_db,
+                            '--forget-backends', 'A-HOWTO']
+        self.assertEqual(os.EX_OK, tldp.driver.run(argv))
+        history = BuildHistory(c.timing_db)
+        self.assertEqual(dict(), history.backends('A-HOWTO'))
+        self.assertEqual(dict(pdf='fop'), history.backends('B-HOWTO'))
+        history.close()
+
+
+class TestDriverCacheStats(TestInventoryBase):
+
+    def test_cache_stats(self):
+        c = self.config
+        c.verbose = True
+        cache = tldp.driver.artifactcache_setup(c)
+        for stem in ('A-HOWTO', 'B-HOWTO'):
+            absdir = opj(self.tempdir, 'outputs', stem)
+            os.makedirs(absdir)
+            with open(opj(absdir, stem + '.html'), 'w') as f:
+                f.write('<html/>')
+            cache.store(stem, absdir, stem=stem, doctype='Linuxdoc')
+        stdout = io.StringIO()
+        self.assertEqual(os.EX_OK, tldp.driver.cache_stats(c, file=stdout))
+        stdout.seek(0)
+        data = stdout.read()
+        self.assertTrue('entries: 2' in data)
+        self.assertTrue('Linuxdoc' in data)
+        self.assertTrue('B-HOWTO' in data)
+
+    def test_cache_stats_no_cache(self):
+        c = self.config
+        result = tldp.driver.cache_stats(c)
+        self.assertTrue('No artifact cache' in result)
+
+    def test_artifact_cache_in_builddir(self):
+        c = self.config
+        c.artifact_cache = None
+        c.builddir = None
+        expected = opj(self.tempdir, 'ldptool-build', 'ldptool-artifacts')
+        self.assertEqual(expected, tldp.driver.artifactcachename(c))
+        c.builddir = opj(self.tempdir, 'build')
+        cache = tldp.driver.artifactcache_setup(c)
+        self.assertEqual(opj(c.builddir, 'ldptool-artifacts'), cache.dirname)
+
+    def test_no_artifact_cache(self):
+        c = self.config
+        c.no_artifact_cache = True
+        self.assertIsNone(tldp.driver.artifactcache_setup(c))
+
+
 class TestDriverScript(TestInventoryBase):
 
     def test_script(self):
@@ -436,6 +667,41 @@ class TestDriverScript(TestInventoryBase):
         data = stdout.read()
         self.assertTrue('Published-HOWTO' in data)
 
+    def test_script_format_make(self):
+        c = self.config
+        c.script = True
+        c.script_format = 'make'
+        stdout = io.StringIO()
+        self.add_published('Published-HOWTO', example.ex_linuxdoc)
+        inv = tldp.inventory.Inventory(c.pubdir, c.sourcedir)
+        result = tldp.driver.script(c, inv.all.values(), file=stdout)
+        self.assertEqual(os.EX_OK, result)
+        data = stdout.getvalue()
+        self.assertTrue('all: Published-HOWTO' in data)
+        self.assertTrue('make_name_pdf.stamp' in data)
+
+    def test_script_exports_catalog(self):
+        c = self.config
+        c.script = True
+        c.xml_catalog = opj(self.tempdir, 'catalog.xml')
+        self.add_published('Published-HOWTO', example.ex_linuxdoc)
+        inv = tldp.inventory.Inventory(c.pubdir, c.sourcedir)
+        environ = dict(os.environ)
+        try:
+            for fmt, line in [('bash', 'export XML_CATALOG_FILES='),
+                              ('make', 'export XML_CATALOG_FILES := '),
+                              ('ninja', 'command = env XML_CATALOG_FILES=')]:
+                c.script_format = fmt
+                stdout = io.StringIO()
+                result = tldp.driver.script(c, inv.all.values(), file=stdout)
+                self.assertEqual(os.EX_OK, result)
+                data = stdout.getvalue()
+                self.assertTrue(line in data)
+                self.assertTrue('file://' + c.xml_catalog in data)
+        finally:
+            os.environ.clear()
+            os.environ.update(environ)
+
     def test_script_no_pubdir(self):
         c = self.config
         c.script = True
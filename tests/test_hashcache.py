@@ -0,0 +1,135 @@
+# -*- coding: utf8 -*-
+#
+# Copyright (c) 2016 Linux Documentation Project
+
+from __future__ import absolute_import, division, print_function
+from __future__ import unicode_literals
+
+import os
+import time
+import codecs
+
+from tldptesttools import TestToolsFilesystem
+
+# -- SUT
+from tldp.hashcache import HashCache
+from tldp.utils import md5file, md5files
+
+opj = os.path.join
+
+
+class TestHashCache(TestToolsFilesystem):
+
+    def addoldfile(self, name, content):
+        fname = opj(self.tempdir, name)
+        with codecs.open(fname, 'w', encoding='utf-8') as f:
+            f.write(content)
+        past = time.time() - 3600
+        os.utime(fname, (past, past))
+        return fname
+
+    def test_hit_after_miss(self):
+        fname = self.addoldfile('Frobnitz-HOWTO.xml', 'frobnitz')
+        cache = HashCache(opj(self.tempdir, 'cache.json'))
+        self.assertEqual(md5file(fname), cache.md5file(fname))
+        self.assertEqual(1, cache.misses)
+        self.assertEqual(md5file(fname), cache.md5file(fname))
+        self.assertEqual(1, cache.hits)
+
+    def test_roundtrip(self):
+        fname = self.addoldfile('Frobnitz-HOWTO.xml', 'frobnitz')
+        cachefile = opj(self.tempdir, 'subdir', 'cache.json')
+        cache = HashCache(cachefile)
+        cache.md5file(fname)
+        cache.save()
+        self.assertTrue(os.path.isfile(cachefile))
+        cache = HashCache(cachefile)
+        self.assertEqual(md5file(fname), cache.md5file(fname))
+        self.assertEqual(1, cache.hits)
+        self.assertEqual(0, cache.misses)
+
+    def test_changed_file_rehashed(self):
+        fname = self.addoldfile('Frobnitz-HOWTO.xml', 'frobnitz')
+        cache = HashCache(opj(self.tempdir, 'cache.json'))
+        old = cache.md5file(fname)
+        self.addoldfile('Frobnitz-HOWTO.xml', 'wascally wabbit')
+        new = cache.md5file(fname)
+        self.assertNotEqual(old, new)
+        self.assertEqual(md5file(fname), new)
+        self.assertEqual(2, cache.misses)
+
+    def test_recent_file_not_remembered(self):
+        fname = opj(self.tempdir, 'Frobnitz-HOWTO.xml')
+        with open(fname, 'w') as f:
+            f.write('frobnitz')
+        cache = HashCache(opj(self.tempdir, 'cache.json'))
+        self.assertEqual(md5file(fname), cache.md5file(fname))
+        self.assertNotIn(os.path.abspath(fname), cache.entries)
+
+    def test_corrupt_cache_ignored(self):
+        fname = self.addoldfile('Frobnitz-HOWTO.xml', 'frobnitz')
+        cachefile = self.addoldfile('cache.json', '{"version": 1, "entr')
+        cache = HashCache(cachefile)
+        self.assertEqual(0, len(cache.entries))
+        self.assertEqual(md5file(fname), cache.md5file(fname))
+        cache.save()
+        self.assertEqual(1, len(HashCache(cachefile).entries))
+
+    def test_unknown_version_ignored(self):
+        cachefile = self.addoldfile('cache.json', '{"version": 0}')
+        cache = HashCache(cachefile)
+        self.assertEqual(0, len(cache.entries))
+
+    def test_invalidate(self):
+        fname = self.addoldfile('Frobnitz-HOWTO.xml', 'frobnitz')
+        cache = HashCache(opj(self.tempdir, 'cache.json'))
+        cache.md5file(fname)
+        cache.invalidate(fname)
+        cache.md5file(fname)
+        self.assertEqual(2, cache.misses)
+
+    def test_missing_files_pruned(self):
+        os.mkdir(opj(self.tempdir, 'a'))
+        os.mkdir(opj(self.tempdir, 'b'))
+        fname = self.addoldfile(opj('a', 'Frobnitz-HOWTO.xml'), 'frobnitz')
+        other = self.addoldfile(opj('b', 'Wabbit-HOWTO.xml'), 'wabbit')
+        cachefile = opj(self.tempdir, 'cache.json')
+        cache = HashCache(cachefile)
+        cache.md5file(fname)
+        cache.md5file(other)
+        self.assertTrue(cache.save())
+        os.unlink(fname)
+        os.unlink(other)
+        cache = HashCache(cachefile)
+        md5files(opj(self.tempdir, 'a'), cache=cache)
+        self.assertTrue(cache.save())
+        entries = HashCache(cachefile).entries
+        self.assertEqual([os.path.abspath(other)], list(entries))
+
+    def test_unused_cache_untouched(self):
+        cachefile = self.addoldfile('cache.json', '{"version": 1, "entr')
+        cache = HashCache(cachefile)
+        with self.assertNoLogs('tldp.hashcache', level='WARNING'):
+            self.assertTrue(cache.save())
+        self.assertIsNone(cache._entries)
+        with codecs.open(cachefile, encoding='utf-8') as f:
+            self.assertEqual('{"version": 1, "entr', f.read())
+
+    def test_unwritable_cache(self):
+        fname = self.addoldfile('Frobnitz-HOWTO.xml', 'frobnitz')
+        notadir = self.addoldfile('notadir', '')
+        cache = HashCache(opj(notadir, 'cache.json'))
+        cache.md5file(fname)
+        with self.assertLogs('tldp.hashcache', level='WARNING'):
+            self.assertFalse(cache.save())
+
+    def test_md5files_with_cache(self):
+        self.addoldfile('a.xml', 'a')
+        self.addoldfile('b.xml', 'b')
+        cache = HashCache(opj(self.tempdir, 'cache.json'))
+        expected = md5files(self.tempdir, relative=self.tempdir)
+        found = md5files(self.tempdir, relative=self.tempdir, cache=cache)
+        self.assertEqual(expected, found)
+
+#
+# -- end of file
@@ -0,0 +1,163 @@
+# -*- coding: utf8 -*-
+#
+# Copyright (c) 2016 Linux Documentation Project
+
+from __future__ import absolute_import, division, print_function
+from __future__ import unicode_literals
+
+import io
+import os
+import codecs
+import unittest
+from argparse import Namespace
+
+from tldptesttools import TestToolsFilesystem
+
+# -- Test Data
+import example
+
+# -- SUT
+from tldp import htmltext
+from tldp.htmltext import TextRenderer
+from tldp.doctypes.common import BUILTIN, HTML2TEXT
+from tldp.sources import SourceDocument
+from tldp.outputs import OutputDirectory
+
+opj = os.path.join
+
+document = '''<html><head><title>Frobnitz</title>
+<style>p { color: red; }</style></head><body>
+<h1>Frobnitz&nbsp;HOWTO</h1>
+<dl><dt>1. Introduction</dt><dd><dl><dt>1.1. Wabbits</dt></dl></dd></dl>
+<p>The <em>frobnitz</em> is used (with the <b>wabbit</b>) to
+frobnicate.</p>
+<ul><li>one</li><li>two<ul><li>three</li></ul></li></ul>
+<ol><li>first</li><li>second</li></ol>
+<pre>
+$ frob --all
+	done
+</pre>
+<table><tr><th>Name</th><th>Value</th></tr><tr><td>a</td><td>b</td></tr>
+</table>
+<p>Line<br>break <img src="x.png" alt="Figure"></p><hr></body></html>
+'''
+
+expected = '''Frobnitz HOWTO
+
+1. Introduction
+    1.1. Wabbits
+
+The frobnitz is used (with the wabbit) to frobnicate.
+
+  * one
+  * two
+      o three
+
+  1. first
+  2. second
+
+$ frob --all
+        done
+
+Name  Value
+a     b
+
+Line
+break [Figure]
+
+-----------------------------------------------------------------------------
+'''
+
+
+class TestTextRenderer(unittest.TestCase):
+
+    def test_render(self):
+        self.assertEqual(expected, TextRenderer().render(document))
+
+    def test_wrap(self):
+        text = TextRenderer(width=20).render('<p>%s</p>' % ('frob ' * 10,))
+        lines = text.splitlines()
+        self.assertEqual(3, len(lines))
+        self.assertTrue(all(len(x) <= 20 for x in lines))
+
+    def test_nbsp_joins_words(self):
+        text = TextRenderer(width=10).render('<p>aaaa bbbb&nbsp;cccc</p>')
+        self.assertEqual('aaaa\nbbbb cccc\n', text)
+
+    def test_charset(self):
+        self.assertEqual('iso8859-1', htmltext.charset(b'<html>'))
+        head = b'<meta http-equiv="Content-Type" ' \
+               b'content="text/html; charset=UTF-8">'
+        self.assertEqual('utf-8', htmltext.charset(head))
+        self.assertEqual('iso8859-1', htmltext.charset(b'charset=wabbit'))
+
+
+class TestRender(TestToolsFilesystem):
+
+    def render(self, html):
+        source = opj(self.tempdir, 'in.html')
+        output = opj(self.tempdir, 'out.txt')
+        with open(source, 'wb') as f:
+            f.write(html)
+        self.assertTrue(htmltext.render(source, output))
+        with open(output, 'rb') as f:
+            return f.read()
+
+    def test_latin1(self):
+        text = self.render('<p>Fr\xf6bnitz &mdash; x</p>'.encode('latin-1'))
+        self.assertEqual('Fr\xf6bnitz -- x\n'.encode('latin-1'), text)
+
+    def test_utf8(self):
+        html = '<meta charset="utf-8"><p>Fr\xf6bnitz &mdash; x</p>'
+        text = self.render(html.encode('utf-8'))
+        self.assertEqual('Fr\xf6bnitz — x\n'.encode('utf-8'), text)
+
+    def test_missing(self):
+        with self.assertLogs('tldp.htmltext', level='ERROR'):
+            self.assertFalse(htmltext.render(opj(self.tempdir, 'wabbit'),
+                                             opj(self.tempdir, 'out.txt')))
+
+
+class TestTextEngine(TestToolsFilesystem):
+
+    def runner(self, **kwargs):
+        reldir, absdir = self.adddir('Frobnitz-HOWTO')
+        _, fname = self.addfile(reldir, example.ex_linuxdoc.filename,
+                                stem='Frobnitz-HOWTO')
+        source = SourceDocument(fname)
+        _, pubdir = self.adddir('pubdir')
+        output = OutputDirectory.fromsource(pubdir, source)
+        os.makedirs(output.dirname)
+        kwargs.setdefault('text_engine', BUILTIN)
+        config = Namespace(linuxdoc_html2text='/usr/bin/html2text', **kwargs)
+        return source.doctype(source=source, output=output, config=config)
+
+    def test_script(self):
+        runner = self.runner(script=True, build=False)
+        f = io.StringIO()
+        self.assertTrue(runner.make_name_txt(file=f))
+        expected = '/usr/bin/html2text -style pretty -nobs %s > %s' % \
+            (runner.output.name_htmls, runner.output.name_txt)
+        self.assertEqual(expected, f.getvalue().strip())
+
+    def test_per_doctype(self):
+        runner = self.runner(script=False, build=True, text_engine=HTML2TEXT,
+                             linuxdoc_text_engine=BUILTIN)
+        self.assertEqual(BUILTIN, runner.textengine())
+        runner.config.text_engine = BUILTIN
+        runner.config.linuxdoc_text_engine = HTML2TEXT
+        self.assertEqual(HTML2TEXT, runner.textengine())
+        runner.config.linuxdoc_text_engine = None
+        self.assertEqual(BUILTIN, runner.textengine())
+
+    def test_builtin(self):
+        runner = self.runner(script=False, build=True)
+        with codecs.open(runner.output.name_htmls, 'w', 'utf-8') as f:
+            f.write(document)
+        self.assertTrue(runner.make_name_txt())
+        self.assertEqual(0, runner.exits.status)
+        with codecs.open(runner.output.name_txt, encoding='latin-1') as f:
+            self.assertEqual(expected, f.read())
+
+#
+# -- end of file
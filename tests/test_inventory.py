@@ -7,6 +7,7 @@ from __future__ import unicode_literals
 
 
 import random
+import tracemalloc
 
 from tldptesttools import TestInventoryBase
 
@@ -15,6 +16,8 @@ import example
 
 # -- SUT
 from tldp.inventory import Inventory
+from tldp.sources import SourceCollection
+from tldp.outputs import OutputCollection
 
 
 class TestInventoryUsage(TestInventoryBase):
@@ -98,5 +101,105 @@ class TestInventoryUsage(TestInventoryBase):
         self.assertEqual(0, len(i.orphan))
         self.assertEqual(1, len(i.broken))
 
+    def test_status_collections_share_documents(self):
+        c = self.config
+        ex = random.choice(example.sources)
+        self.add_published('Published-HOWTO', ex)
+        self.add_new('New-HOWTO', ex)
+        self.add_stale('Stale-HOWTO', ex)
+        self.add_orphan('Orphan-HOWTO', ex)
+        self.add_broken('Broken-HOWTO', ex)
+        i = Inventory(c.pubdir, c.sourcedir)
+        for stem in ('Published-HOWTO', 'Stale-HOWTO', 'Broken-HOWTO'):
+            self.assertIs(i.source[stem], i.published[stem])
+            self.assertIs(i.output[stem], i.published[stem].output)
+        self.assertIs(i.source['New-HOWTO'], i.new['New-HOWTO'])
+        self.assertIs(i.output['Orphan-HOWTO'], i.orphan['Orphan-HOWTO'])
+        self.assertIs(i.source['Stale-HOWTO'], i.stale['Stale-HOWTO'])
+        self.assertIs(i.source['Broken-HOWTO'], i.broken['Broken-HOWTO'])
+        self.assertEqual('stale', i.source['Stale-HOWTO'].status)
+        self.assertEqual('orphan', i.output['Orphan-HOWTO'].status)
+
+    def test_lazy_classification(self):
+        c = self.config
+        ex = random.choice(example.sources)
+        self.add_new('New-HOWTO', ex)
+        self.add_stale('Stale-HOWTO', ex)
+        self.add_orphan('Orphan-HOWTO', ex)
+        self.add_broken('Broken-HOWTO', ex)
+        i = Inventory(c.pubdir, c.sourcedir)
+        self.assertEqual(['New-HOWTO'], i.new.keys())
+        self.assertEqual(['Orphan-HOWTO'], i.orphan.keys())
+        for stem in ('Stale-HOWTO', 'Broken-HOWTO'):
+            self.assertIsNone(i.source[stem]._md5sums)
+        self.assertFalse('_broken' in i.__dict__)
+        self.assertFalse('_stale' in i.__dict__)
+        # -- a single document can be classified on its own
+        #
+        self.assertEqual('stale', i.output['Stale-HOWTO'].status)
+        self.assertIsNone(i.source['Broken-HOWTO']._md5sums)
+        self.assertEqual('broken', i.source['Broken-HOWTO'].status)
+        self.assertFalse('_stale' in i.__dict__)
+        self.assertEqual(['Stale-HOWTO'], i.stale.keys())
+        self.assertIs(i.stale, i.stale)
+
+    def test_stems(self):
+        c = self.config
+        ex = random.choice(example.sources)
+        self.add_published('Published-HOWTO', ex)
+        self.add_new('New-HOWTO', ex)
+        self.add_stale('Stale-HOWTO', ex)
+        self.add_orphan('Orphan-HOWTO', ex)
+        stems = ['Stale-HOWTO', 'Orphan-HOWTO', 'Missing-HOWTO']
+        i = Inventory(c.pubdir, c.sourcedir, stems=stems)
+        self.assertEqual(['Stale-HOWTO'], i.source.keys())
+        self.assertEqual(['Orphan-HOWTO', 'Stale-HOWTO'], i.output.keys())
+        self.assertEqual(['Orphan-HOWTO'], i.orphan.keys())
+        self.assertEqual(['Stale-HOWTO'], i.stale.keys())
+        self.assertEqual(0, len(i.new))
+
+    def test_stale_hashjobs_identical(self):
+        c = self.config
+        ex = random.choice(example.sources)
+        for x in range(5):
+            self.add_published('Published-%d-HOWTO' % (x,), ex)
+            self.add_stale('Stale-%d-HOWTO' % (x,), ex)
+        serial = Inventory(c.pubdir, c.sourcedir)
+        threaded = Inventory(c.pubdir, c.sourcedir, hashjobs=4)
+        self.assertEqual(serial.stale.keys(), threaded.stale.keys())
+        self.assertEqual(5, len(threaded.stale))
+
+
+class TestInventoryMemory(TestInventoryBase):
+
+    def traced(self, f, *args, **kwargs):
+        '''return (result, bytes still allocated by result) for f()'''
+        tracemalloc.start()
+        try:
+            result = f(*args, **kwargs)
+            size, _ = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return result, size
+
+    def collections(self):
+        c = self.config
+        return (SourceCollection(c.sourcedir), OutputCollection(c.pubdir))
+
+    def test_inventory_memory(self):
+        c = self.config
+        ex = random.choice(example.sources)
+        for x in range(100):
+            self.add_published('Published-%03d-HOWTO' % (x,), ex)
+            self.add_stale('Stale-%03d-HOWTO' % (x,), ex)
+        _, baseline = self.traced(self.collections)
+        i, size = self.traced(Inventory, c.pubdir, c.sourcedir)
+        self.assertEqual(200, len(i.published))
+        # -- the Inventory holds only the two collections, plus the
+        #    (small) status collections pointing into them; copying the
+        #    documents would (more than) double the allocation
+        #
+        self.assertLess(size, baseline * 1.5)
+
 #
 # -- end of file
@@ -0,0 +1,140 @@
+# -*- coding: utf8 -*-
+#
+# Copyright (c) 2016 Linux Documentation Project
+
+from __future__ import absolute_import, division, print_function
+from __future__ import unicode_literals
+
+import os
+import sys
+import codecs
+from argparse import Namespace
+
+from tldptesttools import TestToolsFilesystem
+
+# -- Test Data
+import example
+
+# -- SUT
+from tldp.jvmworker import JVMWorker, FOP, JING
+from tldp.sources import SourceDocument
+from tldp.outputs import OutputDirectory
+
+opj = os.path.join
+
+# -- stands in for java running a nailgun server:  listens on the socket
+#    given as local:SOCKET and waits to be terminated
+#
+server = '''#! %s
+import sys, time, socket
+s = socket.socket(socket.AF_UNIX)
+s.bind(sys.argv[-1].split(':', 1)[1])
+s.listen(1)
+time.sleep(60)
+''' % (sys.executable,)
+
+
+class TestJVMWorkerBase(TestToolsFilesystem):
+
+    def addscript(self, name, content):
+        fname = opj(self.tempdir, name)
+        with codecs.open(fname, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.chmod(fname, 0o755)
+        return fname
+
+    def worker(self, ngstatus=0):
+        java = self.addscript('java', server)
+        ng = self.addscript('ng', '#! /bin/sh\necho "$@" >> %s\nexit %d\n'
+                            % (opj(self.tempdir, 'ng.log'), ngstatus))
+        worker = JVMWorker(java, ng, '/usr/share/java/*')
+        self.addCleanup(worker.stop)
+        return worker
+
+
+class TestJVMWorker(TestJVMWorkerBase):
+
+    def test_start_stop(self):
+        worker = self.worker()
+        self.assertTrue(worker.start())
+        self.assertTrue(worker.alive())
+        self.assertTrue(worker.usable(FOP))
+        worker.broken.add(FOP)
+        self.assertFalse(worker.usable(FOP))
+        self.assertTrue(worker.usable(JING))
+        argv = worker.argv(JING, ['docbook.rng', 'x.xml'])
+        self.assertEqual([worker.ng, '--nailgun-server', worker.address,
+                          JING, 'docbook.rng', 'x.xml'], argv)
+        worker.stop()
+        self.assertFalse(worker.alive())
+        self.assertFalse(os.path.exists(worker.dirname))
+
+    def test_start_failure(self):
+        java = self.addscript('java', '#! /bin/sh\necho "No NGServer"\n'
+                                      'exit 1\n')
+        worker = JVMWorker(java, 'ng', '/usr/share/java/*')
+        self.assertFalse(worker.start())
+        self.assertFalse(worker.alive())
+        self.assertFalse(os.path.exists(worker.dirname))
+
+
+class TestJVMWorkerDoctype(TestJVMWorkerBase):
+
+    def runner(self, worker):
+        reldir, absdir = self.adddir('Frobnitz-HOWTO')
+        _, fname = self.addfile(reldir, example.ex_docbook4xml.filename,
+                                stem='Frobnitz-HOWTO')
+        source = SourceDocument(fname)
+        _, pubdir = self.adddir('pubdir')
+        output = OutputDirectory.fromsource(pubdir, source)
+        os.makedirs(output.logdir)
+        fop = self.addscript('fop', '#! /bin/sh\ntouch "$4"\n')
+        config = Namespace(script=False, build=True, jvmworker=worker,
+                           docbook4xml_fop=fop)
+        return source.doctype(source=source, output=output, config=config)
+
+    def ngcalls(self):
+        fname = opj(self.tempdir, 'ng.log')
+        if not os.path.exists(fname):
+            return 0
+        with codecs.open(fname, encoding='utf-8') as f:
+            return len(f.readlines())
+
+    def test_worker(self):
+        worker = self.worker()
+        self.assertTrue(worker.start())
+        runner = self.runner(worker)
+        self.assertTrue(runner.make_pdf_with_fop())
+        self.assertEqual(1, self.ngcalls())
+        self.assertFalse(os.path.exists(runner.output.name_pdf))
+
+    def test_tool_failure(self):
+        worker = self.worker(ngstatus=1)
+        self.assertTrue(worker.start())
+        runner = self.runner(worker)
+        self.assertFalse(runner.make_pdf_with_fop())
+        self.assertTrue(worker.usable(FOP))
+        self.assertFalse(os.path.exists(runner.output.name_pdf))
+
+    def test_unreachable_worker(self):
+        worker = self.worker(ngstatus=230)
+        self.assertTrue(worker.start())
+        runner = self.runner(worker)
+        self.assertTrue(runner.make_pdf_with_fop())
+        self.assertTrue(os.path.exists(runner.output.name_pdf))
+        self.assertFalse(worker.usable(FOP))
+        self.assertTrue(runner.make_pdf_with_fop())
+        self.assertEqual(1, self.ngcalls())
+
+    def test_dead_worker(self):
+        worker = self.worker(ngstatus=227)
+        self.assertTrue(worker.start())
+        runner = self.runner(worker)
+        worker.process.kill()
+        worker.process.wait()
+        self.assertTrue(runner.make_pdf_with_fop())
+        self.assertTrue(os.path.exists(runner.output.name_pdf))
+        self.assertEqual(0, self.ngcalls())
+
+#
+# -- end of file
@@ -0,0 +1,104 @@
+# -*- coding: utf8 -*-
+#
+# Copyright (c) 2016 Linux Documentation Project
+
+from __future__ import absolute_import, division, print_function
+from __future__ import unicode_literals
+
+import os
+import codecs
+import shutil
+
+import tldptesttools
+from tldptesttools import TestToolsFilesystem
+
+# -- SUT
+from tldp.manifest import Manifest, MANIFEST
+from tldp.outputs import OutputCollection, OutputDirectory
+
+opj = os.path.join
+
+
+class TestManifest(TestToolsFilesystem):
+
+    md5s = {'Frobnitz-HOWTO.sgml': 'd41d8cd98f00b204e9800998ecf8427e'}
+
+    def addoutput(self, stem):
+        reldir, absdir = self.adddir(opj('pubdir', stem))
+        myoutput = tldptesttools.TestOutputDirSkeleton(absdir, stem)
+        myoutput.create_expected_docs()
+        myoutput.create_md5sum_file(self.md5s)
+        return OutputDirectory(absdir)
+
+    def test_roundtrip(self):
+        o = self.addoutput('Frobnitz-HOWTO')
+        pubdir = os.path.dirname(o.dirname)
+        manifest = Manifest(pubdir)
+        manifest.record(o)
+        manifest.save()
+        self.assertTrue(os.path.isfile(opj(pubdir, MANIFEST)))
+        manifest = Manifest(pubdir)
+        fresh = OutputDirectory(o.dirname)
+        self.assertTrue(manifest.prime(fresh))
+        self.assertEqual(self.md5s, fresh._md5sums)
+        self.assertTrue(fresh.iscomplete)
+        self.assertEqual(self.md5s, fresh.md5sums)
+
+    def test_changed_directory_not_primed(self):
+        o = self.addoutput('Frobnitz-HOWTO')
+        pubdir = os.path.dirname(o.dirname)
+        manifest = Manifest(pubdir)
+        manifest.record(o)
+        os.unlink(o.name_pdf)
+        fresh = OutputDirectory(o.dirname)
+        self.assertFalse(manifest.prime(fresh))
+        self.assertIsNone(fresh._listing)
+        self.assertFalse(fresh.iscomplete)
+
+    def test_unknown_stem_not_primed(self):
+        o = self.addoutput('Frobnitz-HOWTO')
+        manifest = Manifest(os.path.dirname(o.dirname))
+        self.assertFalse(manifest.prime(o))
+
+    def test_corrupt_manifest(self):
+        o = self.addoutput('Frobnitz-HOWTO')
+        pubdir = os.path.dirname(o.dirname)
+        with codecs.open(opj(pubdir, MANIFEST), 'w', encoding='utf-8') as f:
+            f.write('{"version": 1, "entries": ')
+        manifest = Manifest(pubdir)
+        self.assertEqual(dict(), manifest.entries)
+        manifest.record(o)
+        manifest.save()
+        self.assertEqual(1, len(Manifest(pubdir).entries))
+
+    def test_removed_stem_forgotten(self):
+        o = self.addoutput('Frobnitz-HOWTO')
+        gone = self.addoutput('Wascally-Wabbit-HOWTO')
+        pubdir = os.path.dirname(o.dirname)
+        manifest = Manifest(pubdir)
+        manifest.record(o)
+        manifest.record(gone)
+        manifest.save()
+        shutil.rmtree(gone.dirname)
+        manifest = Manifest(pubdir)
+        manifest.save()
+        self.assertEqual(['Frobnitz-HOWTO'], list(Manifest(pubdir).entries))
+
+    def test_output_collection_primed(self):
+        for stem in ('Frobnitz-HOWTO', 'Wascally-Wabbit-HOWTO'):
+            o = self.addoutput(stem)
+        pubdir = os.path.dirname(o.dirname)
+        manifest = Manifest(pubdir)
+        manifest.record(o)
+        manifest.save()
+        oc = OutputCollection(pubdir)
+        self.assertEqual(['Frobnitz-HOWTO', 'Wascally-Wabbit-HOWTO'],
+                         oc.keys())
+        self.assertIsNone(oc['Frobnitz-HOWTO']._md5sums)
+        self.assertEqual(self.md5s, oc['Wascally-Wabbit-HOWTO']._md5sums)
+        for o in oc.values():
+            self.assertTrue(o.iscomplete)
+            self.assertEqual(self.md5s, o.md5sums)
+
+#
+# -- end of file
@@ -12,6 +12,8 @@ import random
 
 from tldptesttools import TestToolsFilesystem
 
+from tldp.utils import writemd5sums
+
 # -- SUT
 from tldp.outputs import OutputCollection
 from tldp.outputs import OutputDirectory
@@ -53,6 +55,16 @@ class TestOutputCollection(TestToolsFilesystem):
         oc = OutputCollection(absdir)
         self.assertEqual(count, len(oc))
 
+    def test_stems(self):
+        reldir, absdir = self.adddir('stems')
+        for x in range(5):
+            self.adddir('stems/Document-Stem-' + str(x))
+        self.addfile('stems', __file__, stem='Non-Directory-Stem')
+        stems = ['Document-Stem-1', 'Document-Stem-3', 'Non-Directory-Stem',
+                 'Missing-Stem']
+        oc = OutputCollection(absdir, stems=stems)
+        self.assertEqual(['Document-Stem-1', 'Document-Stem-3'], oc.keys())
+
 
 class TestOutputDirectory(TestToolsFilesystem):
 
@@ -72,8 +84,32 @@ class TestOutputDirectory(TestToolsFilesystem):
             assert fname is not None
             with open(fname, 'w'):
                 pass
+        # -- the listing is a snapshot, until refreshed
+        #
+        self.assertFalse(o.iscomplete)
+        o.refresh()
         self.assertTrue(o.iscomplete)
+        self.assertEqual(set(), o.missing)
         self.assertTrue('Frobnitz' in str(o))
 
+    def test_missing(self):
+        reldir, absdir = self.adddir('outputs/Frobnitz-HOWTO')
+        o = OutputDirectory(absdir)
+        self.assertEqual(len(o.expected), len(o.missing))
+        os.mkdir(o.name_pdf)
+        o.refresh()
+        self.assertFalse(o.iscomplete)
+        self.assertTrue(o.name_pdf in o.missing)
+
+    def test_md5sums(self):
+        reldir, absdir = self.adddir('outputs/Frobnitz-HOWTO')
+        o = OutputDirectory(absdir)
+        self.assertEqual(dict(), o.md5sums)
+        writemd5sums(o.MD5SUMS, {'Frobnitz-HOWTO.sgml': 'abc123'})
+        self.assertEqual(dict(), o.md5sums)
+        o.refresh()
+        self.assertEqual({'Frobnitz-HOWTO.sgml': 'abc123'}, o.md5sums)
+        self.assertIs(o.md5sums, o.md5sums)
+
 #
 # -- end of file
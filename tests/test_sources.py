@@ -55,6 +55,64 @@ class TestFileSourceCollectionMultiDir(TestToolsFilesystem):
         found = set(s.keys())
         self.assertEqual(expected, found)
 
+    def test_multidir_stems(self):
+        ex = example.ex_linuxdoc
+        exdir = example.ex_linuxdoc_dir
+        reldir0, absdir0 = self.adddir('LDP/howto')
+        reldir1, absdir1 = self.adddir('LDP/guide')
+        for stem in ('Wanted-HOWTO', 'Unwanted-HOWTO', 'Wanted-HOWTO-Not'):
+            self.addfile(reldir0, ex.filename, stem=stem)
+        dirstem = os.path.basename(os.path.dirname(exdir.filename))
+        os.symlink(os.path.dirname(exdir.filename), os.path.join(absdir1,
+                                                                 dirstem))
+        s = scansourcedirs([absdir0, absdir1],
+                           stems=['Wanted-HOWTO', dirstem, 'Missing-HOWTO'])
+        self.assertEqual(set(['Wanted-HOWTO', dirstem]), set(s.keys()))
+
+    def test_multidir_stems_dotted_directory(self):
+        ex = example.ex_linuxdoc
+        reldir, absdir = self.adddir('LDP/howto')
+        stem = 'Foo.Bar-HOWTO'
+        docdir, _ = self.adddir(os.path.join(reldir, stem))
+        self.addfile(docdir, ex.filename, stem=stem)
+        self.addfile(reldir, ex.filename, stem='Foo')
+        s = scansourcedirs([absdir], stems=[stem])
+        self.assertEqual(set([stem]), set(s.keys()))
+
+    def test_multidir_scanjobs_identical(self):
+        ex = example.ex_linuxdoc
+        dirs = list()
+        for x in range(7):
+            reldir, absdir = self.adddir('LDP/dir-%d' % (x,))
+            dirs.append(absdir)
+            for y in range(5):
+                self.addfile(reldir, ex.filename, stem='Stem-%d-HOWTO' % (y,))
+            self.addfile(reldir, ex.filename, stem='Unique-%d-HOWTO' % (x,))
+        random.shuffle(dirs)
+        serial = scansourcedirs(dirs)
+        threaded = scansourcedirs(dirs, scanjobs=4)
+        self.assertEqual(12, len(serial))
+        self.assertEqual(serial.keys(), threaded.keys())
+        for stem, doc in serial.items():
+            self.assertEqual(doc.filename, threaded[stem].filename)
+        # -- duplicates are resolved in favour of the first (sorted) dir
+        self.assertTrue('/dir-0/' in threaded['Stem-3-HOWTO'].filename)
+
+    def test_multidir_hashjobs_identical(self):
+        documents = list()
+        for x, ex in enumerate(example.sources):
+            d = Namespace(reldir='LDP/dir-%d' % (x % 3,), stem='Stem-%d' % x)
+            d.reldir, d.absdir = self.adddir(d.reldir)
+            self.addfile(d.reldir, ex.filename, stem=d.stem)
+            documents.append(d)
+        dirs = sorted(set([x.absdir for x in documents]))
+        serial = scansourcedirs(dirs)
+        threaded = scansourcedirs(dirs, hashjobs=4)
+        self.assertEqual(serial.keys(), threaded.keys())
+        for stem, doc in serial.items():
+            self.assertEqual(doc.filename, threaded[stem].filename)
+            self.assertEqual(doc.md5sums, threaded[stem].md5sums)
+
 
 class TestFileSourceCollectionOneDir(TestToolsFilesystem):
 
@@ -134,6 +192,26 @@ class Test_sourcedoc_fromdir(unittest.TestCase):
         self.assertIsNotNone(doc)
 
 
+class Test_sourcedoc_fromdir_fs(TestToolsFilesystem):
+
+    def test_sourcedoc_fromdir_ignores_directory(self):
+        stem = 'Directory-Named-Like-Document'
+        reldir, absdir = self.adddir(stem)
+        os.mkdir(os.path.join(absdir, stem + '.sgml'))
+        self.assertIsNone(sourcedoc_fromdir(absdir))
+        _, fname = self.addfile(reldir, example.ex_linuxdoc.filename,
+                                stem=stem, ext='.xml')
+        self.assertEqual(fname, sourcedoc_fromdir(absdir))
+
+    def test_scansourcedirs_symlinked_document(self):
+        ex = example.ex_linuxdoc_dir
+        reldir, absdir = self.adddir('LDP/howto')
+        stem = os.path.basename(os.path.dirname(ex.filename))
+        os.symlink(os.path.dirname(ex.filename), os.path.join(absdir, stem))
+        s = scansourcedirs([absdir])
+        self.assertEqual([stem], list(s.keys()))
+
+
 class Test_arg_issourcedoc(unittest.TestCase):
 
     def test_arg_issourcedoc_fromdir(self):
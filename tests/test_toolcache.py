@@ -0,0 +1,134 @@
+# -*- coding: utf8 -*-
+#
+# Copyright (c) 2016 Linux Documentation Project
+
+from __future__ import absolute_import, division, print_function
+from __future__ import unicode_literals
+
+import os
+import time
+import codecs
+from argparse import Namespace
+
+from tldptesttools import TestToolsFilesystem
+
+# -- SUT
+from tldp.toolcache import ToolCache
+from tldp.utils import LazyDefault, resolvedefaults, which
+
+opj = os.path.join
+
+
+class TestToolCache(TestToolsFilesystem):
+
+    def setUp(self):
+        super(TestToolCache, self).setUp()
+        self.oldpath = os.environ.get('PATH')
+        _, self.bindir = self.adddir('bin')
+        os.environ['PATH'] = self.bindir
+        self.backdate(self.bindir)
+
+    def tearDown(self):
+        os.environ['PATH'] = self.oldpath
+        super(TestToolCache, self).tearDown()
+
+    def backdate(self, name):
+        past = time.time() - 3600
+        os.utime(name, (past, past))
+
+    def addtool(self, name):
+        fname = opj(self.bindir, name)
+        with codecs.open(fname, 'w', encoding='utf-8') as f:
+            f.write('#! /bin/sh\n')
+        os.chmod(fname, 0o755)
+        self.backdate(self.bindir)
+        return fname
+
+    def test_roundtrip(self):
+        fname = self.addtool('frobnitz')
+        cachefile = opj(self.tempdir, 'subdir', 'tools.json')
+        cache = ToolCache(cachefile)
+        self.assertEqual(fname, cache.which('frobnitz'))
+        self.assertIsNone(cache.which('wabbit'))
+        cache.save()
+        cache = ToolCache(cachefile)
+        self.assertEqual(dict(frobnitz=fname, wabbit=None), cache.entries)
+        self.assertFalse(cache.dirty)
+
+    def test_new_tool_invalidates(self):
+        cachefile = opj(self.tempdir, 'tools.json')
+        cache = ToolCache(cachefile)
+        self.assertIsNone(cache.which('frobnitz'))
+        cache.save()
+        fname = self.addtool('frobnitz')
+        os.utime(self.bindir, None)
+        cache = ToolCache(cachefile)
+        self.assertEqual(dict(), cache.entries)
+        self.assertEqual(fname, cache.which('frobnitz'))
+
+    def test_paths_kept_apart(self):
+        fname = self.addtool('frobnitz')
+        cachefile = opj(self.tempdir, 'tools.json')
+        cache = ToolCache(cachefile)
+        self.assertEqual(fname, cache.which('frobnitz'))
+        cache.save()
+        _, otherbin = self.adddir('otherbin')
+        self.backdate(otherbin)
+        os.environ['PATH'] = otherbin
+        cache = ToolCache(cachefile)
+        self.assertEqual(dict(), cache.entries)
+        self.assertIsNone(cache.which('frobnitz'))
+        cache.save()
+        os.environ['PATH'] = self.bindir
+        cache = ToolCache(cachefile)
+        self.assertEqual(dict(frobnitz=fname), cache.entries)
+        self.assertFalse(cache.dirty)
+
+    def test_least_recently_used_paths_dropped(self):
+        cachefile = opj(self.tempdir, 'tools.json')
+        for x in range(ToolCache.maxpaths + 1):
+            _, bindir = self.adddir('bin%d' % (x,))
+            os.environ['PATH'] = bindir
+            cache = ToolCache(cachefile)
+            cache.which('frobnitz')
+            cache.save()
+        self.assertEqual(ToolCache.maxpaths, len(cache.read()))
+        self.assertFalse(opj(self.tempdir, 'bin0') in cache.read())
+
+    def test_unwritable_cache(self):
+        notadir = opj(self.tempdir, 'notadir')
+        open(notadir, 'w').close()
+        cache = ToolCache(opj(notadir, 'tools.json'))
+        self.assertIsNone(cache.which('frobnitz'))
+        with self.assertLogs('tldp.toolcache', level='WARNING'):
+            self.assertFalse(cache.save())
+
+    def test_removed_tool(self):
+        fname = self.addtool('frobnitz')
+        cache = ToolCache(opj(self.tempdir, 'tools.json'))
+        self.assertEqual(fname, cache.which('frobnitz'))
+        os.unlink(fname)
+        self.assertIsNone(cache.which('frobnitz'))
+
+    def test_corrupt_cache(self):
+        cachefile = opj(self.tempdir, 'tools.json')
+        with codecs.open(cachefile, 'w', encoding='utf-8') as f:
+            f.write('{"version": 1, "entr')
+        cache = ToolCache(cachefile)
+        self.assertEqual(dict(), cache.entries)
+
+    def test_lazydefault(self):
+        fname = self.addtool('frobnitz')
+        cache = ToolCache(opj(self.tempdir, 'tools.json'))
+        config = Namespace(frobnitz=LazyDefault(which, 'frobnitz'),
+                           wabbit=LazyDefault(which, 'wabbit'),
+                           given='/usr/bin/frobnitz')
+        self.assertEqual(fname, str(config.frobnitz))
+        resolvedefaults(config, ['frobnitz', 'given', 'absent'], cache)
+        self.assertEqual(fname, config.frobnitz)
+        self.assertEqual('/usr/bin/frobnitz', config.given)
+        self.assertIsInstance(config.wabbit, LazyDefault)
+        self.assertEqual(['frobnitz'], list(cache.entries))
+
+#
+# -- end of file
@@ -8,6 +8,7 @@ from __future__ import unicode_literals
 import os
 import stat
 import uuid
+import hashlib
 import errno
 import posix
 import unittest
@@ -19,11 +20,14 @@ from tldptesttools import TestToolsFilesystem
 # -- SUT
 from tldp.utils import which, execute
 from tldp.utils import statfile, statfiles, stem_and_ext
+from tldp.utils import md5file, md5files
+from tldp.utils import listentries, walkfiles
 from tldp.utils import arg_isexecutable, isexecutable
 from tldp.utils import arg_isreadablefile, isreadablefile
 from tldp.utils import arg_isdirectory, arg_isloglevel
 from tldp.utils import arg_isstr
 from tldp.utils import swapdirs
+from tldp.utils import writetext, UMASK
 
 
 class Test_isexecutable_and_friends(unittest.TestCase):
@@ -202,6 +206,71 @@ class Test_statfiles(unittest.TestCase):
         self.assertEqual(0, len(statinfo))
 
 
+class Test_walkfiles(TestToolsFilesystem):
+
+    def test_listentries_enoent(self):
+        this = os.path.join(self.tempdir, str(uuid.uuid4()))
+        self.assertEqual([], listentries(this))
+
+    def test_listentries_sorted(self):
+        for name in ('b', 'C', 'a'):
+            os.mkdir(os.path.join(self.tempdir, name))
+        names = [x.name for x in listentries(self.tempdir)]
+        self.assertEqual(['C', 'a', 'b'], names)
+        names = [x.name for x in listentries(self.tempdir,
+                                             key=lambda x: x.name.lower())]
+        self.assertEqual(['a', 'b', 'C'], names)
+
+    def test_walkfiles_skips_dirs_and_dirlinks(self):
+        sub = os.path.join(self.tempdir, 'sub', 'subsub')
+        os.makedirs(sub)
+        expected = set()
+        for dirname in (self.tempdir, sub):
+            f = ntf(dir=dirname, delete=False)
+            f.close()
+            expected.add(f.name)
+        os.symlink(sub, os.path.join(self.tempdir, 'dirlink'))
+        filelink = os.path.join(self.tempdir, 'filelink')
+        os.symlink(f.name, filelink)
+        expected.add(filelink)
+        found = set(x.path for x in walkfiles(self.tempdir))
+        self.assertEqual(expected, found)
+        self.assertEqual(expected, set(statfiles(self.tempdir)))
+
+
+class Test_md5file(TestToolsFilesystem):
+
+    def setUp(self):
+        super(Test_md5file, self).setUp()
+        self.content = os.urandom(3 * 4096 + 17)
+        self.expected = hashlib.md5(self.content).hexdigest()
+        f = ntf(dir=self.tempdir, delete=False)
+        f.write(self.content)
+        f.close()
+        self.fname = f.name
+
+    def test_md5file_small_bufsize(self):
+        self.assertEqual(self.expected, md5file(self.fname, bufsize=100))
+
+    def test_md5file_mmap(self):
+        md5 = md5file(self.fname, bufsize=100, mmapsize=1)
+        self.assertEqual(self.expected, md5)
+
+    def test_md5file_empty_mmap(self):
+        f = ntf(dir=self.tempdir)
+        self.assertEqual(hashlib.md5().hexdigest(), md5file(f.name, mmapsize=1))
+
+
+class Test_md5files(unittest.TestCase):
+
+    def test_md5files_jobs_identical(self):
+        here = os.path.dirname(os.path.abspath(__file__))
+        serial = md5files(here, relative=here)
+        threaded = md5files(here, relative=here, jobs=4)
+        self.assertTrue(os.path.basename(__file__) in serial)
+        self.assertEqual(serial, threaded)
+
+
 class Test_statfile(TestToolsFilesystem):
 
     def test_statfile_bogustype(self):
@@ -239,6 +308,18 @@ class Test_stem_and_ext(unittest.TestCase):
         self.assertEqual(r0, r1)
 
 
+class Test_writetext(TestToolsFilesystem):
+
+    def test_writetext_mode(self):
+        fname = os.path.join(self.tempdir, '.LDP-manifest.json')
+        writetext(fname, '{}')
+        mode = stat.S_IMODE(os.stat(fname).st_mode)
+        self.assertEqual(0o666 & ~UMASK, mode)
+        with open(fname) as f:
+            self.assertEqual('{}', f.read())
+        self.assertEqual(['.LDP-manifest.json'], os.listdir(self.tempdir))
+
+
 class Test_swapdirs(TestToolsFilesystem):
 
     def test_swapdirs_bogusarg(self):
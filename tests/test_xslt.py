@@ -0,0 +1,194 @@
+# -*- coding: utf8 -*-
+#
+# Copyright (c) 2016 Linux Documentation Project
+
+from __future__ import absolute_import, division, print_function
+from __future__ import unicode_literals
+
+import io
+import os
+import codecs
+import unittest
+import threading
+import subprocess
+from argparse import Namespace
+
+from tldptesttools import TestToolsFilesystem
+from tldp.utils import which
+
+# -- Test Data
+import example
+
+# -- SUT
+from tldp import xslt
+from tldp.sources import SourceDocument
+from tldp.outputs import OutputDirectory
+
+opj = os.path.join
+
+stylesheet = '''<?xml version="1.0"?>
+<xsl:stylesheet version="1.0"
+    xmlns:xsl="http://www.w3.org/1999/XSL/Transform"
+    xmlns:exsl="http://exslt.org/common"
+    extension-element-prefixes="exsl">
+  <xsl:output method="html" encoding="ISO-8859-1"/>
+  <xsl:param name="base.dir" select="''"/>
+  <xsl:param name="title" select="'none'"/>
+  <xsl:template match="/">
+    <exsl:document href="{$base.dir}chunk.html" method="html">
+      <p><xsl:value-of select="count(//para)"/></p>
+    </exsl:document>
+    <html><head><title><xsl:value-of select="$title"/></title></head>
+    <body><xsl:copy-of select="//para"/></body></html>
+  </xsl:template>
+</xsl:stylesheet>
+'''
+
+fostylesheet = '''<?xml version="1.0"?>
+<xsl:stylesheet version="1.0"
+    xmlns:xsl="http://www.w3.org/1999/XSL/Transform"
+    xmlns:fo="http://www.w3.org/1999/XSL/Format">
+  <xsl:template match="/">
+    <fo:root><fo:block><xsl:value-of select="//para"/></fo:block></fo:root>
+  </xsl:template>
+</xsl:stylesheet>
+'''
+
+document = '''<?xml version="1.0"?>
+<article><para>Fr&#246;bnitz</para><para><![CDATA[<wabbit>]]></para></article>
+'''
+
+
+class TestXSLTCommand(TestToolsFilesystem):
+
+    def test_xsltproc_command(self):
+        reldir, absdir = self.adddir('Frobnitz-HOWTO')
+        _, fname = self.addfile(reldir, example.ex_docbook4xml.filename,
+                                stem='Frobnitz-HOWTO')
+        source = SourceDocument(fname)
+        _, pubdir = self.adddir('pubdir')
+        output = OutputDirectory.fromsource(pubdir, source)
+        config = Namespace(script=True, build=False, resources=['images'],
+                           xslt_engine=xslt.LXML,
+                           docbook4xml_xsltproc='/usr/bin/xsltproc',
+                           docbook4xml_xslsingle='single.xsl')
+        runner = source.doctype(source=source, output=output, config=config)
+        f = io.StringIO()
+        self.assertTrue(runner.make_name_htmls(file=f))
+        expected = '/usr/bin/xsltproc --nonet ' \
+            '--stringparam admon.graphics.path images/ ' \
+            '--stringparam base.dir . single.xsl %s > %s' % \
+            (output.validsource, output.name_htmls)
+        self.assertEqual(expected, f.getvalue().strip())
+
+
+@unittest.skipUnless(xslt.available(), 'requires lxml')
+class TestXSLTInProcess(TestToolsFilesystem):
+
+    def setUp(self):
+        super(TestXSLTInProcess, self).setUp()
+        xslt.stylesheets.clear()
+        xslt.sources.clear()
+        self.xsl = opj(self.tempdir, 'test.xsl')
+        self.xml = opj(self.tempdir, 'test.xml')
+        self.fo = opj(self.tempdir, 'fo.xsl')
+        for fname, content in ((self.xsl, stylesheet), (self.xml, document),
+                               (self.fo, fostylesheet)):
+            with codecs.open(fname, 'w', encoding='utf-8') as f:
+                f.write(content)
+
+    def transform(self, dirname):
+        _, absdir = self.adddir(dirname)
+        params = [('title', 'Frobnitz'), ('base.dir', absdir + '/')]
+        output = opj(absdir, 'index.html')
+        self.assertTrue(xslt.transform(self.xsl, self.xml, params, output))
+        return absdir
+
+    def compilations(self, logs):
+        return len([x for x in logs.output if 'Compiling stylesheet' in x])
+
+    def test_compiled_once(self):
+        with self.assertLogs('tldp.xslt', level='DEBUG') as logs:
+            self.transform('first')
+            self.transform('second')
+        self.assertEqual(1, self.compilations(logs))
+        parses = [x for x in logs.output if 'Parsing source' in x]
+        self.assertEqual(1, len(parses))
+        for name in ('index.html', 'chunk.html'):
+            self.assertTrue(os.path.isfile(opj(self.tempdir, 'second', name)))
+
+    def test_unwritable_output(self):
+        params = [('base.dir', self.tempdir + '/')]
+        output = opj(self.xml, 'index.html')
+        with self.assertLogs('tldp.xslt', level='ERROR'):
+            self.assertFalse(xslt.transform(self.xsl, self.xml, params,
+                                            output))
+
+    def runner(self, stem):
+        reldir, absdir = self.adddir(stem)
+        _, fname = self.addfile(reldir, example.ex_docbook4xml.filename,
+                                stem=stem)
+        source = SourceDocument(fname)
+        _, pubdir = self.adddir('pubdir-' + stem)
+        output = OutputDirectory.fromsource(pubdir, source)
+        os.makedirs(output.logdir)
+        with codecs.open(output.validsource, 'w', encoding='utf-8') as f:
+            f.write(document)
+        config = Namespace(script=False, build=True, resources=['images'],
+                           xslt_engine=xslt.LXML,
+                           docbook4xml_xsltproc=None,
+                           docbook4xml_xslsingle=self.xsl,
+                           docbook4xml_xslchunk=self.xsl,
+                           docbook4xml_xslprint=self.fo)
+        return source.doctype(source=source, output=output, config=config)
+
+    def test_compiled_once_for_two_documents(self):
+        results = list()
+        with self.assertLogs('tldp.xslt', level='DEBUG') as logs:
+            for stem in ('Frobnitz-HOWTO', 'Wabbit-HOWTO'):
+                runner = self.runner(stem)
+                # -- each document in a new thread, as with --step-jobs
+                thread = threading.Thread(
+                    target=lambda: results.append(runner.make_name_htmls()))
+                thread.start()
+                thread.join()
+        self.assertEqual([True, True], results)
+        self.assertEqual(1, self.compilations(logs))
+
+    def test_doctype_steps(self):
+        runner = self.runner('Frobnitz-HOWTO')
+        output = runner.output
+        self.assertTrue(runner.make_name_htmls())
+        self.assertTrue(os.path.isfile(output.name_htmls))
+        self.assertTrue(runner.make_chunked_html())
+        self.assertTrue(os.path.isfile(opj(output.dirname, 'chunk.html')))
+
+    def test_parsed_once_for_all_steps(self):
+        runner = self.runner('Frobnitz-HOWTO')
+        with self.assertLogs('tldp.xslt', level='DEBUG') as logs:
+            self.assertTrue(runner.make_chunked_html())
+            self.assertTrue(runner.make_fo())
+            self.assertTrue(runner.make_name_htmls())
+        parses = [x for x in logs.output if 'Parsing source' in x]
+        self.assertEqual(1, len(parses))
+
+    def test_failure(self):
+        self.assertFalse(xslt.transform(self.xml, self.xml, []))
+
+    @unittest.skipUnless(which('xsltproc'), 'requires xsltproc')
+    def test_same_as_xsltproc(self):
+        inprocess = self.transform('lxml')
+        _, absdir = self.adddir('xsltproc')
+        with open(opj(absdir, 'index.html'), 'wb') as f:
+            subprocess.check_call([which('xsltproc'), '--nonet',
+                                   '--stringparam', 'title', 'Frobnitz',
+                                   '--stringparam', 'base.dir', absdir + '/',
+                                   self.xsl, self.xml], stdout=f)
+        for name in ('index.html', 'chunk.html'):
+            with open(opj(inprocess, name), 'rb') as f:
+                expected = f.read()
+            with open(opj(absdir, name), 'rb') as f:
+                self.assertEqual(expected, f.read())
+
+#
+# -- end of file
@@ -172,10 +172,17 @@ class TestInventoryBase(unittest.TestCase):
         c.pubdir = os.path.join(self.tempdir, 'outputs')
         c.builddir = os.path.join(self.tempdir, 'builddir')
         c.sourcedir = os.path.join(self.tempdir, 'sources')
+        c.artifact_cache = os.path.join(self.tempdir, 'artifacts')
+        c.xml_catalog = os.path.join(self.tempdir, 'catalog.xml')
+        self.xmlcatalogfiles = os.environ.get('XML_CATALOG_FILES')
         argv = list()
         argv.extend(['--builddir', c.builddir])
         argv.extend(['--pubdir', c.pubdir])
         argv.extend(['--sourcedir', c.sourcedir])
+        argv.extend(['--hash-cache', opj(self.tempdir, 'hashcache.json')])
+        argv.extend(['--tool-cache', opj(self.tempdir, 'tools.json')])
+        argv.extend(['--artifact-cache', c.artifact_cache])
+        argv.extend(['--xml-catalog', c.xml_catalog])
         self.argv = argv
         # -- and make some directories
         for d in (c.sourcedir, c.pubdir, c.builddir):
@@ -184,6 +191,10 @@ class TestInventoryBase(unittest.TestCase):
         c.sourcedir = [c.sourcedir]
 
     def tearDown(self):
+        if self.xmlcatalogfiles is None:
+            os.environ.pop('XML_CATALOG_FILES', None)
+        else:
+            os.environ['XML_CATALOG_FILES'] = self.xmlcatalogfiles
         self.removeTempdir()
 
     def makeTempdir(self):
@@ -0,0 +1,184 @@
+#! /usr/bin/python
+# -*- coding: utf8 -*-
+#
+# Copyright (c) 2016 Linux Documentation Project
+
+from __future__ import absolute_import, division, print_function
+from __future__ import unicode_literals
+
+import os
+import json
+import time
+import errno
+import codecs
+import shutil
+import hashlib
+import logging
+from tempfile import mkdtemp
+
+from tldp.utils import writejson, walkfiles, linkorcopy
+
+logger = logging.getLogger(__name__)
+
+METADATA = 'artifact.json'
+FILES = 'files'
+
+
+def fingerprintkey(fingerprint):
+    '''return the cache key (a SHA-256 hex digest) for a fingerprint'''
+    s = json.dumps(fingerprint, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(s.encode('utf-8')).hexdigest()
+
+
+class ArtifactCache(object):
+    '''a content-addressed, size-capped store of complete document outputs
+
+    The key of each entry is derived from everything which determines the
+    outputs of a build:  the source MD5SUMS, the doctype, the relevant
+    configuration and the contents of the configured tools and stylesheets
+    (see BaseDoctype.fingerprint).  If the key of a document is found, the
+    outputs are hardlinked (or, across filesystems, copied) into the output
+    directory instead of running the toolchain.
+
+    Since outputs may share their inodes with the cache, they must never be
+    modified in place; every build starts by removing the output directory.
+
+    Each entry is a directory holding the output files and a small JSON
+    metadata file.  An entry is assembled in a temporary directory and
+    renamed into place, so concurrent builds (see --jobs) can never see a
+    partial entry.  The modification time of the metadata file records the
+    last use of the entry; trim() removes least recently used entries until
+    the cache fits into maxsize bytes.
+    '''
+
+    def __repr__(self):
+        return '<%s:%s>' % (self.__class__.__name__, self.dirname)
+
+    def __init__(self, dirname, maxsize):
+        self.dirname = os.path.abspath(dirname)
+        self.maxsize = maxsize
+        self.copying = False
+        if not os.path.isdir(self.dirname):
+            os.makedirs(self.dirname)
+
+    def linkorcopy(self, src, dst):
+        '''linkorcopy(); say so (once) if files must be copied'''
+        if not linkorcopy(src, dst) and not self.copying:
+            self.copying = True
+            logger.warning("Cannot hardlink %s to %s, copying files to and "
+                           "from the artifact cache instead.", src, dst)
+
+    def metadata(self, key):
+        '''return the metadata of the entry for key (or None)'''
+        fname = os.path.join(self.dirname, key, METADATA)
+        try:
+            with codecs.open(fname, encoding='utf-8') as f:
+                return json.load(f)
+        except IOError as e:
+            if e.errno != errno.ENOENT:
+                logger.warning("Could not read cache entry %s: %s", fname, e)
+        except ValueError as e:
+            logger.warning("Ignoring corrupt cache entry %s: %s", fname, e)
+        return None
+
+    def restore(self, key, dirname):
+        '''materialize the files of the entry for key into dirname
+
+        Returns True if the entry exists and all files were restored.
+        '''
+        meta = self.metadata(key)
+        if meta is None:
+            return False
+        files = os.path.join(self.dirname, key, FILES)
+        restored = list()
+        try:
+            for relpath in meta['files']:
+                dst = os.path.join(dirname, relpath)
+                if not os.path.isdir(os.path.dirname(dst)):
+                    os.makedirs(os.path.dirname(dst))
+                self.linkorcopy(os.path.join(files, relpath), dst)
+                restored.append(dst)
+        except (OSError, IOError) as e:
+            logger.warning("%s could not restore cache entry %s: %s",
+                           meta.get('stem'), key, e)
+            # -- a build overwriting a hardlinked file would corrupt the entry
+            #
+            for dst in restored:
+                os.unlink(dst)
+            return False
+        meta['hits'] = meta.get('hits', 0) + 1
+        try:
+            writejson(os.path.join(self.dirname, key, METADATA), meta)
+        except (OSError, IOError) as e:
+            logger.debug("Could not update cache entry %s: %s", key, e)
+        return True
+
+    def store(self, key, dirname, exclude=(), **kwargs):
+        '''add the files in dirname (except those below exclude) as key
+
+        Extra keyword arguments (e.g. the stem) are kept in the metadata.
+        Returns True if the entry was added.
+        '''
+        if os.path.isdir(os.path.join(self.dirname, key)):
+            return False
+        exclude = [os.path.join(os.path.abspath(x), '') for x in exclude]
+        dirname = os.path.abspath(dirname)
+        tempdir = mkdtemp(prefix='.tmp-', dir=self.dirname)
+        try:
+            files, size = list(), 0
+            for entry in walkfiles(dirname):
+                if any(entry.path.startswith(x) for x in exclude):
+                    continue
+                relpath = os.path.relpath(entry.path, dirname)
+                dst = os.path.join(tempdir, FILES, relpath)
+                if not os.path.isdir(os.path.dirname(dst)):
+                    os.makedirs(os.path.dirname(dst))
+                self.linkorcopy(entry.path, dst)
+                files.append(relpath)
+                size += entry.stat(follow_symlinks=False).st_size
+            meta = dict(kwargs, files=sorted(files), size=size, hits=0,
+                        created=time.time())
+            writejson(os.path.join(tempdir, METADATA), meta)
+            os.rename(tempdir, os.path.join(self.dirname, key))
+        except (OSError, IOError) as e:
+            shutil.rmtree(tempdir, ignore_errors=True)
+            logger.warning("Could not add %s to the artifact cache: %s",
+                           kwargs.get('stem', dirname), e)
+            return False
+        return True
+
+    def entries(self):
+        '''return list of (key, metadata, last use) of all entries'''
+        result = list()
+        for key in sorted(os.listdir(self.dirname)):
+            if key.startswith('.'):
+                continue
+            meta = self.metadata(key)
+            if meta is None:
+                continue
+            try:
+                used = os.stat(os.path.join(self.dirname, key, METADATA))
+            except OSError:
+                continue
+            result.append((key, meta, used.st_mtime))
+        return result
+
+    def trim(self):
+        '''remove least recently used entries until within maxsize
+
+        Returns the number of entries removed.
+        '''
+        entries = sorted(self.entries(), key=lambda x: x[2])
+        total = sum(meta['size'] for _, meta, _ in entries)
+        removed = 0
+        while entries and total > self.maxsize:
+            key, meta, _ = entries.pop(0)
+            logger.debug("Evicting %s (%s) from the artifact cache.",
+                         key, meta.get('stem'))
+            shutil.rmtree(os.path.join(self.dirname, key), ignore_errors=True)
+            total -= meta['size']
+            removed += 1
+        return removed
+
+#
+# -- end of file
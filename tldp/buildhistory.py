@@ -0,0 +1,190 @@
+#! /usr/bin/python
+# -*- coding: utf8 -*-
+#
+# Copyright (c) 2016 Linux Documentation Project
+
+from __future__ import absolute_import, division, print_function
+from __future__ import unicode_literals
+
+import os
+import time
+import sqlite3
+import logging
+import collections
+
+logger = logging.getLogger(__name__)
+
+schema = '''
+CREATE TABLE IF NOT EXISTS runs (
+    run INTEGER PRIMARY KEY,
+    started REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS documents (
+    run INTEGER NOT NULL,
+    stem TEXT NOT NULL,
+    doctype TEXT NOT NULL,
+    wall REAL NOT NULL,
+    cpu REAL NOT NULL,
+    status INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS steps (
+    run INTEGER NOT NULL,
+    stem TEXT NOT NULL,
+    doctype TEXT NOT NULL,
+    step TEXT NOT NULL,
+    wall REAL NOT NULL,
+    cpu REAL NOT NULL,
+    status INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS backends (
+    stem TEXT NOT NULL,
+    name TEXT NOT NULL,
+    key TEXT NOT NULL,
+    backend TEXT NOT NULL,
+    PRIMARY KEY (stem, name)
+);
+CREATE INDEX IF NOT EXISTS documents_stem ON documents (stem, run);
+CREATE INDEX IF NOT EXISTS steps_stem ON steps (stem, step, run);
+'''
+
+# -- one row of the --timing-report; walls are oldest first
+#
+TimingSummary = collections.namedtuple('TimingSummary',
+                                       ['name', 'doctype', 'mean', 'last',
+                                        'cpu', 'walls'])
+
+
+class BuildHistory(object):
+    '''a local SQLite record of the wall time, CPU time and exit status of
+    every document build and build step
+
+    Each invocation of ldptool which builds anything is a "run".  For every
+    document built in the run, the time taken by the whole build and by each
+    of its build steps is recorded.  The history is used to start the most
+    expensive documents first in a parallel build and to produce the
+    --timing-report.  Only the most recent keep runs are retained.
+
+    The history also remembers, for each document, which of several
+    alternative backends (e.g. FOP or dblatex for the PDF) last succeeded,
+    under a key identifying the source and the tools (see
+    BaseDoctype.firstsuccessful).  These are kept until they are replaced,
+    or forgotten with forgetbackends().
+    '''
+    keep = 50
+
+    def __repr__(self):
+        return '<%s:%s>' % (self.__class__.__name__, self.filename)
+
+    def __init__(self, filename):
+        self.filename = os.path.abspath(filename)
+        self.run = None
+        self.db = sqlite3.connect(self.filename)
+        self.db.executescript(schema)
+        # -- read all at once; forked build processes must not use self.db
+        self.memo = dict(((stem, name), (key, backend)) for
+                         stem, name, key, backend in
+                         self.db.execute('SELECT stem, name, key, backend '
+                                         'FROM backends'))
+
+    def close(self):
+        '''forget all but the last keep runs; close the database'''
+        if self.run is not None:
+            oldest = self.run - self.keep
+            with self.db:
+                for table in ('runs', 'documents', 'steps'):
+                    self.db.execute('DELETE FROM %s WHERE run <= ?' % (table,),
+                                    (oldest,))
+        self.db.close()
+
+    def record(self, stem, doctype, timing, steps):
+        '''remember the Timing of a document build and of each of its steps'''
+        with self.db:
+            if self.run is None:
+                cursor = self.db.execute('INSERT INTO runs (started) '
+                                         'VALUES (?)', (time.time(),))
+                self.run = cursor.lastrowid
+            self.db.execute('INSERT INTO documents VALUES (?, ?, ?, ?, ?, ?)',
+                            (self.run, stem, doctype, timing.wall,
+                             timing.cpu, timing.status))
+            self.db.executemany('INSERT INTO steps '
+                                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                [(self.run, stem, doctype, step.name,
+                                  step.wall, step.cpu, step.status)
+                                 for step in steps])
+
+    def backend(self, stem, name, key):
+        '''return the backend which last succeeded with key (or None)'''
+        known, backend = self.memo.get((stem, name), (None, None))
+        if known != key:
+            return None
+        return backend
+
+    def backends(self, stem):
+        '''return dict of name -> backend, as remembered for stem'''
+        return dict((name, backend) for (x, name), (key, backend)
+                    in self.memo.items() if x == stem)
+
+    def recordbackend(self, stem, name, key, backend):
+        '''remember that backend succeeded (for name) for stem and key'''
+        with self.db:
+            self.db.execute('INSERT OR REPLACE INTO backends '
+                            'VALUES (?, ?, ?, ?)', (stem, name, key, backend))
+        self.memo[(stem, name)] = (key, backend)
+
+    def forgetbackends(self, stems):
+        '''forget the remembered backends of stems; return how many'''
+        stems = set(stems)
+        forget = [x for x in self.memo if x[0] in stems]
+        with self.db:
+            self.db.executemany('DELETE FROM backends '
+                                'WHERE stem = ? AND name = ?', forget)
+        for x in forget:
+            del self.memo[x]
+        return len(forget)
+
+    def estimates(self, runs=5):
+        '''return dict of stem -> mean wall time of the last successful builds
+
+        Documents which have never been built successfully are absent.
+        '''
+        return dict((x.name, x.mean) for x in self.documents(runs=runs))
+
+    def documents(self, runs=5):
+        '''return a TimingSummary of the last successful builds of each stem'''
+        rows = self.db.execute('SELECT stem, doctype, wall, cpu '
+                               'FROM documents WHERE status = 0 '
+                               'ORDER BY run DESC')
+        return summarize(rows, runs)
+
+    def steps(self, runs=5):
+        '''return a TimingSummary of the last successful runs of each step
+
+        The name of each step is stem.step, e.g. Frobnitz-HOWTO.make_pdf.
+        '''
+        rows = self.db.execute("SELECT stem || '.' || step, doctype, "
+                               'wall, cpu FROM steps WHERE status = 0 '
+                               'ORDER BY run DESC')
+        return summarize(rows, runs)
+
+
+def summarize(rows, runs):
+    '''collect the first runs (name, doctype, wall, cpu) rows for each name
+
+    Returns a list of TimingSummary, slowest first.
+    '''
+    collected = collections.OrderedDict()
+    for name, doctype, wall, cpu in rows:
+        entry = collected.setdefault(name, (doctype, list(), list()))
+        if len(entry[1]) < runs:
+            entry[1].append(wall)
+            entry[2].append(cpu)
+    result = list()
+    for name, (doctype, walls, cpus) in collected.items():
+        walls.reverse()
+        result.append(TimingSummary(name, doctype, sum(walls) / len(walls),
+                                    walls[-1], sum(cpus) / len(cpus), walls))
+    result.sort(key=lambda x: x.mean, reverse=True)
+    return result
+
+#
+# -- end of file
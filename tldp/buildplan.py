@@ -0,0 +1,186 @@
+#! /usr/bin/python
+# -*- coding: utf8 -*-
+#
+# Copyright (c) 2016 Linux Documentation Project
+
+from __future__ import absolute_import, division, print_function
+from __future__ import unicode_literals
+
+import os
+import sys
+import shlex
+import logging
+import collections
+
+logger = logging.getLogger(__name__)
+
+# -- a build step: the names of the steps it depends on, the directory in
+#    which its commands run (or None) and the list of its shell scripts
+#
+PlanStep = collections.namedtuple('PlanStep',
+                                  ['name', 'depends', 'cwd', 'commands'])
+
+# -- all steps of one document; the first step (prepare) depends on the
+#    source files (inputs); each step records its success in a stamp file
+#    in stampdir (outside the published output directory); the outputs are
+#    the files the document publishes
+#
+Plan = collections.namedtuple('Plan', ['stem', 'inputs', 'stampdir', 'steps',
+                                       'outputs'])
+
+PREPARE = 'prepare'
+
+SHELL = '/bin/bash'
+SHELLFLAGS = '-e -o pipefail -c'
+
+# -- the shell program of every step:  its lines are the arguments, so that
+#    they reach bash unchanged (cf. shellcommand())
+#
+RUNSCRIPT = 'eval "$(printf \'%s\\n\' "$@")"'
+
+
+def stamp(plan, name):
+    '''return the name of the stamp file of the step name'''
+    return os.path.join(plan.stampdir, name + '.stamp')
+
+
+def shellcommand(step):
+    '''return the scripts of a step as a single line of shell (or '')
+
+    Every line of the scripts is passed, unchanged, as an argument to a bash
+    (with -e, as does the bash --script), which joins them up again and
+    runs the result; so continuation lines, if/then, for/do or here
+    documents work just as they do in the bash --script.
+    '''
+    lines = list()
+    for script in step.commands:
+        lines.extend(script.split('\n'))
+    if not [x for x in lines if x.strip()]:
+        return ''
+    if step.cwd:
+        lines.insert(0, 'cd -- %s' % (shlex.quote(step.cwd),))
+    return ' '.join([SHELL, SHELLFLAGS, shlex.quote(RUNSCRIPT), 'ldpstep'] +
+                    [shlex.quote(x) for x in lines])
+
+
+def steporder(plan):
+    '''yield (step, targets, input names) for each step in plan
+
+    The published outputs are targets of the prepare step (besides its
+    stamp), so that a missing output, or one older than the sources, runs
+    the whole build of the document again.
+    '''
+    for step in plan.steps:
+        targets = [stamp(plan, step.name)]
+        if step.name == PREPARE:
+            targets.extend(plan.outputs)
+        if step.depends:
+            yield step, targets, [stamp(plan, x) for x in step.depends]
+        else:
+            yield step, targets, plan.inputs
+
+
+def finalsteps(plan):
+    '''return the stamp files of the steps on which no other step depends'''
+    required = set()
+    for step in plan.steps:
+        required.update(step.depends)
+    return [stamp(plan, x.name) for x in plan.steps if x.name not in required]
+
+
+def assignments(environ):
+    '''return the environ (a dict) as shell variable assignments'''
+    return ' '.join(['%s=%s' % (k, shlex.quote(v))
+                     for k, v in sorted(environ.items())])
+
+
+def ninjapath(name):
+    return name.replace('$', '$$').replace(' ', '$ ').replace(':', '$:')
+
+
+def makepath(name):
+    for c in '\\ :#':
+        name = name.replace(c, '\\' + c)
+    return name.replace('$', '$$')
+
+
+def ninja(plans, file=sys.stdout, environ=None):
+    '''write a build.ninja for plans; run it with "ninja -f FILE -j N"
+
+    Each step runs with the variables of environ (a dict, e.g. the
+    XML_CATALOG_FILES) set.
+    '''
+    env = ''
+    if environ:
+        env = 'env %s ' % (assignments(environ).replace('$', '$$'),)
+    print('# -- ldptool build plan; run with: ninja -f FILE [-j JOBS]',
+          file=file)
+    print('ninja_required_version = 1.3', file=file)
+    print('', file=file)
+    print('rule ldpstep', file=file)
+    print('  command = %s$script && touch -- "$stamp"' % (env,), file=file)
+    print('  description = $stem $step', file=file)
+    for plan in plans:
+        print('', file=file)
+        for step, targets, inputs in steporder(plan):
+            print('build %s: ldpstep %s' % (
+                  ' '.join([ninjapath(x) for x in targets]),
+                  ' '.join([ninjapath(x) for x in inputs])), file=file)
+            print('  stem = %s' % (plan.stem,), file=file)
+            print('  step = %s' % (step.name,), file=file)
+            name = stamp(plan, step.name).replace('$', '$$')
+            print('  stamp = %s' % (name,), file=file)
+            script = shellcommand(step) or ':'
+            print('  script = %s' % (script.replace('$', '$$'),), file=file)
+        print('build %s: phony %s' % (ninjapath(plan.stem),
+              ' '.join([ninjapath(x) for x in finalsteps(plan)])), file=file)
+    if plans:
+        print('', file=file)
+        print('default %s' % (' '.join([ninjapath(x.stem) for x in plans]),),
+              file=file)
+
+
+def makefile(plans, file=sys.stdout, environ=None):
+    '''write a Makefile for plans; run it with "make -f FILE -j N"
+
+    Each step runs with the variables of environ (a dict, e.g. the
+    XML_CATALOG_FILES) exported.  The prepare step of each document is a
+    grouped target (of its stamp and the outputs), which needs GNU make 4.3.
+    '''
+    stems = ' '.join([makepath(x.stem) for x in plans])
+    print('# -- ldptool build plan; run with: make -f FILE [-j JOBS]',
+          file=file)
+    print('SHELL := %s' % (SHELL,), file=file)
+    print('.SHELLFLAGS := %s' % (SHELLFLAGS,), file=file)
+    for k, v in sorted((environ or dict()).items()):
+        v = v.replace('$', '$$').replace('#', '\\#')
+        print('export %s := %s' % (k, v), file=file)
+    print('', file=file)
+    print('.PHONY: all %s' % (stems,), file=file)
+    print('all: %s' % (stems,), file=file)
+    for plan in plans:
+        print('', file=file)
+        # -- make only looks at the outputs of the grouped prepare target
+        #    if they are wanted, so list them before the final steps
+        #
+        prereqs = plan.outputs + finalsteps(plan)
+        print('%s: %s' % (makepath(plan.stem),
+              ' '.join([makepath(x) for x in prereqs])), file=file)
+        for step, targets, inputs in steporder(plan):
+            print('', file=file)
+            rule = '&:' if len(targets) > 1 else ':'
+            print('%s %s %s' % (' '.join([makepath(x) for x in targets]),
+                  rule, ' '.join([makepath(x) for x in inputs])), file=file)
+            command = shellcommand(step)
+            if command:
+                print('\t' + command.replace('$', '$$'), file=file)
+            name = shlex.quote(stamp(plan, step.name)).replace('$', '$$')
+            print('\tmkdir -p -- %s && touch -- %s' % (
+                  shlex.quote(plan.stampdir).replace('$', '$$'), name),
+                  file=file)
+
+
+formats = collections.OrderedDict([('ninja', ninja), ('make', makefile)])
+
+#
+# -- end of file
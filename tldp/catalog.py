@@ -0,0 +1,235 @@
+#! /usr/bin/python
+# -*- coding: utf8 -*-
+#
+# Copyright (c) 2016 Linux Documentation Project
+
+from __future__ import absolute_import, division, print_function
+from __future__ import unicode_literals
+
+import os
+import re
+import codecs
+import logging
+from urllib.parse import urlsplit, quote
+
+from tldp.utils import isreadablefile, writetext
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_CATALOG = '/etc/xml/catalog'
+
+# -- the remote locations of the stylesheets, DTDs and schemas used by the
+#    doctypes (and by the LDP stylesheets, which import the DocBook XSL by
+#    URL), with the places where distributions install local copies
+#
+REWRITES = [
+    ('http://docbook.sourceforge.net/release/xsl/current/',
+     ['/usr/share/xml/docbook/stylesheet/docbook-xsl/',
+      '/usr/share/xml/docbook/stylesheet/nwalsh/current/',
+      '/usr/share/sgml/docbook/xsl-stylesheets/']),
+    ('http://docbook.sourceforge.net/release/xsl-ns/current/',
+     ['/usr/share/xml/docbook/stylesheet/docbook-xsl-ns/',
+      '/usr/share/xml/docbook/stylesheet/nwalsh5/current/',
+      '/usr/share/sgml/docbook/xsl-ns-stylesheets/']),
+    ('http://docbook.org/xml/5.0/rng/',
+     ['/usr/share/xml/docbook/schema/rng/5.0/']),
+    ]
+for version in ('4.1.2', '4.2', '4.4', '4.5'):
+    REWRITES.append(('http://www.oasis-open.org/docbook/xml/%s/' % (version,),
+                     ['/usr/share/xml/docbook/schema/dtd/%s/' % (version,),
+                      '/usr/share/sgml/docbook/xml-dtd-%s/' % (version,)]))
+
+# -- remote references in the head of a source document (the DTD) and in a
+#    stylesheet (imported or included stylesheets)
+#
+doctype_re = re.compile(r'<!DOCTYPE[^>\[]*?"(https?://[^"]+)"')
+import_re = re.compile(r'<xsl:(?:import|include)\s+href="(https?://[^"]+)"')
+href_re = re.compile(r'<xsl:(?:import|include)\s+href="([^"]+)"')
+
+# -- the imports of each stylesheet, as found by stylesheetimports()
+#
+importcache = dict()
+
+template = '''<?xml version="1.0"?>
+<!-- generated by ldptool; local copies of remote DocBook resources -->
+<catalog xmlns="urn:oasis:names:tc:entity:xmlns:xml:catalog">
+%s</catalog>
+'''
+
+
+def isremote(uri):
+    '''True if uri is an http(s) URL (rather than a local filename)'''
+    return uri.startswith('http://') or uri.startswith('https://')
+
+
+def remotereferences(fname, size=4096):
+    '''return the remote URLs referenced by a source document or stylesheet
+
+    Only the head (size bytes) of a document is read, for the DOCTYPE; a
+    stylesheet (.xsl) is read completely, for its imports and includes.
+    '''
+    with codecs.open(fname, encoding='utf-8', errors='replace') as f:
+        if fname.endswith('.xsl'):
+            return import_re.findall(f.read())
+        return doctype_re.findall(f.read(size))
+
+
+def fileurl(name):
+    '''return the file:// URL of the (absolute) local filename name'''
+    return 'file://' + quote(name)
+
+
+def stylesheetimports(fname, resolve=None):
+    '''return all stylesheets imported or included by the stylesheet fname
+
+    The imports of the imports are followed, too.  A relative href is
+    relative to the importing stylesheet; a remote one is looked up with
+    resolve (e.g. XMLCatalog.resolve), and is returned as a URL if it has
+    no local copy.  The imports of a stylesheet are only read once per
+    process (unless it changes).
+
+    Returns a sorted list of filenames (and URLs), without fname itself.
+    '''
+    found = set()
+    pending = [fname]
+    while pending:
+        name = pending.pop()
+        for href in directimports(name):
+            if isremote(href):
+                local = resolve(href) if resolve is not None else None
+                if local is None:
+                    found.add(href)
+                    continue
+                href = local
+            elif href.startswith('file://'):
+                href = href[len('file://'):]
+            else:
+                href = os.path.join(os.path.dirname(name), href)
+            href = os.path.normpath(href)
+            if href not in found and href != fname:
+                found.add(href)
+                pending.append(href)
+    return sorted(found)
+
+
+def directimports(fname):
+    '''return the hrefs imported or included by the stylesheet fname'''
+    try:
+        st = os.stat(fname)
+    except OSError:
+        return []
+    key = (fname, st.st_ino, st.st_size, st.st_mtime_ns)
+    hrefs = importcache.get(key)
+    if hrefs is None:
+        try:
+            with codecs.open(fname, encoding='utf-8', errors='replace') as f:
+                hrefs = href_re.findall(f.read())
+        except IOError as e:
+            logger.debug("Could not read stylesheet %s: %s", fname, e)
+            hrefs = []
+        importcache[key] = hrefs
+    return hrefs
+
+
+class XMLCatalog(object):
+    '''an XML catalog of local copies of the remote DocBook resources
+
+    The stylesheets and the source documents refer to the DocBook XSL, the
+    DTDs and the schemas by their http URLs.  Unless there is a local copy,
+    xsltproc and xmllint fetch these from the network (or, with --nonet,
+    fail), in every build step of every document.  The XMLCatalog rewrites
+    each of the REWRITES to the first existing local directory:  a
+    directory of the same host and path in one of the mirrors, or one of
+    the places where the distributions install them.
+
+    The catalog is written to filename (if changed) and is used through
+    XML_CATALOG_FILES by all libxml2-based tools, including lxml; any
+    other catalogs (by default, the SYSTEM_CATALOG) are consulted after it.
+    '''
+
+    def __repr__(self):
+        return '<%s:%s (%d rewrites)>' % (self.__class__.__name__,
+                                          self.filename, len(self.rewrites))
+
+    def __init__(self, filename, mirrors=(), rewrites=REWRITES):
+        self.filename = os.path.abspath(filename)
+        self.rewrites = list()
+        for prefix, candidates in rewrites:
+            parts = urlsplit(prefix)
+            local = [os.path.join(x, parts.netloc + parts.path)
+                     for x in mirrors]
+            for dirname in local + list(candidates):
+                if os.path.isdir(dirname):
+                    self.rewrites.append((prefix, os.path.join(dirname, '')))
+                    break
+
+    def resolve(self, uri):
+        '''return the local filename for uri (or None)'''
+        if not isremote(uri):
+            return uri if isreadablefile(uri) else None
+        for prefix, dirname in self.rewrites:
+            if uri.startswith(prefix):
+                fname = dirname + uri[len(prefix):]
+                if isreadablefile(fname):
+                    return fname
+        return None
+
+    def unresolvable(self, fnames):
+        '''return the remote references in fnames without a local copy
+
+        Returns a dict of URL -> the first file referring to it.
+        '''
+        result = dict()
+        for fname in fnames:
+            try:
+                uris = remotereferences(fname)
+            except IOError as e:
+                logger.debug("Could not check %s for remote references: %s",
+                             fname, e)
+                continue
+            for uri in uris:
+                if uri not in result and self.resolve(uri) is None:
+                    result[uri] = fname
+        return result
+
+    def content(self):
+        '''return the text of the catalog'''
+        entries = list()
+        for prefix, dirname in self.rewrites:
+            url = fileurl(dirname)
+            for kind, attr in (('System', 'systemId'), ('URI', 'uri')):
+                entries.append('  <rewrite%s %sStartString="%s" '
+                               'rewritePrefix="%s"/>\n' %
+                               (kind, attr, prefix, url))
+        return template % (''.join(entries),)
+
+    def save(self):
+        '''write the catalog file, unless it is already up to date'''
+        content = self.content()
+        try:
+            with codecs.open(self.filename, encoding='utf-8') as f:
+                if f.read() == content:
+                    return True
+        except IOError:
+            pass
+        dirname = os.path.dirname(self.filename)
+        try:
+            if not os.path.isdir(dirname):
+                os.makedirs(dirname)
+            writetext(self.filename, content)
+        except (IOError, OSError) as e:
+            logger.warning("Could not write XML catalog %s: %s",
+                           self.filename, e)
+            return False
+        return True
+
+    def catalogfiles(self, environ=os.environ):
+        '''return the value for XML_CATALOG_FILES, with this catalog first'''
+        others = environ.get('XML_CATALOG_FILES')
+        if others is None:
+            others = SYSTEM_CATALOG if os.path.exists(SYSTEM_CATALOG) else ''
+        url = fileurl(self.filename)
+        return ' '.join([url] + [x for x in others.split() if x != url])
+
+#
+# -- end of file
@@ -11,7 +11,12 @@ import argparse
 
 import logging
 
-from tldp.utils import arg_isloglevel, arg_isreadablefile
+from tldp.utils import arg_isloglevel, arg_isreadablefile, cachedir
+from tldp.utils import arg_isexecutable, LazyDefault, which
+from tldp.utils import MD5_BUFSIZE
+from tldp.xslt import ENGINES, XSLTPROC
+from tldp.doctypes.common import HTML2TEXT, TEXT_ENGINES
+from tldp.jvmworker import NAILGUN_SERVER, ng_finder, classpath_finder
 from tldp.cascadingconfig import CascadingConfig, DefaultFreeArgumentParser
 
 import tldp.typeguesser
@@ -19,6 +24,16 @@ import tldp.typeguesser
 logger = logging.getLogger(__name__)
 
 DEFAULT_CONFIGFILE = '/etc/ldptool/ldptool.ini'
+DEFAULT_HASHCACHE = os.path.join(cachedir(), 'source-md5sums.json')
+DEFAULT_TOOLCACHE = os.path.join(cachedir(), 'tools.json')
+DEFAULT_XMLCATALOG = os.path.join(cachedir(), 'catalog.xml')
+DEFAULT_ARTIFACTCACHE_SIZE = 2 * 1024 ** 3
+
+# -- the BuildHistory (see --timing-db) and the ArtifactCache (see
+#    --artifact-cache), by default in the build directory
+#
+HISTORY = 'ldptool-history.sqlite'
+ARTIFACTS = 'ldptool-artifacts'
 
 
 class DirectoriesExist(argparse._AppendAction):
@@ -108,6 +123,136 @@ def collectconfiguration(tag, argv):
                     default=['images', 'resources'], action='append', type=str,
                     help='subdirs to copy during build [%(default)s]')
 
+    ap.add_argument('--jobs',
+                    '-j',
+                    default=1, type=int,
+                    help='number of documents to build concurrently '
+                         '[%(default)s]')
+
+    ap.add_argument('--step-jobs',
+                    default=1, type=int,
+                    help='number of build steps to run concurrently for '
+                         'each document [%(default)s]')
+
+    ap.add_argument('--partial-rebuild',
+                    action=StoreTrueOrNargBool, nargs='?', default=True,
+                    help='build only the missing outputs of broken '
+                         'documents [%(default)s]')
+
+    ap.add_argument('--script-format',
+                    default='bash', choices=['bash', 'ninja', 'make'],
+                    help='build file written by --script [%(default)s]')
+
+    ap.add_argument('--xslt-engine',
+                    default=XSLTPROC, choices=ENGINES,
+                    help='run XSLT transforms with xsltproc, or in-process '
+                         'with lxml [%(default)s]')
+
+    ap.add_argument('--text-engine',
+                    default=HTML2TEXT, choices=TEXT_ENGINES,
+                    help='render text outputs with html2text, or in-process '
+                         'with the builtin renderer [%(default)s]')
+
+    ap.add_argument('--jvm-worker',
+                    action=StoreTrueOrNargBool, nargs='?', default=False,
+                    help='run FOP and jing in a single, long-lived JVM '
+                         '(a nailgun server) [%(default)s]')
+
+    ap.add_argument('--jvm-worker-java', type=arg_isexecutable,
+                    default=LazyDefault(which, 'java'),
+                    help='full path to java [%(default)s]')
+
+    ap.add_argument('--jvm-worker-ng', type=arg_isexecutable,
+                    default=LazyDefault(ng_finder),
+                    help='full path to the nailgun client [%(default)s]')
+
+    ap.add_argument('--jvm-worker-classpath',
+                    default=LazyDefault(classpath_finder), type=str,
+                    help='classpath with nailgun, FOP and jing '
+                         '[%(default)s]')
+
+    ap.add_argument('--jvm-worker-server',
+                    default=NAILGUN_SERVER, type=str,
+                    help='main class of the nailgun server [%(default)s]')
+
+    ap.add_argument('--capture-output',
+                    action=StoreTrueOrNargBool, nargs='?', default=False,
+                    help='keep the output of build commands in memory; '
+                         'write logs only for failures [%(default)s]')
+
+    ap.add_argument('--hash-cache', '--hashcache',
+                    default=DEFAULT_HASHCACHE, type=str,
+                    help='file caching source MD5 hashes [%(default)s]')
+
+    ap.add_argument('--no-hash-cache', '--no-hashcache',
+                    action=StoreTrueOrNargBool, nargs='?', default=False,
+                    help='always read and hash all source files [%(default)s]')
+
+    ap.add_argument('--tool-cache', '--toolcache',
+                    default=DEFAULT_TOOLCACHE, type=str,
+                    help='file caching the locations of tools [%(default)s]')
+
+    ap.add_argument('--no-tool-cache', '--no-toolcache',
+                    action=StoreTrueOrNargBool, nargs='?', default=False,
+                    help='always search PATH for tools [%(default)s]')
+
+    ap.add_argument('--xml-catalog',
+                    default=DEFAULT_XMLCATALOG, type=str,
+                    help='generated XML catalog of local copies of remote '
+                         'stylesheets, DTDs and schemas [%(default)s]')
+
+    ap.add_argument('--no-xml-catalog',
+                    action=StoreTrueOrNargBool, nargs='?', default=False,
+                    help='do not generate or use the --xml-catalog '
+                         '[%(default)s]')
+
+    ap.add_argument('--xml-mirror',
+                    default=[], action=DirectoriesExist,
+                    help='a directory of local copies of remote resources, '
+                         'by host and path (for the --xml-catalog)')
+
+    ap.add_argument('--nonet',
+                    action=StoreTrueOrNargBool, nargs='?', default=None,
+                    help='never fetch stylesheets, DTDs or schemas from the '
+                         'network [True with an --xml-catalog]')
+
+    ap.add_argument('--scan-jobs',
+                    default=1, type=int,
+                    help='number of source dirs/documents to scan '
+                         'concurrently [%(default)s]')
+
+    ap.add_argument('--hash-jobs',
+                    default=1, type=int,
+                    help='number of files to hash concurrently [%(default)s]')
+
+    ap.add_argument('--hash-bufsize',
+                    default=MD5_BUFSIZE, type=int,
+                    help='read size (bytes) when hashing files [%(default)s]')
+
+    ap.add_argument('--hash-mmapsize',
+                    default=None, type=int,
+                    help='mmap() files at least this large (bytes) when '
+                         'hashing [%(default)s]')
+
+    ap.add_argument('--artifact-cache',
+                    default=None, type=str,
+                    help='directory caching built outputs [BUILDDIR/%s]' %
+                         (ARTIFACTS,))
+
+    ap.add_argument('--no-artifact-cache',
+                    action=StoreTrueOrNargBool, nargs='?', default=False,
+                    help='always run the full toolchain [%(default)s]')
+
+    ap.add_argument('--artifact-cache-size',
+                    default=DEFAULT_ARTIFACTCACHE_SIZE, type=int,
+                    help='maximum size (bytes) of the artifact cache '
+                         '[%(default)s]')
+
+    ap.add_argument('--timing-db',
+                    default=None, type=str,
+                    help='database of build timings [BUILDDIR/%s]' %
+                         (HISTORY,))
+
     # -- and the distinct, mutually exclusive actions this script can perform
     #
     g = ap.add_mutually_exclusive_group()
@@ -136,6 +281,20 @@ def collectconfiguration(tag, argv):
                    action='store_true', default=False,
                    help='dump inventory summary report [%(default)s]')
 
+    g.add_argument('--timing-report',
+                   action='store_true', default=False,
+                   help='report slowest documents and build steps '
+                        '[%(default)s]')
+
+    g.add_argument('--forget-backends',
+                   action='store_true', default=False,
+                   help='forget which PDF backend last succeeded for each '
+                        'document [%(default)s]')
+
+    g.add_argument('--cache-stats',
+                   action='store_true', default=False,
+                   help='report on the artifact cache [%(default)s]')
+
     g.add_argument('--doctypes', '--formats', '--format',
                    '--list-doctypes', '--list-formats',
                    '-T',
@@ -10,16 +10,25 @@ import os
 import sys
 import stat
 import time
+import shlex
 import errno
 import codecs
 import shutil
 import logging
-import inspect
+import threading
+import collections
 from tempfile import NamedTemporaryFile as ntf
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from functools import wraps
-import networkx as nx
 
-from tldp.utils import execute, logtimings, writemd5sums
+from tldp.utils import execute, logtimings, writemd5sums, cputime
+from tldp.utils import md5file, md5files, isstr, walkfiles, linkorcopy
+from tldp.utils import resolvedefaults, which
+from tldp.artifactcache import fingerprintkey
+from tldp.catalog import stylesheetimports
+from tldp.buildplan import Plan, PlanStep, PREPARE
+from tldp import xslt
+from tldp import jvmworker
 
 logger = logging.getLogger(__name__)
 
@@ -32,6 +41,38 @@ set -o pipefail
 postamble = '''
 # -- end of file'''
 
+# -- how the text output is rendered from the single-page HTML (see
+#    BaseDoctype.html2text):  by the html2text command, or in-process (see
+#    tldp.htmltext)
+#
+HTML2TEXT = 'html2text'
+BUILTIN = 'builtin'
+TEXT_ENGINES = (HTML2TEXT, BUILTIN)
+
+# -- wall time and CPU time (seconds) and exit status of a build or build step
+#
+Timing = collections.namedtuple('Timing', ['name', 'wall', 'cpu', 'status'])
+
+# -- a single command of a build step:  the argv and the (optional) names of
+#    the files for STDIN and STDOUT and the working directory of the command
+#    (by default, the output directory); all are templates, formatted just
+#    like the scripts passed to shellscript()
+#
+Command = collections.namedtuple('Command', ['argv', 'stdin', 'stdout', 'cwd'],
+                                 defaults=(None, None, None))
+
+
+def commandline(command):
+    '''return a (formatted) Command as a line of shell'''
+    s = ' '.join([shlex.quote(x) for x in command.argv])
+    if command.stdin:
+        s = s + ' < ' + shlex.quote(command.stdin)
+    if command.stdout:
+        s = s + ' > ' + shlex.quote(command.stdout)
+    if command.cwd:
+        s = '(cd -- %s && %s)' % (shlex.quote(command.cwd), s)
+    return s
+
 
 def depends(*predecessors):
     '''decorator to be used for constructing build order graph'''
@@ -44,6 +85,43 @@ def depends(*predecessors):
     return anon
 
 
+def buildorder(cls):
+    '''return the names of the @depends build steps of cls, sorted
+
+    Each step comes after all of the steps it depends on; otherwise, steps
+    keep the order of their definition in the class (and its bases).  Only
+    steps which depend on, or are depended on by, another step are included.
+    Raises ValueError for an unknown predecessor or a dependency cycle.
+    '''
+    defined = collections.OrderedDict()
+    for klass in reversed(cls.__mro__):
+        for name in vars(klass):
+            defined[name] = getattr(cls, name, None)
+    predecessors = collections.OrderedDict()
+    for name, member in defined.items():
+        depends = getattr(member, 'depends', None)
+        if not depends:
+            continue
+        for pred in depends:
+            if not callable(defined.get(pred)):
+                raise ValueError("%s.%s depends on unknown step %s" %
+                                 (cls.__name__, name, pred))
+        predecessors[name] = set(depends)
+    for depends in list(predecessors.values()):
+        for pred in depends:
+            predecessors.setdefault(pred, set())
+    steps = [x for x in defined if x in predecessors]
+    order = list()
+    while steps:
+        ready = [x for x in steps if predecessors[x].issubset(order)]
+        if not ready:
+            raise ValueError("%s has a dependency cycle among %s" %
+                             (cls.__name__, ', '.join(steps)))
+        order.extend(ready)
+        steps = [x for x in steps if x not in ready]
+    return tuple(order)
+
+
 class SignatureChecker(object):
 
     @classmethod
@@ -62,6 +140,23 @@ class SignatureChecker(object):
 
 class BaseDoctype(object):
 
+    # -- the (validated) order of the @depends build steps of each subclass,
+    #    computed once, when the class is defined
+    #
+    buildorder = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super(BaseDoctype, cls).__init_subclass__(**kwargs)
+        cls.buildorder = buildorder(cls)
+
+    preparesteps = ['build_precheck',
+                    'clear_output',
+                    'mkdir_output',
+                    'chdir_output',
+                    'generate_md5sums',
+                    'copy_static_resources',
+                    ]
+
     def __repr__(self):
         return '<%s:%s>' % (self.__class__.__name__, self.source.stem,)
 
@@ -70,9 +165,19 @@ class BaseDoctype(object):
         self.output = kwargs.get('output', None)
         self.config = kwargs.get('config', None)
         self.removals = set()
+        self.timing = None
+        self.timings = list()
+        self.artifactkey = None
+        self.shortcut = None
+        self.backends = dict()
+        self.currentstep = None
+        self.plan = collections.defaultdict(list)
+        self.exits = threading.local()
         assert self.source is not None
         assert self.output is not None
         assert self.config is not None
+        resolvedefaults(self.config, getattr(self, 'required', ()),
+                        getattr(self.config, 'toolcache', None))
 
     def cleanup(self):
         stem = self.source.stem
@@ -136,7 +241,13 @@ class BaseDoctype(object):
         return True
 
     def chdir_output(self, **kwargs):
-        '''chdir to the output directory (or write the script that would)'''
+        '''write the script to chdir to the output directory
+
+        In --build mode, the process never changes its working directory
+        (so that many documents can build in one process); instead, every
+        command runs with the output directory as its explicit cwd (see
+        execute_command).
+        '''
         logger.debug("%s chdir to dir   %s.",
                      self.output.stem, self.output.dirname)
         if self.config.script:
@@ -145,8 +256,7 @@ class BaseDoctype(object):
 
 cd -- "{output.dirname}"'''
             return self.shellscript(s, **kwargs)
-        os.chdir(self.output.dirname)
-        return True
+        return os.path.isdir(self.output.dirname)
 
     def generate_md5sums(self, **kwargs):
         logger.debug("%s generating MD5SUMS in %s.",
@@ -181,12 +291,103 @@ cd -- "{output.dirname}"'''
             fullpath = os.path.join(self.source.dirname, d)
             fullpath = os.path.abspath(fullpath)
             if os.path.isdir(fullpath):
-                source.append('"' + fullpath + '"')
+                source.append(fullpath.replace('{', '{{').replace('}', '}}'))
         if not source:
             logger.debug("%s no images or resources to copy", self.source.stem)
             return True
-        s = 'rsync --archive --verbose %s ./' % (' '.join(source))
-        return self.shellscript(s, **kwargs)
+        argv = ['rsync', '--archive', '--verbose'] + source + \
+            ['{output.dirname}/']
+        return self.command(argv, **kwargs)
+
+    def fingerprint(self):
+        '''return everything which determines the outputs of this build
+
+        That is the doctype, the stem, the source MD5SUMS, the --resources
+        (and, for a document which is a single file, their contents), each
+        of the required tools and files (see toolversions()), and the
+        settings which change how the tools run.  The MD5 of a tool (or XSL
+        file) stands in for its version.
+        '''
+        catalog = getattr(self.config, 'xmlcatalog', None)
+        settings = dict(
+            xslt_engine=getattr(self.config, 'xslt_engine', xslt.XSLTPROC),
+            text_engine=self.textengine(),
+            nonet=bool(getattr(self.config, 'nonet', False)),
+            xml_catalog=None if catalog is None else catalog.rewrites)
+        return dict(doctype=self.__class__.__name__, stem=self.source.stem,
+                    md5sums=self.source.md5sums,
+                    tools=self.toolversions(self.required),
+                    resources=sorted(self.config.resources),
+                    resourcefiles=self.resourcefiles(),
+                    settings=settings)
+
+    def resourcefiles(self):
+        '''return the MD5s of the --resources beside a single-file document
+
+        The --resources of a document in a directory of its own are part of
+        its source MD5SUMS already.
+        '''
+        name, relative = self.source.scope
+        if name != self.source.filename:
+            return dict()
+        result = dict()
+        hashcache = getattr(self.config, 'hashcache', None)
+        for d in self.config.resources:
+            fullpath = os.path.abspath(os.path.join(relative, d))
+            if os.path.isdir(fullpath):
+                result.update(md5files(fullpath, relative=relative,
+                                       cache=hashcache))
+        return result
+
+    def toolversions(self, tools):
+        '''return dict of tool -> [filename, MD5] for the config tools
+
+        For a stylesheet, the [filename, MD5] of each stylesheet it imports
+        or includes (directly or not) follow, so that an upgrade of e.g. the
+        DocBook XSL beneath the LDP customization layer shows, too.
+        '''
+        hashcache = getattr(self.config, 'hashcache', None)
+        hashfunc = md5file if hashcache is None else hashcache.md5file
+        catalog = getattr(self.config, 'xmlcatalog', None)
+        resolve = None if catalog is None else catalog.resolve
+        result = dict()
+        for tool in sorted(tools):
+            value = getattr(self.config, tool, None)
+            if isstr(value) and os.path.isfile(value):
+                fname, value = value, [value, hashfunc(value)]
+                if fname.endswith('.xsl'):
+                    for name in stylesheetimports(fname, resolve=resolve):
+                        if os.path.isfile(name):
+                            value.append([name, hashfunc(name)])
+                        else:
+                            value.append([name, None])
+            result[tool] = value
+        return result
+
+    def restore_artifacts(self):
+        '''fetch the outputs from the --artifact-cache, instead of building'''
+        cache = getattr(self.config, 'artifactcache', None)
+        if cache is None:
+            return False
+        stem = self.source.stem
+        self.artifactkey = fingerprintkey(self.fingerprint())
+        if not cache.restore(self.artifactkey, self.output.dirname):
+            logger.debug("%s not in artifact cache (%s)",
+                         stem, self.artifactkey)
+            return False
+        logger.info("%s restored outputs from artifact cache (%s)",
+                    stem, self.artifactkey)
+        return True
+
+    def store_artifacts(self):
+        '''add the outputs of a successful build to the --artifact-cache'''
+        cache = getattr(self.config, 'artifactcache', None)
+        if cache is None or self.artifactkey is None:
+            return False
+        return cache.store(self.artifactkey, self.output.dirname,
+                           exclude=[self.output.logdir],
+                           stem=self.source.stem,
+                           doctype=self.__class__.__name__)
 
     def hook_build_success(self):
         stem = self.output.stem
@@ -210,14 +411,172 @@ cd -- "{output.dirname}"'''
             etext = '%s in shellscript, neither --build nor --script'
             raise Exception(etext % (self.source.stem,))
 
+    def command(self, argv, stdin=None, stdout=None, cwd=None, **kwargs):
+        '''run (--build) or write (--script) a single Command
+
+        Unlike a shellscript(), a Command is run directly, without writing
+        a temporary script or starting a shell; in --script mode, it is
+        written as a line of shell.
+        '''
+        command = self.formatcommand(Command(argv, stdin, stdout, cwd))
+        if self.config.build:
+            return self.execute_command(command, **kwargs)
+        elif self.config.script:
+            return self.dump_script(commandline(command), **kwargs)
+        else:
+            etext = '%s in command, neither --build nor --script'
+            raise Exception(etext % (self.source.stem,))
+
+    def formatcommand(self, command):
+        '''return the Command with all of its templates formatted'''
+        ns = dict(output=self.output, source=self.source, config=self.config)
+        argv = [str(x).format(**ns) for x in command.argv]
+        fields = [None if x is None else x.format(**ns)
+                  for x in (command.stdin, command.stdout, command.cwd)]
+        return Command(argv, *fields)
+
+    def xslt(self, xsltproc, xsl, params, stdout=None, nonet=False, **kwargs):
+        '''transform output.validsource with the stylesheet xsl
+
+        The xsltproc and xsl are templates (as for command()); the params
+        are (name, value) pairs, as for xsltproc --stringparam.  With
+        --xslt-engine lxml, the transform runs in-process (see tldp.xslt);
+        otherwise, xsltproc runs as a command.  With --nonet, no transform
+        may fetch anything from the network.
+        '''
+        nonet = nonet or getattr(self.config, 'nonet', False)
+        engine = getattr(self.config, 'xslt_engine', xslt.XSLTPROC)
+        if self.config.build and engine == xslt.LXML and xslt.available():
+            return self.execute_xslt(xsl, params, stdout=stdout, nonet=nonet)
+        argv = [xsltproc]
+        if nonet:
+            argv.append('--nonet')
+        for name, value in params:
+            argv.extend(['--stringparam', name, value])
+        argv.extend([xsl, '{output.validsource}'])
+        return self.command(argv, stdout=stdout, **kwargs)
+
+    def textengine(self):
+        '''return the text engine of this doctype (cf. TEXT_ENGINES)
+
+        That is the value of the doctype's own option (named by the class
+        attribute text_engine, e.g. --linuxdoc-text-engine), if given, or
+        else of --text-engine.
+        '''
+        option = getattr(self, 'text_engine', None)
+        engine = getattr(self.config, option, None) if option else None
+        return engine or getattr(self.config, 'text_engine', HTML2TEXT)
+
+    def html2text(self, program, **kwargs):
+        '''render output.name_htmls as text into output.name_txt
+
+        With the builtin textengine(), the HTML is rendered in-process (see
+        tldp.htmltext); otherwise, the program (html2text) runs as a command.
+        '''
+        if self.config.build and self.textengine() == BUILTIN:
+            return self.execute_html2text()
+        argv = [program, '-style', 'pretty', '-nobs', '{output.name_htmls}']
+        return self.command(argv, stdout='{output.name_txt}', **kwargs)
+
+    def java(self, program, mainclass, args, **kwargs):
+        '''run a Java tool, in the JVMWorker (--jvm-worker) if possible
+
+        The program (e.g. fop) and args are templates (as for command());
+        mainclass is the tool's Java main class (see tldp.jvmworker).  If
+        the JVMWorker has died or cannot run mainclass, the program is run
+        in a JVM of its own, instead.
+        '''
+        worker = getattr(self.config, 'jvmworker', None)
+        if self.config.build and worker is not None and \
+                worker.usable(mainclass):
+            if self.command(worker.argv(mainclass, args), **kwargs):
+                return True
+            status = self.exits.status
+            if worker.alive() and status not in jvmworker.CLIENT_ERRORS:
+                return False
+            logger.warning("%s JVM worker could not run %s (exit code %s), "
+                           "using a JVM of its own", self.source.stem,
+                           mainclass, status)
+            worker.broken.add(mainclass)
+        return self.command([program] + list(args), **kwargs)
+
+    def firstsuccessful(self, name, backends, tools, **kwargs):
+        '''run the backends [(backend, method), ...] until one succeeds
+
+        The backend which succeeds is remembered in the BuildHistory (see
+        the driver's recordtimings()), under a key made of the source MD5SUMS
+        and the tools; the next build with the same key tries it first.  So,
+        a document which always fails with the first backend only pays for
+        that failure once.
+        '''
+        stem = self.source.stem
+        classname = self.__class__.__name__
+        history = getattr(self.config, 'buildhistory', None)
+        key = None
+        if self.config.build and history is not None:
+            key = fingerprintkey(dict(doctype=classname,
+                                      md5sums=self.source.md5sums,
+                                      tools=self.toolversions(tools)))
+            preferred = history.backend(stem, name, key)
+            if preferred is not None and preferred != backends[0][0]:
+                logger.info("%s %s with %s first, as it last succeeded",
+                            stem, name, preferred)
+                backends = sorted(backends, key=lambda x: x[0] != preferred)
+        for x, (backend, method) in enumerate(backends):
+            if x:
+                logger.error("%s %s failed creating %s, falling back to %s...",
+                             stem, backends[x - 1][0], name, backend)
+            logger.info("%s calling method %s.%s",
+                        stem, classname, method.__name__)
+            if method(**kwargs):
+                if key is not None:
+                    self.backends[name] = (key, backend)
+                return True
+        return False
+
+    @logtimings(logger.debug)
+    def execute_xslt(self, xsl, params, stdout=None, nonet=False):
+        '''run an XSLT transform in-process (cf. xslt())
+
+        The process never changes its working directory, so a relative
+        base.dir (where chunk.xsl writes its chunks) is made absolute.
+        '''
+        dirname = self.output.dirname
+        command = self.formatcommand(Command([xsl, '{output.validsource}'],
+                                             stdout=stdout))
+        params = [(k, os.path.join(dirname, v, '') if k == 'base.dir' else v)
+                  for k, v in params]
+        if command.stdout:
+            stdout = os.path.join(dirname, command.stdout)
+        result = xslt.transform(command.argv[0], command.argv[1], params,
+                                output=stdout, nonet=nonet)
+        self.exits.status = 0 if result else 1
+        return result
+
+    def execute_html2text(self):
+        '''render the text output in-process (cf. html2text())'''
+        # -- only a build with the builtin engine pays for importing it
+        #
+        from tldp import htmltext
+        result = htmltext.render(self.output.name_htmls, self.output.name_txt)
+        self.exits.status = 0 if result else 1
+        return result
+
     @logtimings(logger.debug)
     def dump_shellscript(self, script, preamble=preamble,
                          postamble=postamble, **kwargs):
         source = self.source
         output = self.output
         config = self.config
-        file = kwargs.get('file', sys.stdout)
         s = script.format(output=output, source=source, config=config)
+        return self.dump_script(s, **kwargs)
+
+    def dump_script(self, s, **kwargs):
+        '''write the (formatted) script s to the --script output'''
+        file = kwargs.get('file', sys.stdout)
+        if getattr(self.config, 'script_format', 'bash') != 'bash':
+            self.plan[self.currentstep].append(s)
+            return True
         print('', file=file)
         print(s, file=file)
         return True
@@ -246,7 +605,9 @@ cd -- "{output.dirname}"'''
         os.chmod(tf.name, mode)
 
         cmd = [tf.name]
-        result = execute(cmd, logdir=logdir)
+        result = execute(cmd, logdir=logdir, cwd=output.dirname,
+                         capture=getattr(config, 'capture_output', False))
+        self.exits.status = result
         if result != 0:
             with codecs.open(tf.name, encoding='utf-8') as f:
                 for line in f:
@@ -254,77 +615,272 @@ cd -- "{output.dirname}"'''
             return False
         return True
 
+    @logtimings(logger.debug)
+    def execute_command(self, command, **kwargs):
+        '''run a (formatted) Command, without any shell'''
+        stem = self.source.stem
+        config = self.config
+        cwd = command.cwd or self.output.dirname
+        argv = list(command.argv)
+        if not os.path.dirname(argv[0]):
+            toolcache = getattr(config, 'toolcache', None)
+            if toolcache is not None:
+                found = toolcache.which(argv[0])
+            else:
+                found = which(argv[0])
+            if found is None:
+                logger.error("%s could not find %s in PATH", stem, argv[0])
+                self.exits.status = 127
+                return False
+            argv[0] = found
+        stdin = stdout = None
+        try:
+            if command.stdin:
+                stdin = open(os.path.join(cwd, command.stdin), 'rb')
+            if command.stdout:
+                stdout = open(os.path.join(cwd, command.stdout), 'wb')
+            result = execute(argv, stdin=stdin, stdout=stdout,
+                             logdir=self.output.logdir, cwd=cwd,
+                             capture=getattr(config, 'capture_output', False))
+        finally:
+            for f in (stdin, stdout):
+                if f is not None:
+                    f.close()
+        self.exits.status = result
+        if result != 0:
+            logger.info("Command: %s", commandline(command))
+            return False
+        return True
+
     def build_prepare(self, **kwargs):
         stem = self.source.stem
         classname = self.__class__.__name__
-        order = ['build_precheck',
-                 'clear_output',
-                 'mkdir_output',
-                 'chdir_output',
-                 'generate_md5sums',
-                 'copy_static_resources',
-                 ]
-
-        for methname in order:
+        for methname in self.preparesteps:
             method = getattr(self, methname, None)
             assert method is not None
             logger.info("%s calling method %s.%s",
                         stem, classname, method.__name__)
-            if not method(**kwargs):
+            if not self.timestep(method, **kwargs):
                 logger.error("%s called method  %s.%s failed, skipping...",
                              stem, classname, method.__name__)
                 return False
         return True
 
+    def timestep(self, method, **kwargs):
+        '''call a build step, recording its Timing in self.timings
+
+        The exit status is 0 for success; otherwise, that of the last command
+        the step ran (or 1).  CPU time includes all processes waited for by
+        ldptool, so it is only approximate when steps run concurrently.
+        '''
+        self.exits.status = None
+        self.currentstep = method.__name__
+        wall, cpu = time.time(), cputime()
+        result = method(**kwargs)
+        status = 0 if result else (self.exits.status or 1)
+        self.timings.append(Timing(method.__name__, time.time() - wall,
+                                   cputime() - cpu, status))
+        return result
+
     def determinebuildorder(self):
-        graph = nx.DiGraph()
-        d = dict(inspect.getmembers(self, inspect.ismethod))
-        for name, member in d.items():
-            predecessors = getattr(member, 'depends', None)
-            if predecessors:
-                for pred in predecessors:
-                    method = d.get(pred, None)
-                    assert method is not None
-                    graph.add_edge(method, member)
-        order = nx.dag.topological_sort(graph)
-        return order
+        '''return the bound build step methods, in build order'''
+        return [getattr(self, name) for name in self.buildorder]
+
+    def buildplan(self):
+        '''return the Plan of this document for a --script-format build file
+
+        After generate() in --script mode, self.plan holds the scripts of each
+        build step.  The preparation steps become a single step (prepare),
+        which depends on the source files; every other step depends on the
+        steps it @depends on (or on prepare) and runs in the output directory.
+        The stamp files go to the --builddir (by default, ldptool-build beside
+        the collection), so that nothing but the outputs is published.
+        '''
+        builddir = getattr(self.config, 'builddir', None)
+        if not builddir:
+            collection = os.path.dirname(self.output.dirname)
+            builddir = os.path.join(os.path.dirname(collection),
+                                    'ldptool-build')
+        stampdir = os.path.join(builddir, 'stamps', self.source.stem)
+        commands = list()
+        for name in self.preparesteps:
+            commands.extend(self.plan.get(name, ()))
+        steps = [PlanStep(PREPARE, [], None, commands)]
+        for method in self.determinebuildorder():
+            name = method.__name__
+            depends = getattr(method, 'depends', None) or [PREPARE]
+            steps.append(PlanStep(name, list(depends), self.output.dirname,
+                                  list(self.plan.get(name, ()))))
+        outputs = [getattr(self.output, x) for x in self.output.expected]
+        return Plan(self.source.stem, self.source.files, stampdir, steps,
+                    outputs)
+
+    def partialbuildorder(self, order):
+        '''return the steps of order which produce the missing outputs
+
+        For a broken document (the published outputs match the source, but
+        some are missing), only the steps leading to the missing outputs need
+        to run.  By convention, the step make_name_pdf produces the expected
+        output name_pdf, and so on.  Any step which leads only to outputs
+        which are present is skipped; all other steps run.
+
+        Returns None if the whole build must run (e.g. the document is not
+        broken, or a producing step is unknown).
+        '''
+        existing = getattr(self.source, 'output', None)
+        if self.config.script or not existing or \
+           existing.dirname == self.output.dirname or \
+           not getattr(self.config, 'partial_rebuild', False) or \
+           getattr(self.source, 'status', None) != 'broken':
+            return None
+        methods = dict((m.__name__, m) for m in order)
+        missing, present = set(), set()
+        for prop in existing.expected:
+            step = 'make_' + prop
+            if step not in methods:
+                logger.debug("%s no step %s, full build", self.source.stem,
+                             step)
+                return None
+            if getattr(existing, prop) in existing.missing:
+                missing.add(step)
+            else:
+                present.add(step)
+
+        def ancestry(names):
+            found, names = set(), set(names)
+            while names:
+                name = names.pop()
+                if name not in found:
+                    found.add(name)
+                    names.update(getattr(methods[name], 'depends', None) or ())
+            return found
+
+        skip = ancestry(present) - ancestry(missing)
+        return [m for m in order if m.__name__ not in skip]
+
+    def copy_existing_outputs(self, **kwargs):
+        '''fill in the new outputs with all other files of the old ones'''
+        existing = self.source.output
+        logdir = os.path.join(existing.logdir, '')
+        for entry in walkfiles(existing.dirname):
+            if entry.path.startswith(logdir):
+                continue
+            relpath = os.path.relpath(entry.path, existing.dirname)
+            dst = os.path.join(self.output.dirname, relpath)
+            if os.path.lexists(dst):
+                continue
+            if not os.path.isdir(os.path.dirname(dst)):
+                os.makedirs(os.path.dirname(dst))
+            linkorcopy(entry.path, dst)
+        self.output.refresh()
+        if not self.output.iscomplete:
+            logger.error("%s partial build did not produce %s",
+                         self.source.stem, ', '.join(self.output.missing))
+            return False
+        return True
 
     @logtimings(logger.debug)
     def build_fullrun(self, **kwargs):
         stem = self.source.stem
         order = self.determinebuildorder()
+        partial = self.partialbuildorder(order)
+        if partial is None:
+            return self.build_steps(order, **kwargs)
+        missing = [os.path.basename(x) for x in self.source.output.missing]
+        logger.info("%s broken; building only %s", stem,
+                    ', '.join(sorted(missing)))
+        self.shortcut = 'partial'
+        if not self.build_steps(partial, **kwargs):
+            return False
+        return self.timestep(self.copy_existing_outputs, **kwargs)
+
+    def build_steps(self, order, **kwargs):
+        '''run the build steps in order (or concurrently, see --step-jobs)'''
+        stem = self.source.stem
         logger.debug("%s build order %r", self.source.stem, order)
+        jobs = getattr(self.config, 'step_jobs', 1) or 1
+        if jobs > 1 and not self.config.script:
+            return self.build_concurrent(order, jobs, **kwargs)
         for method in order:
             classname = self.__class__.__name__
             logger.info("%s calling method %s.%s",
                         stem, classname, method.__name__)
-            if not method(**kwargs):
+            if not self.timestep(method, **kwargs):
                 logger.error("%s called method  %s.%s failed, skipping...",
                              stem, classname, method.__name__)
                 return False
         return True
 
+    def build_concurrent(self, order, jobs, **kwargs):
+        '''run the build steps in up to jobs threads, as soon as they are ready
+
+        A step is ready when all of the steps it @depends on have succeeded
+        (or are not part of this build, see partialbuildorder).
+        Ready steps are started in the (deterministic) order of the
+        topological sort.  If any step fails, no further steps are started;
+        the steps already running are allowed to finish, and the build fails.
+        '''
+        stem = self.source.stem
+        classname = self.__class__.__name__
+        methods = collections.OrderedDict((m.__name__, m) for m in order)
+        waiting = dict((name, set(getattr(m, 'depends', None) or ()))
+                       for name, m in methods.items())
+        for name in waiting:
+            waiting[name].intersection_update(methods)
+        done = set()
+        running = dict()
+        failed = False
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            while True:
+                for name, method in methods.items():
+                    if failed:
+                        break
+                    if name in waiting and waiting[name].issubset(done):
+                        del waiting[name]
+                        logger.info("%s calling method %s.%s",
+                                    stem, classname, name)
+                        future = pool.submit(self.timestep, method, **kwargs)
+                        running[future] = name
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    if future.result():
+                        done.add(name)
+                    else:
+                        logger.error("%s called method  %s.%s failed, "
+                                     "skipping...", stem, classname, name)
+                        failed = True
+        return not failed and not waiting
+
     @logtimings(logger.info)
     def generate(self, **kwargs):
         # -- perform build preparation steps;
         #     - check for all executables and data files
         #     - clear output dir
         #     - make output dir
-        #     - chdir to output dir
+        #     - chdir to output dir (only in --script mode)
         #     - copy source images/resources to output dir
         #
-        if not self.config.script:
-            opwd = os.getcwd()
+        wall, cpu = time.time(), cputime()
         if not self.build_prepare():
+            self.timing = Timing(self.source.stem, time.time() - wall,
+                                 cputime() - cpu, 1)
             return False
 
-        # -- build
+        # -- build (unless the outputs are in the artifact cache)
         #
-        result = self.build_fullrun(**kwargs)
+        cached = self.restore_artifacts()
+        if cached:
+            self.shortcut = 'restored'
+        result = cached or self.build_fullrun(**kwargs)
 
         # -- always clean the kitchen
         #
         self.cleanup()
+        if result and not cached:
+            self.store_artifacts()
 
         # -- report on result and/or cleanup
         #
@@ -333,9 +889,8 @@ cd -- "{output.dirname}"'''
         else:
             self.hook_build_failure()
 
-        if not self.config.script:
-            os.chdir(opwd)
-
+        self.timing = Timing(self.source.stem, time.time() - wall,
+                             cputime() - cpu, 0 if result else 1)
         return result
 
 #
@@ -8,12 +8,14 @@ from __future__ import unicode_literals
 
 import logging
 
-from tldp.utils import which, firstfoundfile
+from tldp.utils import which, firstfoundfile, LazyDefault
 from tldp.utils import arg_isexecutable, isexecutable
 from tldp.utils import arg_isreadablefile, isreadablefile
 from tldp.utils import arg_isstr, isstr
 
+from tldp.jvmworker import FOP
 from tldp.doctypes.common import BaseDoctype, SignatureChecker, depends
+from tldp.doctypes.common import TEXT_ENGINES
 
 logger = logging.getLogger(__name__)
 
@@ -58,109 +60,95 @@ class Docbook4XML(BaseDoctype, SignatureChecker):
                 'docbook4xml_xslprint': isstr,
                 }
 
+    text_engine = 'docbook4xml_text_engine'
+
     def make_validated_source(self, **kwargs):
-        s = '''"{config.docbook4xml_xmllint}" > "{output.validsource}" \\
-                  --nonet \\
-                  --noent \\
-                  --xinclude \\
-                  --postvalid \\
-                  "{source.filename}"'''
-        return self.shellscript(s, **kwargs)
+        argv = ['{config.docbook4xml_xmllint}',
+                '--nonet',
+                '--noent',
+                '--xinclude',
+                '--postvalid',
+                '{source.filename}']
+        return self.command(argv, stdout='{output.validsource}', **kwargs)
 
     @depends(make_validated_source)
     def make_name_htmls(self, **kwargs):
         '''create a single page HTML output'''
-        s = '''"{config.docbook4xml_xsltproc}" > "{output.name_htmls}" \\
-                  --nonet \\
-                  --stringparam admon.graphics.path images/ \\
-                  --stringparam base.dir . \\
-                  "{config.docbook4xml_xslsingle}" \\
-                  "{output.validsource}"'''
-        return self.shellscript(s, **kwargs)
+        params = [('admon.graphics.path', 'images/'), ('base.dir', '.')]
+        return self.xslt('{config.docbook4xml_xsltproc}',
+                         '{config.docbook4xml_xslsingle}', params,
+                         stdout='{output.name_htmls}', nonet=True, **kwargs)
 
     @depends(make_name_htmls)
     def make_name_txt(self, **kwargs):
         '''create text output'''
-        s = '''"{config.docbook4xml_html2text}" > "{output.name_txt}" \\
-                  -style pretty \\
-                  -nobs \\
-                  "{output.name_htmls}"'''
-        return self.shellscript(s, **kwargs)
+        return self.html2text('{config.docbook4xml_html2text}', **kwargs)
 
     @depends(make_validated_source)
     def make_fo(self, **kwargs):
         '''generate the Formatting Objects intermediate output'''
-        s = '''"{config.docbook4xml_xsltproc}" > "{output.name_fo}" \\
-                  --stringparam fop.extensions 0 \\
-                  --stringparam fop1.extensions 1 \\
-                  "{config.docbook4xml_xslprint}" \\
-                  "{output.validsource}"'''
+        params = [('fop.extensions', '0'), ('fop1.extensions', '1')]
         if not self.config.script:
             self.removals.add(self.output.name_fo)
-        return self.shellscript(s, **kwargs)
+        return self.xslt('{config.docbook4xml_xsltproc}',
+                         '{config.docbook4xml_xslprint}', params,
+                         stdout='{output.name_fo}', **kwargs)
 
     # -- this is conditionally built--see logic in make_name_pdf() below
     # @depends(make_fo)
     def make_pdf_with_fop(self, **kwargs):
         '''use FOP to create a PDF'''
-        s = '''"{config.docbook4xml_fop}" \\
-                  -fo "{output.name_fo}" \\
-                  -pdf "{output.name_pdf}"'''
-        return self.shellscript(s, **kwargs)
+        args = ['-fo', '{output.name_fo}',
+                '-pdf', '{output.name_pdf}']
+        return self.java('{config.docbook4xml_fop}', FOP, args, **kwargs)
 
     # -- this is conditionally built--see logic in make_name_pdf() below
     # @depends(make_validated_source)
     def make_pdf_with_dblatex(self, **kwargs):
         '''use dblatex (fallback) to create a PDF'''
-        s = '''"{config.docbook4xml_dblatex}" \\
-                  -F xml \\
-                  -t pdf \\
-                  -o "{output.name_pdf}" \\
-                  "{output.validsource}"'''
-        return self.shellscript(s, **kwargs)
+        argv = ['{config.docbook4xml_dblatex}',
+                '-F', 'xml',
+                '-t', 'pdf',
+                '-o', '{output.name_pdf}',
+                '{output.validsource}']
+        return self.command(argv, **kwargs)
 
     @depends(make_validated_source, make_fo)
     def make_name_pdf(self, **kwargs):
-        stem = self.source.stem
-        classname = self.__class__.__name__
-        logger.info("%s calling method %s.%s",
-                    stem, classname, 'make_pdf_with_fop')
-        if self.make_pdf_with_fop(**kwargs):
-            return True
-        logger.error("%s %s failed creating PDF, falling back to dblatex...",
-                     stem, self.config.docbook4xml_fop)
-        logger.info("%s calling method %s.%s",
-                    stem, classname, 'make_pdf_with_dblatex')
-        return self.make_pdf_with_dblatex(**kwargs)
+        '''create the PDF with FOP or, failing that, dblatex'''
+        backends = [('fop', self.make_pdf_with_fop),
+                    ('dblatex', self.make_pdf_with_dblatex)]
+        tools = ['docbook4xml_fop', 'docbook4xml_dblatex',
+                 'docbook4xml_xslprint']
+        return self.firstsuccessful('pdf', backends, tools, **kwargs)
 
     @depends(make_validated_source)
     def make_chunked_html(self, **kwargs):
         '''create chunked HTML output'''
-        s = '''"{config.docbook4xml_xsltproc}" \\
-                  --nonet \\
-                  --stringparam admon.graphics.path images/ \\
-                  --stringparam base.dir . \\
-                  "{config.docbook4xml_xslchunk}" \\
-                  "{output.validsource}"'''
-        return self.shellscript(s, **kwargs)
+        params = [('admon.graphics.path', 'images/'), ('base.dir', '.')]
+        return self.xslt('{config.docbook4xml_xsltproc}',
+                         '{config.docbook4xml_xslchunk}', params,
+                         nonet=True, **kwargs)
 
     @depends(make_chunked_html)
     def make_name_html(self, **kwargs):
         '''rename DocBook XSL's index.html to LDP standard STEM.html'''
-        s = 'mv -v --no-clobber -- "{output.name_indexhtml}" "{output.name_html}"'
-        return self.shellscript(s, **kwargs)
+        argv = ['mv', '-v', '--no-clobber', '--',
+                '{output.name_indexhtml}', '{output.name_html}']
+        return self.command(argv, **kwargs)
 
     @depends(make_name_html)
     def make_name_indexhtml(self, **kwargs):
         '''create final index.html symlink'''
-        s = 'ln -svr -- "{output.name_html}" "{output.name_indexhtml}"'
-        return self.shellscript(s, **kwargs)
+        argv = ['ln', '-svr', '--',
+                '{output.name_html}', '{output.name_indexhtml}']
+        return self.command(argv, **kwargs)
 
     @depends(make_name_html, make_name_pdf, make_name_htmls, make_name_txt)
     def remove_validated_source(self, **kwargs):
         '''create final index.html symlink'''
-        s = 'rm --verbose -- "{output.validsource}"'
-        return self.shellscript(s, **kwargs)
+        argv = ['rm', '--verbose', '--', '{output.validsource}']
+        return self.command(argv, **kwargs)
 
     @classmethod
     def argparse(cls, p):
@@ -168,28 +156,31 @@ class Docbook4XML(BaseDoctype, SignatureChecker):
         g = p.add_argument_group(title=cls.__name__, description=descrip)
         gadd = g.add_argument
         gadd('--docbook4xml-xslchunk', type=arg_isreadablefile,
-             default=xslchunk_finder(),
+             default=LazyDefault(xslchunk_finder),
              help='full path to LDP HTML chunker XSL [%(default)s]')
         gadd('--docbook4xml-xslsingle', type=arg_isreadablefile,
-             default=xslsingle_finder(),
+             default=LazyDefault(xslsingle_finder),
              help='full path to LDP HTML single-page XSL [%(default)s]')
         gadd('--docbook4xml-xslprint', type=arg_isstr,
-             default=xslprint_finder(),
+             default=LazyDefault(xslprint_finder),
              help='full path to LDP FO print XSL [%(default)s]')
         gadd('--docbook4xml-xmllint', type=arg_isexecutable,
-             default=which('xmllint'),
+             default=LazyDefault(which, 'xmllint'),
              help='full path to xmllint [%(default)s]')
         gadd('--docbook4xml-xsltproc', type=arg_isexecutable,
-             default=which('xsltproc'),
+             default=LazyDefault(which, 'xsltproc'),
              help='full path to xsltproc [%(default)s]')
         gadd('--docbook4xml-html2text', type=arg_isexecutable,
-             default=which('html2text'),
+             default=LazyDefault(which, 'html2text'),
              help='full path to html2text [%(default)s]')
+        gadd('--docbook4xml-text-engine', choices=TEXT_ENGINES, default=None,
+             help='render text output with html2text or the '
+                  'builtin renderer [--text-engine]')
         gadd('--docbook4xml-fop', type=arg_isexecutable,
-             default=which('fop'),
+             default=LazyDefault(which, 'fop'),
              help='full path to fop [%(default)s]')
         gadd('--docbook4xml-dblatex', type=arg_isexecutable,
-             default=which('dblatex'),
+             default=LazyDefault(which, 'dblatex'),
              help='full path to dblatex [%(default)s]')
 
 #
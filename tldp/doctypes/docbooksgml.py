@@ -9,11 +9,12 @@ from __future__ import unicode_literals
 import os
 import logging
 
-from tldp.utils import which, firstfoundfile
+from tldp.utils import which, firstfoundfile, LazyDefault
 from tldp.utils import arg_isexecutable, isexecutable
 from tldp.utils import arg_isreadablefile, isreadablefile
 
 from tldp.doctypes.common import BaseDoctype, SignatureChecker, depends
+from tldp.doctypes.common import TEXT_ENGINES
 
 logger = logging.getLogger(__name__)
 
@@ -50,57 +51,54 @@ class DocbookSGML(BaseDoctype, SignatureChecker):
                 'docbooksgml_docbookdsl': isreadablefile,
                 }
 
+    text_engine = 'docbooksgml_text_engine'
+
     def make_blank_indexsgml(self, **kwargs):
         indexsgml = os.path.join(self.source.dirname, 'index.sgml')
         self.indexsgml = os.path.isfile(indexsgml)
         if self.indexsgml:
             return True
         '''generate an empty index.sgml file (in output dir)'''
-        s = '''"{config.docbooksgml_collateindex}" \\
-                  -N \\
-                  -o \\
-                  "index.sgml"'''
-        return self.shellscript(s, **kwargs)
+        argv = ['{config.docbooksgml_collateindex}', '-N', '-o', 'index.sgml']
+        return self.command(argv, **kwargs)
 
     @depends(make_blank_indexsgml)
     def move_blank_indexsgml_into_source(self, **kwargs):
         '''move a blank index.sgml file into the source tree'''
         if self.indexsgml:
             return True
-        s = '''mv \\
-                 --no-clobber \\
-                 --verbose \\
-                 -- "index.sgml" "{source.dirname}/index.sgml"'''
+        argv = ['mv', '--no-clobber', '--verbose', '--',
+                'index.sgml', '{source.dirname}/index.sgml']
         indexsgml = os.path.join(self.source.dirname, 'index.sgml')
         if not self.config.script:
             self.removals.add(indexsgml)
-        return self.shellscript(s, **kwargs)
+        return self.command(argv, **kwargs)
 
     @depends(move_blank_indexsgml_into_source)
     def make_data_indexsgml(self, **kwargs):
         '''collect document's index entries into a data file (HTML.index)'''
         if self.indexsgml:
             return True
-        s = '''"{config.docbooksgml_openjade}" \\
-                  -t sgml \\
-                  -V html-index \\
-                  -d "{config.docbooksgml_docbookdsl}" \\
-                  "{source.filename}"'''
-        return self.shellscript(s, **kwargs)
+        argv = ['{config.docbooksgml_openjade}',
+                '-t', 'sgml',
+                '-V', 'html-index',
+                '-d', '{config.docbooksgml_docbookdsl}',
+                '{source.filename}']
+        return self.command(argv, **kwargs)
 
     @depends(make_data_indexsgml)
     def make_indexsgml(self, **kwargs):
         '''generate the final document index file (index.sgml)'''
         if self.indexsgml:
             return True
-        s = '''"{config.docbooksgml_collateindex}" \\
-                  -g \\
-                  -t Index \\
-                  -i doc-index \\
-                  -o "index.sgml" \\
-                     "HTML.index" \\
-                     "{source.filename}"'''
-        return self.shellscript(s, **kwargs)
+        argv = ['{config.docbooksgml_collateindex}',
+                '-g',
+                '-t', 'Index',
+                '-i', 'doc-index',
+                '-o', 'index.sgml',
+                'HTML.index',
+                '{source.filename}']
+        return self.command(argv, **kwargs)
 
     @depends(make_indexsgml)
     def move_indexsgml_into_source(self, **kwargs):
@@ -108,78 +106,73 @@ class DocbookSGML(BaseDoctype, SignatureChecker):
         if self.indexsgml:
             return True
         indexsgml = os.path.join(self.source.dirname, 'index.sgml')
-        s = '''mv \\
-                 --verbose \\
-                 --force \\
-                 -- "index.sgml" "{source.dirname}/index.sgml"'''
+        argv = ['mv', '--verbose', '--force', '--',
+                'index.sgml', '{source.dirname}/index.sgml']
         logger.debug("%s creating %s", self.source.stem, indexsgml)
         if not self.config.script:
             self.removals.add(indexsgml)
-        return self.shellscript(s, **kwargs)
+        return self.command(argv, **kwargs)
 
     @depends(move_indexsgml_into_source)
     def cleaned_indexsgml(self, **kwargs):
         '''clean the junk from the output dir after building the index.sgml'''
         # -- be super cautious before removing a bunch of files
         if not self.config.script:
-            cwd = os.getcwd()
-            if not os.path.samefile(cwd, self.output.dirname):
+            dirname = self.output.dirname
+            if not os.path.isabs(dirname) or not os.path.isdir(dirname) or \
+               os.path.samefile(dirname, self.source.dirname):
                 logger.error("%s (cowardly) refusing to clean directory %s",
-                             self.source.stem, cwd)
-                logger.error("%s expected to find %s",
-                             self.source.stem, self.output.dirname)
+                             self.source.stem, dirname)
                 return False
         preserve = os.path.basename(self.output.MD5SUMS)
-        s = '''find . -mindepth 1 -maxdepth 1 -not -type d -not -name {} -delete -print'''
-        s = s.format(preserve)
-        return self.shellscript(s, **kwargs)
+        argv = ['find', '{output.dirname}', '-mindepth', '1', '-maxdepth', '1',
+                '-not', '-type', 'd', '-not', '-name', preserve,
+                '-delete', '-print']
+        return self.command(argv, **kwargs)
 
     @depends(cleaned_indexsgml)
     def make_htmls(self, **kwargs):
         '''create a single page HTML output (with incorrect name)'''
-        s = '''"{config.docbooksgml_jw}" \\
-                  -f docbook \\
-                  -b html \\
-                  --dsl "{config.docbooksgml_ldpdsl}#html" \\
-                  -V nochunks \\
-                  -V '%callout-graphics-path%=images/callouts/' \\
-                  -V '%stock-graphics-extension%=.png' \\
-                  --output . \\
-                  "{source.filename}"'''
-        return self.shellscript(s, **kwargs)
+        argv = ['{config.docbooksgml_jw}',
+                '-f', 'docbook',
+                '-b', 'html',
+                '--dsl', '{config.docbooksgml_ldpdsl}#html',
+                '-V', 'nochunks',
+                '-V', '%callout-graphics-path%=images/callouts/',
+                '-V', '%stock-graphics-extension%=.png',
+                '--output', '.',
+                '{source.filename}']
+        return self.command(argv, **kwargs)
 
     @depends(make_htmls)
     def make_name_htmls(self, **kwargs):
         '''correct the single page HTML output name'''
-        s = 'mv -v --no-clobber -- "{output.name_html}" "{output.name_htmls}"'
-        return self.shellscript(s, **kwargs)
+        argv = ['mv', '-v', '--no-clobber', '--',
+                '{output.name_html}', '{output.name_htmls}']
+        return self.command(argv, **kwargs)
 
     @depends(make_name_htmls)
     def make_name_txt(self, **kwargs):
         '''create text output (from single-page HTML)'''
-        s = '''"{config.docbooksgml_html2text}" > "{output.name_txt}" \\
-                  -style pretty \\
-                  -nobs \\
-                  "{output.name_htmls}"'''
-        return self.shellscript(s, **kwargs)
+        return self.html2text('{config.docbooksgml_html2text}', **kwargs)
 
     def make_pdf_with_jw(self, **kwargs):
         '''use jw (openjade) to create a PDF'''
-        s = '''"{config.docbooksgml_jw}" \\
-                  -f docbook \\
-                  -b pdf \\
-                  --output . \\
-                  "{source.filename}"'''
-        return self.shellscript(s, **kwargs)
+        argv = ['{config.docbooksgml_jw}',
+                '-f', 'docbook',
+                '-b', 'pdf',
+                '--output', '.',
+                '{source.filename}']
+        return self.command(argv, **kwargs)
 
     def make_pdf_with_dblatex(self, **kwargs):
         '''use dblatex (fallback) to create a PDF'''
-        s = '''"{config.docbooksgml_dblatex}" \\
-                  -F sgml \\
-                  -t pdf \\
-                  -o "{output.name_pdf}" \\
-                     "{source.filename}"'''
-        return self.shellscript(s, **kwargs)
+        argv = ['{config.docbooksgml_dblatex}',
+                '-F', 'sgml',
+                '-t', 'pdf',
+                '-o', '{output.name_pdf}',
+                '{source.filename}']
+        return self.command(argv, **kwargs)
 
     @depends(cleaned_indexsgml)
     def make_name_pdf(self, **kwargs):
@@ -198,52 +191,58 @@ class DocbookSGML(BaseDoctype, SignatureChecker):
     @depends(make_name_htmls)
     def make_html(self, **kwargs):
         '''create chunked HTML outputs'''
-        s = '''"{config.docbooksgml_jw}" \\
-                 -f docbook \\
-                 -b html \\
-                 --dsl "{config.docbooksgml_ldpdsl}#html" \\
-                 -V '%callout-graphics-path%=images/callouts/' \\
-                 -V '%stock-graphics-extension%=.png' \\
-                 --output . \\
-                 "{source.filename}"'''
-        return self.shellscript(s, **kwargs)
+        argv = ['{config.docbooksgml_jw}',
+                '-f', 'docbook',
+                '-b', 'html',
+                '--dsl', '{config.docbooksgml_ldpdsl}#html',
+                '-V', '%callout-graphics-path%=images/callouts/',
+                '-V', '%stock-graphics-extension%=.png',
+                '--output', '.',
+                '{source.filename}']
+        return self.command(argv, **kwargs)
 
     @depends(make_html)
     def make_name_html(self, **kwargs):
         '''rename openjade's index.html to LDP standard name STEM.html'''
-        s = 'mv -v --no-clobber -- "{output.name_indexhtml}" "{output.name_html}"'
-        return self.shellscript(s, **kwargs)
+        argv = ['mv', '-v', '--no-clobber', '--',
+                '{output.name_indexhtml}', '{output.name_html}']
+        return self.command(argv, **kwargs)
 
     @depends(make_name_html)
     def make_name_indexhtml(self, **kwargs):
         '''create final index.html symlink'''
-        s = 'ln -svr -- "{output.name_html}" "{output.name_indexhtml}"'
-        return self.shellscript(s, **kwargs)
+        argv = ['ln', '-svr', '--',
+                '{output.name_html}', '{output.name_indexhtml}']
+        return self.command(argv, **kwargs)
 
     @classmethod
     def argparse(cls, p):
         descrip = 'executables and data files for %s' % (cls.formatname,)
         g = p.add_argument_group(title=cls.__name__, description=descrip)
         g.add_argument('--docbooksgml-docbookdsl', type=arg_isreadablefile,
-                       default=docbookdsl_finder(),
+                       default=LazyDefault(docbookdsl_finder),
                        help='full path to html/docbook.dsl [%(default)s]')
         g.add_argument('--docbooksgml-ldpdsl', type=arg_isreadablefile,
-                       default=ldpdsl_finder(),
+                       default=LazyDefault(ldpdsl_finder),
                        help='full path to ldp/ldp.dsl [%(default)s]')
         g.add_argument('--docbooksgml-jw', type=arg_isexecutable,
-                       default=which('jw'),
+                       default=LazyDefault(which, 'jw'),
                        help='full path to jw [%(default)s]')
         g.add_argument('--docbooksgml-html2text', type=arg_isexecutable,
-                       default=which('html2text'),
+                       default=LazyDefault(which, 'html2text'),
                        help='full path to html2text [%(default)s]')
+        g.add_argument('--docbooksgml-text-engine', choices=TEXT_ENGINES,
+                       default=None,
+                       help='render text output with html2text or the '
+                            'builtin renderer [--text-engine]')
         g.add_argument('--docbooksgml-openjade', type=arg_isexecutable,
-                       default=which('openjade'),
+                       default=LazyDefault(which, 'openjade'),
                        help='full path to openjade [%(default)s]')
         g.add_argument('--docbooksgml-dblatex', type=arg_isexecutable,
-                       default=which('dblatex'),
+                       default=LazyDefault(which, 'dblatex'),
                        help='full path to dblatex [%(default)s]')
         g.add_argument('--docbooksgml-collateindex', type=arg_isexecutable,
-                       default=which('collateindex.pl'),
+                       default=LazyDefault(which, 'collateindex.pl'),
                        help='full path to collateindex [%(default)s]')
 
 #
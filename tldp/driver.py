@@ -8,21 +8,32 @@ from __future__ import unicode_literals
 
 import os
 import sys
+import time
 import errno
+import shlex
 import signal
 import shutil
 import logging
-import inspect
+import functools
 import collections
 from argparse import Namespace
 
 from tldp.typeguesser import knowndoctypes
-from tldp.sources import SourceDocument, arg_issourcedoc
+from tldp.sources import SourceCollection, SourceDocument, arg_issourcedoc
 from tldp.outputs import OutputDirectory
+from tldp.manifest import Manifest
 from tldp.inventory import Inventory, status_classes, status_types, stypes
-from tldp.config import collectconfiguration
-from tldp.utils import arg_isloglevel, arg_isdirectory
-from tldp.utils import swapdirs, sameFilesystem
+from tldp.config import collectconfiguration, HISTORY, ARTIFACTS
+from tldp.hashcache import HashCache
+from tldp.toolcache import ToolCache
+from tldp.jvmworker import JVMWorker, NAILGUN_SERVER
+from tldp.catalog import XMLCatalog, isremote
+from tldp.artifactcache import ArtifactCache
+from tldp import buildplan
+from tldp import xslt
+from tldp.utils import arg_isloglevel, arg_isdirectory, resolvedefaults
+from tldp.utils import isstr
+from tldp.utils import swapdirs, sameFilesystem, md5file, MD5_BUFSIZE
 from tldp.doctypes.common import preamble, postamble
 from tldp import VERSION
 
@@ -66,7 +77,7 @@ def show_doctypes(config, *args, **kwargs):
     print('', file=file)
     for doctype in knowndoctypes:
         classname = doctype.__name__
-        fname = os.path.abspath(inspect.getmodule(doctype).__file__)
+        fname = os.path.abspath(sys.modules[doctype.__module__].__file__)
         extensions = ', '.join(doctype.extensions)
         print('{}'.format(classname), file=file)
         print('      format name: {}'.format(doctype.formatname), file=file)
@@ -112,7 +123,9 @@ def summary(config, *args, **kwargs):
     file = kwargs.get('file', sys.stdout)
     inv = kwargs.get('inv', None)
     if inv is None:
-        inv = Inventory(config.pubdir, config.sourcedir)
+        inv = Inventory(config.pubdir, config.sourcedir,
+                        scanjobs=getattr(config, 'scan_jobs', 1),
+                        **sourceoptions(config))
     width = Namespace()
     width.doctype = max([len(x.__name__) for x in knowndoctypes])
     width.status = max([len(x) for x in status_types])
@@ -165,6 +178,302 @@ def summary(config, *args, **kwargs):
     return os.EX_OK
 
 
+def hashcache_setup(config):
+    '''return a HashCache for this run (or None if --no-hash-cache)'''
+    if getattr(config, 'no_hash_cache', False):
+        logger.debug("Not using any source hash cache (--no-hash-cache).")
+        return None
+    if not getattr(config, 'hash_cache', None):
+        return None
+    return HashCache(config.hash_cache)
+
+
+def toolcache_setup(config):
+    '''return a ToolCache for this run (or None if --no-tool-cache)'''
+    if getattr(config, 'no_tool_cache', False):
+        logger.debug("Not using any tool cache (--no-tool-cache).")
+        return None
+    if not getattr(config, 'tool_cache', None):
+        return None
+    return ToolCache(config.tool_cache)
+
+
+def tools_setup(config, docs):
+    '''locate the tools of the doctypes of docs (cf. LazyDefault)
+
+    Also sets up the XMLCatalog (see xmlcatalog_setup()).
+
+    This happens before any worker processes are forked, so that they
+    inherit the tool locations and the ToolCache learns of them.
+    '''
+    if getattr(config, 'xslt_engine', xslt.XSLTPROC) == xslt.LXML:
+        if not xslt.available():
+            logger.warning("Cannot use --xslt-engine %s (%s), using %s.",
+                           xslt.LXML, xslt.importerror, xslt.XSLTPROC)
+            config.xslt_engine = xslt.XSLTPROC
+    toolcache = getattr(config, 'toolcache', None)
+    for doctype in set(x.doctype for x in docs):
+        resolvedefaults(config, getattr(doctype, 'required', ()), toolcache)
+    config.xmlcatalog = xmlcatalog_setup(config, docs)
+
+
+def xmlcatalog_setup(config, docs):
+    '''generate and use the XMLCatalog for docs (or None)
+
+    Any stylesheet or schema of the doctypes which is configured by URL is
+    replaced by its local copy.  Any remote reference (from the stylesheets
+    or from the DOCTYPE of a source document) without a local copy is
+    reported now, rather than in the middle of the build.  Unless --nonet
+    is given explicitly, no build step may use the network (--nonet True).
+    '''
+    if getattr(config, 'no_xml_catalog', False):
+        logger.debug("Not using any XML catalog (--no-xml-catalog).")
+        return None
+    if not getattr(config, 'xml_catalog', None):
+        return None
+    catalog = XMLCatalog(config.xml_catalog, getattr(config, 'xml_mirror', []))
+    if not catalog.save():
+        return None
+    os.environ['XML_CATALOG_FILES'] = catalog.catalogfiles()
+    if getattr(config, 'nonet', None) is None:
+        config.nonet = True
+    names = set()
+    for doctype in set(x.doctype for x in docs):
+        names.update(getattr(doctype, 'required', ()))
+    stylesheets = list()
+    for name in sorted(names):
+        value = getattr(config, name, None)
+        if not isstr(value):
+            continue
+        if isremote(value):
+            fname = catalog.resolve(value)
+            if fname is None:
+                logger.warning("No local copy of %s (--%s).",
+                               value, name.replace('_', '-'))
+                continue
+            logger.debug("Using %s for %s (--%s).",
+                         fname, value, name.replace('_', '-'))
+            setattr(config, name, fname)
+            value = fname
+        if value.endswith('.xsl'):
+            stylesheets.append(value)
+    missing = catalog.unresolvable(stylesheets + [x.filename for x in docs])
+    for uri, fname in sorted(missing.items()):
+        logger.warning("No local copy of %s (used by %s).", uri, fname)
+    if missing and getattr(config, 'nonet', False):
+        logger.warning("With --nonet, %d remote references cannot be "
+                       "resolved; builds using them will fail.", len(missing))
+    return catalog
+
+
+def jvmworker_setup(config):
+    '''return a running JVMWorker for this build (or None)'''
+    if not getattr(config, 'jvm_worker', False):
+        return None
+    names = ['jvm_worker_java', 'jvm_worker_ng', 'jvm_worker_classpath']
+    resolvedefaults(config, names, getattr(config, 'toolcache', None))
+    missing = [x for x in names if not getattr(config, x, None)]
+    if missing:
+        logger.warning("Not using --jvm-worker, missing %s.",
+                       ', '.join(missing))
+        return None
+    worker = JVMWorker(config.jvm_worker_java, config.jvm_worker_ng,
+                       config.jvm_worker_classpath,
+                       server=getattr(config, 'jvm_worker_server',
+                                      NAILGUN_SERVER))
+    if not worker.start():
+        logger.warning("Not using --jvm-worker, running each Java tool "
+                       "in a JVM of its own.")
+        return None
+    return worker
+
+
+def sourceoptions(config):
+    '''keyword arguments for creating SourceDocuments (or an Inventory)'''
+    hashfunc = functools.partial(md5file,
+                                 bufsize=getattr(config, 'hash_bufsize',
+                                                 MD5_BUFSIZE),
+                                 mmapsize=getattr(config, 'hash_mmapsize',
+                                                  None))
+    return dict(hashcache=getattr(config, 'hashcache', None),
+                hashjobs=getattr(config, 'hash_jobs', 1),
+                hashfunc=hashfunc)
+
+
+def artifactcachename(config):
+    '''return the name of the artifact cache directory (or None)
+
+    By default, the cache lives in the build directory, which shares a
+    filesystem with --pubdir, so that outputs are hardlinked, not copied.
+    '''
+    if getattr(config, 'artifact_cache', None):
+        return config.artifact_cache
+    if config.builddir:
+        return opj(config.builddir, ARTIFACTS)
+    if config.pubdir:
+        return opj(opd(opa(config.pubdir)), 'ldptool-build', ARTIFACTS)
+    return None
+
+
+def artifactcache_setup(config):
+    '''return the ArtifactCache for this run (or None)'''
+    if getattr(config, 'no_artifact_cache', False):
+        logger.debug("Not using any artifact cache (--no-artifact-cache).")
+        return None
+    dirname = artifactcachename(config)
+    if not dirname:
+        return None
+    try:
+        return ArtifactCache(dirname, config.artifact_cache_size)
+    except OSError as e:
+        logger.warning("Not using artifact cache %s: %s", dirname, e)
+        return None
+
+
+def cache_stats(config, *args, **kwargs):
+    if args:
+        return ERR_EXTRAARGS + ' '.join(args)
+    dirname = artifactcachename(config)
+    if not dirname:
+        return ERR_NEEDPUBDIR + "(or --builddir) for --cache-stats"
+    if not os.path.isdir(dirname):
+        return "No artifact cache found in %s." % (dirname,)
+    file = kwargs.get('file', sys.stdout)
+    cache = ArtifactCache(dirname, config.artifact_cache_size)
+    entries = cache.entries()
+    size = sum(meta['size'] for _, meta, _ in entries)
+    hits = sum(meta.get('hits', 0) for _, meta, _ in entries)
+    print('Artifact cache', cache.dirname, file=file)
+    print('  entries: %d' % (len(entries),), file=file)
+    print('  size:    %d of %d bytes (%.0f%%)' %
+          (size, cache.maxsize, 100.0 * size / max(cache.maxsize, 1)),
+          file=file)
+    print('  hits:    %d' % (hits,), file=file)
+    print('', 'By Document Type (DOCTYPE)', '--------------------------',
+          sep='\n', file=file)
+    bytype = collections.defaultdict(lambda: [0, 0, 0])
+    for _, meta, _ in entries:
+        counts = bytype[meta.get('doctype', '?')]
+        counts[0] += 1
+        counts[1] += meta['size']
+        counts[2] += meta.get('hits', 0)
+    width = max([len(x) for x in bytype] + [0])
+    for doctype, (count, size, hits) in sorted(bytype.items()):
+        print('{0:{w}}  {1:6d} entries  {2:12d} bytes  {3:6d} hits'.format(
+              doctype, count, size, hits, w=width), file=file)
+    if config.verbose:
+        print('', 'By Entry (least recently used first)',
+              '------------------------------------', sep='\n', file=file)
+        for key, meta, used in sorted(entries, key=lambda x: x[2]):
+            used = time.strftime('%F %T', time.localtime(used))
+            print(key[:12], used, '%12d' % (meta['size'],),
+                  meta.get('stem'), file=file)
+    print('', file=file)
+    return os.EX_OK
+
+
+def historyname(config):
+    '''return the name of the build history database (or None)'''
+    if getattr(config, 'timing_db', None):
+        return config.timing_db
+    if config.builddir:
+        return opj(config.builddir, HISTORY)
+    if config.pubdir:
+        return opj(opd(opa(config.pubdir)), 'ldptool-build', HISTORY)
+    return None
+
+
+def buildhistory_setup(config):
+    '''return the BuildHistory for this run (or None, if unusable)'''
+    name = historyname(config)
+    if name is None:
+        return None
+    # -- only the actions which use the history pay for importing sqlite3
+    #
+    import sqlite3
+    from tldp.buildhistory import BuildHistory
+    try:
+        return BuildHistory(name)
+    except sqlite3.Error as e:
+        logger.warning("Not recording build timings in %s: %s", name, e)
+        return None
+
+
+def existinghistory(config):
+    '''return the BuildHistory, only if it already exists (or None)'''
+    name = historyname(config)
+    if name is None or not os.path.isfile(name):
+        return None
+    return buildhistory_setup(config)
+
+
+def recordtimings(config, source, runner):
+    '''store the timings of a finished build in the BuildHistory (if any)
+
+    Along with the timings, the backends which succeeded in the build
+    (cf. BaseDoctype.firstsuccessful) are remembered.  The timings of a
+    build restored from the artifact cache, or of a partial build, say
+    nothing about the next full build, so they are not recorded.
+    '''
+    history = getattr(config, 'buildhistory', None)
+    if history is None or runner.timing is None:
+        return
+    import sqlite3
+    shortcut = getattr(runner, 'shortcut', None)
+    try:
+        if shortcut is None:
+            history.record(source.stem, source.doctype.__name__,
+                           runner.timing, runner.timings)
+        else:
+            logger.debug("%s %s build, not recording its timings",
+                         source.stem, shortcut)
+        for name, (key, backend) in sorted(runner.backends.items()):
+            history.recordbackend(source.stem, name, key, backend)
+    except sqlite3.Error as e:
+        logger.warning("%s could not record build timings: %s",
+                       source.stem, e)
+
+
+def timing_report(config, *args, **kwargs):
+    if args:
+        return ERR_EXTRAARGS + ' '.join(args)
+    name = historyname(config)
+    if name is None:
+        return ERR_NEEDPUBDIR + "(or --builddir) for --timing-report"
+    if not os.path.isfile(name):
+        return "No build history found in %s." % (name,)
+    file = kwargs.get('file', sys.stdout)
+    from tldp.buildhistory import BuildHistory
+    history = BuildHistory(name)
+    try:
+        sections = [('Slowest Documents (DOCUMENT)', history.documents()),
+                    ('Slowest Build Steps (STEP)', history.steps())]
+    finally:
+        history.close()
+    for title, rows in sections:
+        if not config.verbose:
+            rows = rows[:10]
+        print(title, '-' * len(title), sep='\n', file=file)
+        width = max([len(x.name) for x in rows] + [0])
+        for row in rows:
+            s = '{0:{width}}  {1:8.2f}s mean  {2:8.2f}s cpu  {3}  [{4}]'
+            walls = ' '.join(['%.2f' % (x,) for x in row.walls])
+            print(s.format(row.name, row.mean, row.cpu, trend(row.walls),
+                           walls, width=width), file=file)
+        print('', file=file)
+    return os.EX_OK
+
+
+def trend(walls):
+    '''describe the last of the walls relative to the mean of the others'''
+    if len(walls) < 2:
+        return '    new'
+    previous = sum(walls[:-1]) / (len(walls) - 1)
+    if not previous:
+        return '      -'
+    return '{0:+6.0%}'.format((walls[-1] - previous) / previous)
+
+
 def detail(config, docs, **kwargs):
     file = kwargs.get('file', sys.stdout)
     width = Namespace()
@@ -175,8 +484,32 @@ def detail(config, docs, **kwargs):
     #    sane, "all"; it would make sense for this to be "work", too, but
     #    "all" seems to be less surprising
     #
-    for doc in docs:
-        doc.detail(width, config.verbose, file=file)
+    history = existinghistory(config) if config.verbose else None
+    try:
+        for doc in docs:
+            doc.detail(width, config.verbose, file=file)
+            if history is None:
+                continue
+            for name, backend in sorted(history.backends(doc.stem).items()):
+                print('{:>16} {}'.format(name + ' backend', backend),
+                      file=file)
+    finally:
+        if history is not None:
+            history.close()
+    return os.EX_OK
+
+
+def forget_backends(config, docs, **kwargs):
+    '''forget which backends last succeeded for docs (cf. --list -v)'''
+    history = existinghistory(config)
+    if history is None:
+        logger.info("No build history, no backends to forget.")
+        return os.EX_OK
+    try:
+        count = history.forgetbackends([x.stem for x in docs])
+    finally:
+        history.close()
+    logger.info("Forgot %d backends of %d documents.", count, len(docs))
     return os.EX_OK
 
 
@@ -277,6 +610,22 @@ def prepare_docs_build_mode(config, docs):
 
 
 def docbuild(config, docs, **kwargs):
+    tools_setup(config, docs)
+    config.jvmworker = None
+    if config.build and not config.script and docs:
+        config.jvmworker = jvmworker_setup(config)
+    try:
+        jobs = getattr(config, 'jobs', 1) or 1
+        if jobs > 1 and len(docs) > 1 and config.build and not config.script:
+            return docbuild_parallel(config, docs, jobs, **kwargs)
+        return docbuild_serial(config, docs, **kwargs)
+    finally:
+        if config.jvmworker is not None:
+            config.jvmworker.stop()
+            config.jvmworker = None
+
+
+def docbuild_serial(config, docs, **kwargs):
     buildsuccess = False
     result = list()
     for x, source in enumerate(docs, 1):
@@ -287,18 +636,175 @@ def docbuild(config, docs, **kwargs):
         logger.info("%s (%d of %d) initiating build [%s]",
                     source.stem, x, len(docs), status)
         result.append(runner.generate(**kwargs))
+        recordtimings(config, source, runner)
     if all(result):
         buildsuccess = True
     return buildsuccess, list(zip(result, docs))
 
 
+class LogRecordCollector(logging.Handler):
+    '''collect the log records of a build worker for the parent process'''
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.records = list()
+
+    def emit(self, record):
+        # -- make the record picklable: render message and traceback now
+        #
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(
+                record.exc_info)
+            record.exc_info = None
+        record.msg = record.getMessage()
+        record.args = None
+        self.records.append(record)
+
+
+# -- the (config, docs, kwargs) for docbuild_worker(); forked worker processes
+#    inherit this, so neither the config nor the documents need pickling
+#
+workerstate = dict()
+
+
+def docbuild_worker(index):
+    '''build docs[index] in a forked worker process
+
+    All log records are collected, rather than emitted, and returned to the
+    parent process, along with the result.  Any exception is logged and the
+    build is reported as failed.
+    '''
+    config = workerstate['config']
+    source = workerstate['docs'][index]
+    kwargs = workerstate['kwargs']
+    runner = None
+    collector = LogRecordCollector()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(collector)
+    try:
+        runner = source.doctype(source=source, output=source.working,
+                                config=config)
+        result = runner.generate(**kwargs)
+    except Exception:
+        logger.exception("%s build failed with an exception", source.stem)
+        result = False
+    timing = getattr(runner, 'timing', None)
+    timings = getattr(runner, 'timings', list())
+    backends = getattr(runner, 'backends', dict())
+    shortcut = getattr(runner, 'shortcut', None)
+    return (index, result, collector.records, timing, timings, backends,
+            shortcut)
+
+
+def buildschedule(config, docs):
+    '''return the indexes of docs, in the order to start building them
+
+    To finish a parallel build as early as possible, documents are started
+    longest first, according to the BuildHistory.  Documents without any
+    history (e.g. new ones) might be the longest of all, so they go first.
+    '''
+    history = getattr(config, 'buildhistory', None)
+    if history is None:
+        return list(range(len(docs)))
+    estimates = history.estimates()
+    unknown = float('inf')
+    return sorted(range(len(docs)),
+                  key=lambda x: -estimates.get(docs[x].stem, unknown))
+
+
+def docbuild_parallel(config, docs, jobs, **kwargs):
+    '''build docs in up to jobs worker processes
+
+    The worker processes are forked once and each builds many documents
+    (nothing in a build changes the state of the process), so whatever they
+    cache in-process, e.g. compiled stylesheets, serves every document they
+    build.  The log records of each build are emitted together, when it has
+    finished, and the results are reported in the order of docs, just as for
+    the serial build.  The documents are started in the order given by
+    buildschedule().
+    '''
+    # -- hash the sources here, so that the hash cache learns of them
+    #
+    for source in docs:
+        source.md5sums
+    # -- only a parallel build pays for importing multiprocessing
+    #
+    import multiprocessing
+    workerstate.update(config=config, docs=docs, kwargs=kwargs)
+    result = dict()
+    try:
+        context = multiprocessing.get_context('fork')
+        pool = context.Pool(processes=jobs)
+        try:
+            schedule = buildschedule(config, docs)
+            builds = pool.imap(docbuild_worker, schedule)
+            for x, build in enumerate(builds, 1):
+                index, success, records, timing, timings, backends, \
+                    shortcut = build
+                source = docs[index]
+                logger.info("%s (%d of %d) build finished in worker",
+                            source.stem, x, len(docs))
+                for record in records:
+                    logging.getLogger(record.name).handle(record)
+                result[index] = success
+                recordtimings(config, source,
+                              Namespace(timing=timing, timings=timings,
+                                        backends=backends, shortcut=shortcut))
+            pool.close()
+        except BaseException:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+    finally:
+        workerstate.clear()
+    result = [result[x] for x in range(len(docs))]
+    return all(result), list(zip(result, docs))
+
+
+def scriptenviron(config):
+    '''return the environment variables a --script must set (a dict)
+
+    The XMLCatalog only reaches xsltproc and xmllint through the
+    XML_CATALOG_FILES of this process (see xmlcatalog_setup()); a script
+    runs elsewhere, so it sets the variable itself.
+    '''
+    catalog = getattr(config, 'xmlcatalog', None)
+    if catalog is None:
+        return dict()
+    return dict(XML_CATALOG_FILES=catalog.catalogfiles())
+
+
+def scriptplan(config, docs, **kwargs):
+    '''write a --script-format build file (ninja, make) for docs'''
+    file = kwargs.get('file', sys.stdout)
+    writer = buildplan.formats[config.script_format]
+    tools_setup(config, docs)
+    plans = list()
+    for source in docs:
+        runner = source.doctype(source=source, output=source.working,
+                                config=config)
+        if not runner.generate(**kwargs):
+            logger.error("Could not generate script for %s", source.stem)
+            return "Script generation failed."
+        plans.append(runner.buildplan())
+    writer(plans, file=file, environ=scriptenviron(config))
+    return os.EX_OK
+
+
 def script(config, docs, **kwargs):
     ready, error = prepare_docs_script_mode(config, docs)
     if not ready:
         return error
+    if getattr(config, 'script_format', 'bash') != 'bash':
+        return scriptplan(config, docs, **kwargs)
     file = kwargs.get('file', sys.stdout)
+    tools_setup(config, docs)
     print(preamble, file=file)
-    buildsuccess, results = docbuild(config, docs, **kwargs)
+    for k, v in sorted(scriptenviron(config).items()):
+        print('export %s=%s' % (k, shlex.quote(v)), file=file)
+    buildsuccess, results = docbuild_serial(config, docs, **kwargs)
     print(postamble, file=file)
     for errcode, source in results:
         if not errcode:
@@ -318,7 +824,18 @@ def build(config, docs, **kwargs):
     ready, error = prepare_docs_build_mode(config, docs)
     if not ready:
         return error
-    buildsuccess, results = docbuild(config, docs, **kwargs)
+    config.buildhistory = buildhistory_setup(config)
+    config.artifactcache = artifactcache_setup(config)
+    try:
+        buildsuccess, results = docbuild(config, docs, **kwargs)
+    finally:
+        if config.buildhistory is not None:
+            config.buildhistory.close()
+        if config.artifactcache is not None:
+            removed = config.artifactcache.trim()
+            logger.debug("Evicted %d entries from the artifact cache.",
+                         removed)
+        config.buildhistory = config.artifactcache = None
     for x, (buildcode, source) in enumerate(results, 1):
         if buildcode:
             logger.info("success (%d of %d) available in %s",
@@ -337,16 +854,24 @@ def publish(config, docs, **kwargs):
     result = build(config, docs, **kwargs)
     if result != os.EX_OK:
         return result
+    manifests = dict()
     for x, source in enumerate(docs, 1):
         logger.info("Publishing (%d of %d) to %s.",
                     x, len(docs), source.output.dirname)
         # -- swapdirs must raise an error if there are problems
         #
         swapdirs(source.working.dirname, source.output.dirname)
+        source.working.refresh()
         if os.path.isdir(source.working.dirname):
             logger.debug("%s removing old directory %s",
                          source.stem, source.working.dirname)
             shutil.rmtree(source.working.dirname)
+        collection = os.path.dirname(source.output.dirname)
+        if collection not in manifests:
+            manifests[collection] = Manifest(collection)
+        manifests[collection].record(source.output)
+    for manifest in manifests.values():
+        manifest.save()
     workingdirs = list(set([x.dtworkingdir for x in docs]))
     workingdirs.append(config.builddir)
     post_publish_cleanup(workingdirs)
@@ -421,7 +946,7 @@ def processSkips(config, docs):
                 logger.info("%s skipping doctype %s", stem, doc.doctype)
                 excluded.add(doc)
                 continue
-        if doc.status in skip_stati:
+        if skip_stati and doc.status in skip_stati:
             logger.info("%s skipping status %s", stem, doc.status)
             excluded.add(doc)
             continue
@@ -439,7 +964,7 @@ def extractExplicitDocumentArgs(config, args):
     logger.debug("args included %d documents in filesystem: %r",
                  len(rawdocs), rawdocs)
     for doc in rawdocs:
-        docs.add(SourceDocument(doc))
+        docs.add(SourceDocument(doc, **sourceoptions(config)))
     return docs, remainder
 
 
@@ -474,21 +999,36 @@ def collectWorkset(config, args):
             return None, ERR_NEEDPUBDIR + "for inventory"
         if not config.sourcedir:
             return None, ERR_NEEDSOURCEDIR + "for inventory"
-        inv = Inventory(config.pubdir, config.sourcedir)
+        # -- if documents were requested only by stem name, look only for
+        #    those stems, rather than scanning the entire collection
+        #
+        stems = None
+        if remainder and not stati:
+            stems = remainder
+        inv = Inventory(config.pubdir, config.sourcedir, stems=stems,
+                        scanjobs=getattr(config, 'scan_jobs', 1),
+                        **sourceoptions(config))
         logger.info("Inventory contains %s source and %s output documents.",
                     len(inv.source.keys()), len(inv.output.keys()))
     else:
         inv = None
 
+    # -- the Inventory classifies lazily, so only ask for the status
+    #    collections which could contain the requested documents
+    #
     if stati:
-        docs = getDocumentsByStatus(inv.all.values(), stati)
+        candidates = SourceCollection()
+        for status in stati:
+            candidates.update(getattr(inv, status))
+        docs = getDocumentsByStatus(candidates.values(), stati)
         workset.update(docs)
         if docs:
             logger.info("Added %d docs, found by status class .", len(docs))
 
     unknownargs = None
     if remainder:
-        docs, unknownargs = getDocumentsByStems(inv.all.values(), remainder)
+        candidates = inv.source.values() + inv.orphan.values()
+        docs, unknownargs = getDocumentsByStems(candidates, remainder)
         workset.update(docs)
         logger.info("Added %d docs, found by stem name.", len(docs))
 
@@ -526,6 +1066,12 @@ def handleArgs(config, args):
     if config.summary:
         return summary(config, *args)
 
+    if config.timing_report:
+        return timing_report(config, *args)
+
+    if config.cache_stats:
+        return cache_stats(config, *args)
+
     docs, error = collectWorkset(config, args)
 
     if error:
@@ -538,6 +1084,9 @@ def handleArgs(config, args):
     if config.detail:
         return detail(config, docs)
 
+    if config.forget_backends:
+        return forget_backends(config, docs)
+
     # -- build(), script() and publish() will not be able to deal
     #    with orphans or with unknown source document types
     #
@@ -582,7 +1131,15 @@ def run(argv):
         logger.debug("  %s = %r", param, value)
     logger.debug("  args: %r", args)
 
-    return handleArgs(config, args)
+    config.hashcache = hashcache_setup(config)
+    config.toolcache = toolcache_setup(config)
+    try:
+        return handleArgs(config, args)
+    finally:
+        if config.hashcache is not None:
+            config.hashcache.save()
+        if config.toolcache is not None:
+            config.toolcache.save()
 
 
 def main():
@@ -0,0 +1,190 @@
+#! /usr/bin/python
+# -*- coding: utf8 -*-
+#
+# Copyright (c) 2016 Linux Documentation Project
+
+from __future__ import absolute_import, division, print_function
+from __future__ import unicode_literals
+
+import os
+import json
+import time
+import errno
+import codecs
+import logging
+import threading
+
+from tldp.utils import md5file, writejson
+
+logger = logging.getLogger(__name__)
+
+# -- a file modified this recently (in nanoseconds) could still be modified
+#    again without any visible change to its stat() information, so the
+#    hash is used, but not remembered (cf. "racy git")
+#
+RACY_WINDOW = 2 * 10**9
+
+
+def statkey(st):
+    '''return the list of stat() fields which identify a file's content'''
+    return [st.st_ino, st.st_size, st.st_mtime_ns, st.st_ctime_ns]
+
+
+class HashCache(object):
+    '''a persistent, stat()-keyed cache of MD5 hashes of source files
+
+    Computing the MD5SUMS for every SourceDocument means reading every byte
+    of every source tree on every run.  The HashCache remembers the MD5 of
+    each file along with its inode, size, mtime and ctime.  If none of these
+    has changed since the hash was computed, the remembered hash is returned
+    and the file is not read at all.
+
+    The cache file is a small JSON document.  It is written to a temporary
+    file and renamed into place, so a crash cannot leave a half-written
+    cache behind.  If the cache file is unreadable, of an unknown version or
+    otherwise corrupt, it is ignored (and replaced on the next save()).  It
+    is only read when a file is first hashed, so a run which hashes nothing
+    (e.g. --list or --doctypes) pays nothing for a large cache.
+    '''
+    version = 1
+
+    def __repr__(self):
+        return '<%s:%s (%d entries)>' % (self.__class__.__name__,
+                                         self.filename, len(self.entries))
+
+    def __init__(self, filename):
+        self.filename = os.path.abspath(filename)
+        self._entries = None
+        self.trees = set()
+        self.seen = set()
+        self.dirty = False
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    @property
+    def entries(self):
+        '''the cached entries (the cache file is read on first use)'''
+        if self._entries is None:
+            with self.lock:
+                if self._entries is None:
+                    self._entries = self.load()
+        return self._entries
+
+    def load(self):
+        '''return the entries of the cache file; tolerate any corruption'''
+        result = dict()
+        try:
+            with codecs.open(self.filename, encoding='utf-8') as f:
+                data = json.load(f)
+        except IOError as e:
+            if e.errno != errno.ENOENT:
+                logger.warning("Could not read hash cache %s: %s",
+                               self.filename, e)
+            return result
+        except ValueError as e:
+            logger.warning("Ignoring corrupt hash cache %s: %s",
+                           self.filename, e)
+            return result
+        if not isinstance(data, dict) or data.get('version') != self.version:
+            logger.warning("Ignoring hash cache %s with unknown version.",
+                           self.filename)
+            return result
+        entries = data.get('entries', dict())
+        if not isinstance(entries, dict):
+            logger.warning("Ignoring corrupt hash cache %s.", self.filename)
+            return result
+        for name, entry in entries.items():
+            if isinstance(entry, list) and len(entry) == 5:
+                result[name] = entry
+        logger.debug("Loaded %d entries from hash cache %s.",
+                     len(result), self.filename)
+        return result
+
+    def scanning(self, name):
+        '''note that every file in the tree name is about to be hashed
+
+        When the cache is saved, the entries beneath any such tree which
+        were not looked up in this run (i.e. the files are gone) are
+        dropped.  Entries elsewhere are left alone.
+        '''
+        self.entries  # -- read now, even if the tree turns out empty
+        with self.lock:
+            self.trees.add(os.path.abspath(name))
+
+    def prune(self):
+        '''drop the entries of files gone from the trees scanned (locked)'''
+        if not self.trees:
+            return
+        prefixes = tuple(os.path.join(x, '') for x in self.trees)
+        gone = [x for x in self._entries if x not in self.seen and
+                (x in self.trees or x.startswith(prefixes))]
+        for name in gone:
+            del self._entries[name]
+        if gone:
+            self.dirty = True
+
+    def save(self):
+        '''atomically write the cache file, if anything changed
+
+        A cache which was never used is neither read nor written.  A cache
+        file which cannot be written is only worth a warning; returns False.
+        '''
+        with self.lock:
+            if self._entries is None:
+                return True
+            self.prune()
+            if not self.dirty:
+                return True
+            data = dict(version=self.version, entries=dict(self._entries))
+            self.dirty = False
+        dirname = os.path.dirname(self.filename)
+        try:
+            if not os.path.isdir(dirname):
+                os.makedirs(dirname)
+            writejson(self.filename, data)
+        except (IOError, OSError) as e:
+            logger.warning("Could not write hash cache %s: %s",
+                           self.filename, e)
+            return False
+        logger.debug("Saved %d entries to hash cache %s (%d hits, %d misses).",
+                     len(data['entries']), self.filename,
+                     self.hits, self.misses)
+        return True
+
+    def invalidate(self, name=None):
+        '''forget a single file (or, without an argument, everything)'''
+        entries = self.entries
+        with self.lock:
+            if name is None:
+                entries.clear()
+            else:
+                entries.pop(os.path.abspath(name), None)
+            self.dirty = True
+
+    def md5file(self, name, hashfunc=md5file):
+        '''return MD5 hash for a single file name, reading it only if needed'''
+        name = os.path.abspath(name)
+        st = os.stat(name)
+        key = statkey(st)
+        entries = self.entries
+        entry = entries.get(name)
+        if entry is not None and entry[:4] == key:
+            with self.lock:
+                self.hits += 1
+                self.seen.add(name)
+            return entry[4]
+        md5 = hashfunc(name)
+        with self.lock:
+            self.misses += 1
+            self.seen.add(name)
+            if time.time() * 10**9 - st.st_mtime_ns < RACY_WINDOW:
+                if entries.pop(name, None) is not None:
+                    self.dirty = True
+            else:
+                entries[name] = key + [md5]
+                self.dirty = True
+        return md5
+
+#
+# -- end of file
@@ -0,0 +1,327 @@
+#! /usr/bin/python
+# -*- coding: utf8 -*-
+#
+# Copyright (c) 2016 Linux Documentation Project
+
+from __future__ import absolute_import, division, print_function
+from __future__ import unicode_literals
+
+import re
+import codecs
+import logging
+from html.parser import HTMLParser
+
+logger = logging.getLogger(__name__)
+
+WIDTH = 79
+
+# -- whitespace, but not the no-break space, which joins words just like
+#    any other character until the line is written
+#
+space_re = re.compile(r'[ \t\n\r\f\v]+')
+charset_re = re.compile(br'''<meta[^>]+charset=["']?([-\w.:]+)''', re.I)
+
+# -- ASCII stand-ins for common characters the output encoding may lack
+#
+fallbacks = {0x2013: '-', 0x2014: '--', 0x2018: "'", 0x2019: "'",
+             0x201c: '"', 0x201d: '"', 0x2022: '*', 0x2026: '...',
+             0x00a9: '(C)', 0x00ae: '(R)', 0x2122: '(TM)'}
+
+skipped = frozenset(('head', 'script', 'style'))
+paragraphs = frozenset(('p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'address'))
+flushed = frozenset(('div', 'center', 'form', 'dt'))
+lists = frozenset(('ul', 'ol', 'dir', 'menu', 'dl'))
+bullets = ('*', 'o', '+', '#')
+
+
+def wrap(words, width, first, rest):
+    '''fill words into lines of width; indents first and rest (strings)'''
+    lines = list()
+    line = None
+    for word in words:
+        if line is None:
+            line = first + word
+        elif len(line) + 1 + len(word) > width:
+            lines.append(line)
+            line = rest + word
+        else:
+            line = line + ' ' + word
+    if line is not None:
+        lines.append(line)
+    return lines
+
+
+class TextRenderer(HTMLParser):
+    '''render HTML as plain text, after html2text -style pretty -nobs
+
+    Headings and paragraphs are filled to the width and separated by blank
+    lines; emphasis is dropped (there are no backspace sequences); lists get
+    bullets or numbers, definition lists (e.g. the DocBook tables of
+    contents) indent each DD by four columns; preformatted text is kept;
+    tables are laid out in columns; each HR is a line of dashes.
+    '''
+
+    def __init__(self, width=WIDTH):
+        HTMLParser.__init__(self, convert_charrefs=True)
+        self.width = width
+        self.lines = list()
+        self.segments = [[]]
+        self.margin = 0
+        self.prefix = None
+        self.margins = list()
+        self.lists = list()
+        self.blank = 0
+        self.pre = 0
+        self.verbatim = list()
+        self.skip = 0
+        self.table = None
+        self.tables = list()
+
+    def render(self, html):
+        '''return the text of the HTML string html'''
+        self.feed(html)
+        self.close()
+        self.flush()
+        return ''.join(x.replace('\xa0', ' ').rstrip() + '\n'
+                       for x in self.lines)
+
+    # -- output
+    #
+    def vspace(self, n=1):
+        self.blank = max(self.blank, n)
+
+    def emit(self, lines):
+        if not lines:
+            return
+        if self.lines:
+            self.lines.extend([''] * self.blank)
+        self.blank = 0
+        self.lines.extend(lines)
+
+    def indent(self):
+        '''return the indents of the first and further lines of a block'''
+        rest = ' ' * self.margin
+        first = rest
+        if self.prefix is not None:
+            first, self.prefix = self.prefix, None
+        return first, rest
+
+    def flush(self):
+        '''write the collected text (if any) as a filled paragraph'''
+        segments, self.segments = self.segments, [[]]
+        lines = list()
+        for segment in segments:
+            words = [x for x in space_re.split(''.join(segment)) if x]
+            if not words:
+                continue
+            first, rest = self.indent()
+            lines.extend(wrap(words, self.width, first, rest))
+        self.emit(lines)
+
+    def block(self, n=0):
+        self.flush()
+        self.vspace(n)
+
+    # -- the parser
+    #
+    def handle_starttag(self, tag, attrs):
+        if tag in skipped:
+            self.skip += 1
+        if self.skip:
+            return
+        if self.table is not None:
+            return self.table_starttag(tag, attrs)
+        if tag == 'br':
+            self.segments.append([])
+        elif tag == 'img':
+            self.image(attrs)
+        elif tag in paragraphs:
+            self.block(1)
+        elif tag in flushed:
+            self.flush()
+        elif tag == 'pre':
+            self.block(1)
+            self.pre += 1
+        elif tag == 'hr':
+            self.block(1)
+            self.emit(['-' * (self.width - 2 - self.margin)])
+            self.vspace(1)
+        elif tag in lists:
+            self.block(0 if self.lists else 1)
+            self.lists.append([tag, 0])
+        elif tag == 'li':
+            self.flush()
+            self.margins.append(self.margin)
+            kind = self.lists[-1] if self.lists else ['ul', 0]
+            kind[1] += 1
+            if kind[0] == 'ol':
+                bullet = '%d. ' % (kind[1],)
+            else:
+                level = len([x for x in self.lists if x[0] != 'ol'])
+                bullet = bullets[max(level - 1, 0) % len(bullets)] + ' '
+            self.prefix = ' ' * (self.margin + 2) + bullet
+            self.margin = len(self.prefix)
+        elif tag in ('dd', 'blockquote'):
+            self.block(1 if tag == 'blockquote' else 0)
+            self.margins.append(self.margin)
+            self.margin += 4
+        elif tag == 'table':
+            self.block(1)
+            self.table = list()
+
+    def handle_endtag(self, tag):
+        if tag in skipped:
+            self.skip = max(self.skip - 1, 0)
+            return
+        if self.skip:
+            return
+        if self.table is not None:
+            return self.table_endtag(tag)
+        if tag in paragraphs:
+            self.block(1)
+        elif tag in flushed:
+            self.flush()
+        elif tag == 'pre':
+            self.pre = max(self.pre - 1, 0)
+            if not self.pre:
+                self.preformatted()
+            self.block(1)
+        elif tag in lists:
+            self.flush()
+            if self.lists:
+                self.lists.pop()
+            if not self.lists:
+                self.vspace(1)
+        elif tag in ('li', 'dd', 'blockquote'):
+            self.flush()
+            self.prefix = None
+            if self.margins:
+                self.margin = self.margins.pop()
+            if tag == 'blockquote':
+                self.vspace(1)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in ('br', 'img', 'hr'):
+            self.handle_endtag(tag)
+
+    def handle_data(self, data):
+        if self.skip:
+            return
+        if self.table is not None:
+            if self.table and self.table[-1]:
+                self.table[-1][-1].append(data)
+            return
+        if self.pre:
+            return self.verbatim.append(data)
+        self.segments[-1].append(data)
+
+    def image(self, attrs):
+        alt = dict(attrs).get('alt')
+        text = '[%s]' % (alt,) if alt else '[IMAGE]'
+        if self.table is not None:
+            return self.handle_data(text)
+        self.segments[-1].append(text)
+
+    def preformatted(self):
+        '''write the text of a PRE as is, each line indented by the margin'''
+        text, self.verbatim = ''.join(self.verbatim), list()
+        if text.startswith('\n'):
+            text = text[1:]
+        lines = text.rstrip('\n').expandtabs().split('\n')
+        self.emit([' ' * self.margin + x for x in lines if text])
+
+    # -- tables:  the text of each cell is collected, then the whole table
+    #    is laid out when it ends; nested tables are flattened into a cell
+    #
+    def table_starttag(self, tag, attrs):
+        if tag == 'table':
+            self.tables.append(tag)
+        elif tag == 'tr' and not self.tables:
+            self.table.append(list())
+        elif tag in ('td', 'th') and not self.tables:
+            if not self.table:
+                self.table.append(list())
+            self.table[-1].append(list())
+        elif tag == 'img':
+            self.image(attrs)
+        else:
+            self.handle_data(' ')
+
+    def table_endtag(self, tag):
+        if tag == 'table':
+            if self.tables:
+                self.tables.pop()
+                return
+            rows, self.table = self.table, None
+            self.emit(self.layout(rows))
+            self.vspace(1)
+        else:
+            self.handle_data(' ')
+
+    def layout(self, rows):
+        '''return the lines of a table of rows of cells (lists of strings)'''
+        rows = [[[x for x in space_re.split(''.join(cell)) if x]
+                 for cell in row] for row in rows]
+        rows = [row for row in rows if any(row)]
+        if not rows:
+            return []
+        columns = max(len(row) for row in rows)
+        widths = [0] * columns
+        for row in rows:
+            for x, words in enumerate(row):
+                widths[x] = max(widths[x], len(' '.join(words)))
+        avail = self.width - self.margin - 2 * (columns - 1)
+        while sum(widths) > avail and max(widths) > 10:
+            widths[widths.index(max(widths))] -= 1
+        lines = list()
+        for row in rows:
+            cells = [wrap(words, widths[x], '', '')
+                     for x, words in enumerate(row)]
+            for n in range(max(len(x) for x in cells)):
+                parts = list()
+                for x in range(columns):
+                    cell = cells[x] if x < len(cells) else []
+                    text = cell[n] if n < len(cell) else ''
+                    parts.append(text.ljust(widths[x]))
+                lines.append(' ' * self.margin + '  '.join(parts))
+        return lines
+
+
+def charset(head, default='iso-8859-1'):
+    '''return the (codec) name of the charset declared in the head (bytes)
+    of an HTML file, or of the default'''
+    m = charset_re.search(head)
+    if m is not None:
+        try:
+            return codecs.lookup(m.group(1).decode('ascii')).name
+        except LookupError:
+            pass
+    return codecs.lookup(default).name
+
+
+def render(source, output, width=WIDTH):
+    '''write the text of the HTML file source to output
+
+    The output uses the character set of the source (as does html2text);
+    characters it cannot represent get an ASCII stand-in (or '?').
+
+    Returns True on success; any error is logged.
+    '''
+    try:
+        with open(source, 'rb') as f:
+            data = f.read()
+        encoding = charset(data[:2048])
+        html = data.decode(encoding, 'replace')
+        text = TextRenderer(width=width).render(html)
+        if not encoding.startswith('utf'):
+            text = text.translate(fallbacks)
+        with open(output, 'wb') as f:
+            f.write(text.encode(encoding, 'replace'))
+    except (IOError, OSError) as e:
+        logger.error("Could not render %s as text: %s", source, e)
+        return False
+    return True
+
+#
+# -- end of file
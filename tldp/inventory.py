@@ -6,9 +6,11 @@
 from __future__ import absolute_import, division, print_function
 from __future__ import unicode_literals
 
-import copy
 import logging
+import operator
+import functools
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 from tldp.sources import SourceCollection
 from tldp.outputs import OutputCollection
@@ -44,6 +46,20 @@ status_classes['work'] = ['new', 'orphan', 'broken', 'stale']
 status_classes['all'] = ['published', 'new', 'orphan', 'broken', 'stale']
 
 
+def memoized(f):
+    '''a read-only property, computed on first access and then remembered'''
+    name = '_' + f.__name__
+
+    @functools.wraps(f)
+    def getter(self):
+        try:
+            return self.__dict__[name]
+        except KeyError:
+            value = self.__dict__[name] = f(self)
+            return value
+    return property(getter)
+
+
 class Inventory(object):
     '''a container for classifying documents by their status
 
@@ -65,6 +81,17 @@ class Inventory(object):
     The Inventory object is intended to be used to identify work that needs to
     be done on individual source documents to produce up-to-date output
     documents.
+
+    The status collections (and, therefore, getByStatusClass) do not copy
+    anything; they share the SourceDocument and OutputDirectory objects in
+    the source and output collections, so the status attribute of a document
+    in the source collection reflects its classification.
+
+    Each status collection is computed on first access and then remembered.
+    Determining 'broken' and 'stale' documents means examining the output
+    directory and hashing the source files of each published document, so
+    callers interested only in 'new' or 'orphan' documents (or in a single
+    document's status) never pay for the rest.
     '''
     def __repr__(self):
         return '<%s: %d published, %d orphan, %d new, %d stale, %d broken>' % (
@@ -75,7 +102,7 @@ class Inventory(object):
                len(self.stale),
                len(self.broken),)
 
-    def __init__(self, pubdir, sourcedirs):
+    def __init__(self, pubdir, sourcedirs, stems=None, **kwargs):
         '''construct an Inventory
 
         pubdir: path to the OutputCollection
@@ -84,78 +111,91 @@ class Inventory(object):
           SourceCollection object; essentially a directory containing
           SourceDocuments; for example LDP/LDP/howto/linuxdoc and
           LDP/LDP/guide/docbook
+
+        stems: optional list of stem names; if supplied, the Inventory
+          only looks for (and classifies) these documents, so the rest of
+          the source and output collections are never scanned
+
+        Any keyword arguments (e.g. hashcache) are passed along to the
+        SourceCollection.  If hashjobs is greater than 1, the source
+        documents are hashed concurrently when the stale documents are
+        first requested.
         '''
-        self.output = OutputCollection(pubdir)
-        self.source = SourceCollection(sourcedirs)
-        s = copy.deepcopy(self.source)
-        o = copy.deepcopy(self.output)
-        sset = set(s.keys())
-        oset = set(o.keys())
-
-        # -- orphan identification
-        #
-        self.orphan = OutputCollection()
-        for doc in oset.difference(sset):
-            self.orphan[doc] = o[doc]
-            del o[doc]
-            self.orphan[doc].status = 'orphan'
-        logger.debug("Identified %d orphan documents: %r.", len(self.orphan),
-                     self.orphan.keys())
-
-        # -- unpublished ('new') identification
-        #
-        self.new = SourceCollection()
-        for doc in sset.difference(oset):
-            self.new[doc] = s[doc]
-            del s[doc]
-            self.new[doc].status = 'new'
-        logger.debug("Identified %d new documents: %r.", len(self.new),
-                     self.new.keys())
-
-        # -- published identification; source and output should be same size
-        assert len(s) == len(o)
-        for stem, odoc in o.items():
-            sdoc = s[stem]
-            sdoc.output = odoc
-            odoc.source = sdoc
-            sdoc.status = sdoc.output.status = 'published'
-        self.published = s
-        logger.debug("Identified %d published documents.", len(self.published))
-
-        # -- broken identification
-        #
-        self.broken = SourceCollection()
-        for stem, sdoc in s.items():
-            if not sdoc.output.iscomplete:
-                self.broken[stem] = sdoc
-                sdoc.status = sdoc.output.status = 'broken'
-        logger.debug("Identified %d broken documents: %r.", len(self.broken),
-                     self.broken.keys())
-
-        # -- stale identification
+        self.output = OutputCollection(pubdir, stems=stems)
+        self.source = SourceCollection(sourcedirs, stems=stems, **kwargs)
+        self.hashjobs = kwargs.get('hashjobs', 1)
+
+        # -- pair up the documents by stem; this needs nothing but the
+        #    names, so it is cheap; any further (expensive) classification
+        #    happens on first access to the status collections below, or to
+        #    the status of an individual document
         #
-        self.stale = SourceCollection()
-        for stem, sdoc in s.items():
-            odoc = sdoc.output
-            omd5, smd5 = odoc.md5sums, sdoc.md5sums
-            if omd5 != smd5:
-                logger.debug("%s differing MD5 sets %r %r", stem, smd5, omd5)
-                changed = set()
-                for gone in set(omd5.keys()).difference(smd5.keys()):
-                    logger.debug("%s gone %s", stem, gone)
-                    changed.add(('gone', gone))
-                for new in set(smd5.keys()).difference(omd5.keys()):
-                    changed.add(('new', new))
-                for sfn in set(smd5.keys()).intersection(omd5.keys()):
-                    if smd5[sfn] != omd5[sfn]:
-                        changed.add(('changed', sfn))
-                for why, sfn in changed:
-                    logger.debug("%s differing source %s (%s)", stem, sfn, why)
-                odoc.status = sdoc.status = 'stale'
-                sdoc.differing = changed
-                self.stale[stem] = sdoc
-        logger.debug("Identified %d stale documents: %r.", len(self.stale),
-                     self.stale.keys())
+        for stem in set(self.source).union(self.output):
+            sdoc = self.source.get(stem)
+            odoc = self.output.get(stem)
+            if sdoc is None:
+                odoc.status = 'orphan'
+            elif odoc is None:
+                sdoc.status = 'new'
+            else:
+                sdoc.output = odoc
+                odoc.source = sdoc
+                sdoc.status = odoc.status = None
+
+    @memoized
+    def orphan(self):
+        orphan = OutputCollection()
+        for stem, odoc in self.output.items():
+            if odoc.source is None:
+                orphan[stem] = odoc
+        logger.debug("Identified %d orphan documents: %r.", len(orphan),
+                     orphan.keys())
+        return orphan
+
+    @memoized
+    def new(self):
+        new = SourceCollection()
+        for stem, sdoc in self.source.items():
+            if sdoc.output is None:
+                new[stem] = sdoc
+        logger.debug("Identified %d new documents: %r.", len(new), new.keys())
+        return new
+
+    @memoized
+    def published(self):
+        published = SourceCollection()
+        for stem, sdoc in self.source.items():
+            if sdoc.output is not None:
+                published[stem] = sdoc
+        logger.debug("Identified %d published documents.", len(published))
+        return published
+
+    @memoized
+    def broken(self):
+        broken = SourceCollection()
+        for stem, sdoc in self.published.items():
+            if sdoc.isbroken:
+                broken[stem] = sdoc
+        logger.debug("Identified %d broken documents: %r.", len(broken),
+                     broken.keys())
+        return broken
+
+    @memoized
+    def stale(self):
+        docs = self.published.values()
+        if self.hashjobs > 1 and len(docs) > 1:
+            # -- hash the source documents concurrently; the differing
+            #    property (below) then finds the memoized md5sums
+            #
+            with ThreadPoolExecutor(max_workers=self.hashjobs) as pool:
+                list(pool.map(operator.attrgetter('md5sums'), docs))
+        stale = SourceCollection()
+        for sdoc in docs:
+            if sdoc.differing:
+                stale[sdoc.stem] = sdoc
+        logger.debug("Identified %d stale documents: %r.", len(stale),
+                     stale.keys())
+        return stale
 
     def getByStatusClass(self, status_class):
         desired = status_classes.get(status_class, None)
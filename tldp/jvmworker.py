@@ -0,0 +1,144 @@
+#! /usr/bin/python
+# -*- coding: utf8 -*-
+#
+# Copyright (c) 2016 Linux Documentation Project
+
+from __future__ import absolute_import, division, print_function
+from __future__ import unicode_literals
+
+import os
+import time
+import codecs
+import shutil
+import logging
+import tempfile
+import subprocess
+
+from tldp.utils import which
+
+logger = logging.getLogger(__name__)
+
+# -- the main classes of the Java tools, as run by their wrapper scripts
+#
+FOP = 'org.apache.fop.cli.Main'
+JING = 'com.thaiopensource.relaxng.util.Driver'
+
+NAILGUN_SERVER = 'com.facebook.nailgun.NGServer'
+
+# -- exit codes of the nailgun client itself (cf. ng.c), e.g. the server
+#    could not be reached or died while running the job; any other exit
+#    code is that of the Java tool
+#
+CLIENT_ERRORS = frozenset(range(226, 232))
+
+
+def ng_finder():
+    '''return the nailgun client (Debian calls it ng-nailgun), or None'''
+    return which('ng-nailgun') or which('ng')
+
+
+def classpath_finder():
+    '''return a classpath with all of the system's Java libraries, or None'''
+    dirname = '/usr/share/java'
+    if os.path.isdir(dirname):
+        return os.path.join(dirname, '*')
+    return None
+
+
+class JVMWorker(object):
+    '''a long-lived JVM (a nailgun server) running Java tools for a build
+
+    FOP and jing each start a new JVM, and spend much of their run time
+    starting up and warming up the JIT.  The JVMWorker starts a single
+    nailgun server for a build run, listening on a Unix socket in a private
+    directory; a job is then just the small nailgun client, connecting to
+    the warm JVM and running the tool's main class there.
+
+    The Java tools see only absolute paths (the server does not share the
+    client's working directory).  If the server dies, or cannot run a main
+    class, the caller is expected to run the tool in its own JVM instead.
+    '''
+
+    def __repr__(self):
+        return '<%s:%s>' % (self.__class__.__name__, self.address)
+
+    def __init__(self, java, ng, classpath, server=NAILGUN_SERVER):
+        self.java = java
+        self.ng = ng
+        self.classpath = classpath
+        self.server = server
+        self.dirname = tempfile.mkdtemp(prefix='ldptool-jvm-')
+        self.socket = os.path.join(self.dirname, 'nailgun.socket')
+        self.address = 'local:' + self.socket
+        self.logfile = os.path.join(self.dirname, 'nailgun.log')
+        self.process = None
+        self.owner = os.getpid()
+        self.broken = set()
+
+    def start(self, timeout=30):
+        '''start the server; return True once it is accepting jobs'''
+        argv = [self.java, '-Djava.awt.headless=true',
+                '-cp', self.classpath, self.server, self.address]
+        logger.info("Starting JVM worker: %s", ' '.join(argv))
+        with open(self.logfile, 'wb') as log:
+            try:
+                self.process = subprocess.Popen(argv, stdout=log,
+                                                stdin=subprocess.DEVNULL,
+                                                stderr=subprocess.STDOUT)
+            except OSError as e:
+                logger.error("Could not start JVM worker: %s", e)
+                return False
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                break
+            if os.path.exists(self.socket):
+                return True
+            time.sleep(0.05)
+        with codecs.open(self.logfile, encoding='utf-8',
+                         errors='replace') as f:
+            for line in f:
+                logger.info("JVM worker: %s", line.rstrip())
+        logger.error("JVM worker did not start (exit code %s).",
+                     self.process.poll())
+        self.stop()
+        return False
+
+    def alive(self):
+        '''True if the server is (still) running'''
+        if self.process is None:
+            return False
+        if os.getpid() == self.owner:
+            if self.process.poll() is not None:
+                return False
+        else:
+            # -- a forked build process cannot poll() its parent's child
+            try:
+                os.kill(self.process.pid, 0)
+            except OSError:
+                return False
+        return os.path.exists(self.socket)
+
+    def usable(self, mainclass):
+        '''True if jobs for mainclass should be sent to the server'''
+        return mainclass not in self.broken and self.alive()
+
+    def argv(self, mainclass, args):
+        '''return the nailgun client command to run mainclass with args'''
+        return [self.ng, '--nailgun-server', self.address, mainclass] + \
+            list(args)
+
+    def stop(self, timeout=10):
+        '''stop the server and remove its socket directory'''
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self.process = None
+        shutil.rmtree(self.dirname, ignore_errors=True)
+
+#
+# -- end of file
@@ -0,0 +1,139 @@
+#! /usr/bin/python
+# -*- coding: utf8 -*-
+#
+# Copyright (c) 2016 Linux Documentation Project
+
+from __future__ import absolute_import, division, print_function
+from __future__ import unicode_literals
+
+import os
+import json
+import errno
+import codecs
+import logging
+
+from tldp.utils import writejson
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = '.LDP-manifest.json'
+
+
+def dirkey(st):
+    '''return the list of stat() fields which identify a directory's state'''
+    return [st.st_ino, st.st_mtime_ns, st.st_ctime_ns]
+
+
+class Manifest(object):
+    '''an aggregate record of all OutputDirectory contents in a pubdir
+
+    Classifying the output collection means reading the listing and the
+    .LDP-source-MD5SUMS file of every output directory.  The Manifest keeps
+    both for every stem in a single file at the root of the pubdir, so that
+    the OutputCollection can read one file instead of thousands.
+
+    Each entry also records the inode, mtime and ctime of the output
+    directory.  Adding, removing or renaming a file in the directory (or
+    replacing the directory, as publish does) changes these, so an entry
+    is used only if the directory still matches it; otherwise, the
+    OutputDirectory falls back to reading the directory itself.  (Editing an
+    existing file in place is not detected; run publish to fix that.)
+
+    The manifest file is written to a temporary file and renamed into place.
+    If it is missing, unreadable or corrupt, it is ignored.
+    '''
+    version = 1
+
+    def __repr__(self):
+        return '<%s:%s (%d entries)>' % (self.__class__.__name__,
+                                         self.filename, len(self.entries))
+
+    def __init__(self, dirname):
+        self.dirname = os.path.abspath(dirname)
+        self.filename = os.path.join(self.dirname, MANIFEST)
+        self.entries = dict()
+        self.dirty = False
+        self.load()
+
+    def load(self):
+        '''read the manifest file (if any); tolerate any sort of corruption'''
+        try:
+            with codecs.open(self.filename, encoding='utf-8') as f:
+                data = json.load(f)
+        except IOError as e:
+            if e.errno != errno.ENOENT:
+                logger.warning("Could not read manifest %s: %s",
+                               self.filename, e)
+            return
+        except ValueError as e:
+            logger.warning("Ignoring corrupt manifest %s: %s",
+                           self.filename, e)
+            return
+        if not isinstance(data, dict) or data.get('version') != self.version:
+            logger.warning("Ignoring manifest %s with unknown version.",
+                           self.filename)
+            return
+        entries = data.get('entries', dict())
+        if not isinstance(entries, dict):
+            logger.warning("Ignoring corrupt manifest %s.", self.filename)
+            return
+        for stem, entry in entries.items():
+            if isinstance(entry, dict) and \
+               set(entry.keys()) == set(('dirstat', 'listing', 'md5sums')):
+                self.entries[stem] = entry
+        logger.debug("Loaded %d entries from manifest %s.",
+                     len(self.entries), self.filename)
+
+    def save(self):
+        '''atomically write the manifest file, if anything changed
+
+        The entries of stems without an output directory (removed or renamed
+        documents) are dropped first.
+        '''
+        for stem in list(self.entries):
+            if not os.path.isdir(os.path.join(self.dirname, stem)):
+                self.forget(stem)
+        if not self.dirty:
+            return
+        data = dict(version=self.version, entries=self.entries)
+        writejson(self.filename, data)
+        self.dirty = False
+        logger.debug("Saved %d entries to manifest %s.",
+                     len(self.entries), self.filename)
+
+    def prime(self, output):
+        '''supply listing and md5sums to an OutputDirectory, if up to date
+
+        Returns True if the OutputDirectory could be primed from the
+        manifest, False if it will have to read its directory.
+        '''
+        entry = self.entries.get(output.stem)
+        if entry is None:
+            return False
+        try:
+            st = os.stat(output.dirname)
+        except OSError:
+            return False
+        if dirkey(st) != entry['dirstat']:
+            logger.debug("%s manifest entry is out of date", output.stem)
+            return False
+        output._listing = dict(entry['listing'])
+        output._md5sums = dict(entry['md5sums'])
+        return True
+
+    def record(self, output):
+        '''remember the current state of an OutputDirectory'''
+        st = os.stat(output.dirname)
+        output.refresh()
+        self.entries[output.stem] = dict(dirstat=dirkey(st),
+                                         listing=output.listing,
+                                         md5sums=output.md5sums)
+        self.dirty = True
+
+    def forget(self, stem):
+        '''drop the entry for stem'''
+        if self.entries.pop(stem, None) is not None:
+            self.dirty = True
+
+#
+# -- end of file
@@ -13,7 +13,8 @@ import codecs
 import logging
 
 from tldp.ldpcollection import LDPDocumentCollection
-from tldp.utils import logdir
+from tldp.utils import logdir, listentries
+from tldp.manifest import Manifest, MANIFEST
 
 logger = logging.getLogger(__name__)
 
@@ -33,6 +34,7 @@ class OutputNamingConvention(object):
     def __init__(self, dirname, stem):
         self.dirname = dirname
         self.stem = stem
+        self.refresh()
 
     @property
     def MD5SUMS(self):
@@ -70,6 +72,28 @@ class OutputNamingConvention(object):
     def validsource(self):
         return os.path.join(self.dirname, self.stem + '.xml')  # -- burp
 
+    def refresh(self):
+        '''forget the memoized directory listing and MD5SUMS
+
+        Call this after anything (e.g. a build or publication) has changed
+        the contents of the output directory.
+        '''
+        self._listing = None
+        self._md5sums = None
+
+    @property
+    def listing(self):
+        '''dict() of name -> True (plain file) or False for the output dir
+
+        The directory is read once; iscomplete, missing and md5sums are all
+        answered from this snapshot until refresh() is called.  (The
+        OutputCollection may also supply the snapshot from its manifest.)
+        '''
+        if self._listing is None:
+            self._listing = dict((x.name, x.is_file())
+                                 for x in listentries(self.dirname))
+        return self._listing
+
     @property
     def iscomplete(self):
         '''True if the output directory contains all expected documents'''
@@ -77,7 +101,7 @@ class OutputNamingConvention(object):
         for prop in self.expected:
             name = getattr(self, prop, None)
             assert name is not None
-            present.append(os.path.exists(name))
+            present.append(os.path.basename(name) in self.listing)
         return all(present)
 
     @property
@@ -87,23 +111,27 @@ class OutputNamingConvention(object):
         for prop in self.expected:
             name = getattr(self, prop, None)
             assert name is not None
-            if not os.path.isfile(name):
+            if not self.listing.get(os.path.basename(name)):
                 missing.add(name)
         return missing
 
     @property
     def md5sums(self):
+        if self._md5sums is not None:
+            return self._md5sums
         d = dict()
-        try:
-            with codecs.open(self.MD5SUMS, encoding='utf-8') as f:
-                for line in f:
-                    if line.startswith('#'):
-                        continue
-                    hashval, fname = line.strip().split()
-                    d[fname] = hashval
-        except IOError as e:
-            if e.errno != errno.ENOENT:
-                raise
+        if os.path.basename(self.MD5SUMS) in self.listing:
+            try:
+                with codecs.open(self.MD5SUMS, encoding='utf-8') as f:
+                    for line in f:
+                        if line.startswith('#'):
+                            continue
+                        hashval, fname = line.strip().split()
+                        d[fname] = hashval
+            except IOError as e:
+                if e.errno != errno.ENOENT:
+                    raise
+        self._md5sums = d
         return d
 
 
@@ -146,6 +174,17 @@ class OutputDirectory(OutputNamingConvention):
         self.source = source
         self.logdir = os.path.join(self.dirname, logdir)
 
+    @property
+    def status(self):
+        '''the status of the document; None means: same as the source'''
+        if self._status is None and self.source is not None:
+            return self.source.status
+        return self._status
+
+    @status.setter
+    def status(self, value):
+        self._status = value
+
     def detail(self, widths, verbose, file=sys.stdout):
         template = ' '.join(('{s.status:{w.status}}',
                              '{u:{w.doctype}}',
@@ -165,7 +204,7 @@ class OutputCollection(LDPDocumentCollection):
     The use of the stem as a key works conveniently with the
     SourceCollection which uses the same strategy on SourceDocuments.
     '''
-    def __init__(self, dirname=None):
+    def __init__(self, dirname=None, stems=None):
         '''construct an OutputCollection
 
         If dirname is not supplied, OutputCollection is basically, a dict().
@@ -192,6 +231,12 @@ class OutputCollection(LDPDocumentCollection):
               "Wireless-HOWTO": OutputDirectory("/path/en/Wireless-HOWTO")
               }
 
+        If stems is supplied, OutputCollection does not scan dirname, but
+        looks only for the subdirectories named by stems.
+
+        If dirname contains a Manifest (written by publish), each
+        OutputDirectory whose entry is still up to date is primed from it,
+        so it need not read its own directory listing or MD5SUMS file.
         '''
         if dirname is None:
             return
@@ -199,16 +244,32 @@ class OutputCollection(LDPDocumentCollection):
             logger.critical("Output collection dir %s must already exist.",
                             dirname)
             raise IOError(errno.ENOENT, os.strerror(errno.ENOENT), dirname)
-        for fname in sorted(os.listdir(dirname), key=lambda x: x.lower()):
-            name = os.path.join(dirname, fname)
-            if not os.path.isdir(name):
-                logger.info("Skipping non-directory %s (in %s)", name, dirname)
-                continue
+        if stems is not None:
+            names = [os.path.join(dirname, x)
+                     for x in sorted(set(stems), key=lambda x: x.lower())]
+            names = [x for x in names if os.path.isdir(x)]
+        else:
+            names = list()
+            for entry in listentries(dirname, key=lambda x: x.name.lower()):
+                if entry.name == MANIFEST:
+                    continue
+                if not entry.is_dir():
+                    logger.info("Skipping non-directory %s (in %s)",
+                                entry.path, dirname)
+                    continue
+                names.append(entry.path)
+        for name in names:
             logger.debug("Found directory %s (in %s)", name, dirname)
             o = OutputDirectory(name)
             assert o.stem not in self
             self[o.stem] = o
 
+        manifest = Manifest(dirname)
+        if manifest.entries:
+            primed = [manifest.prime(o) for o in self.values()]
+            logger.debug("Primed %d of %d output directories from %s.",
+                         sum(primed), len(primed), manifest.filename)
+
 
 #
 # -- end of file
@@ -8,12 +8,15 @@ from __future__ import unicode_literals
 
 import os
 import sys
+import stat
 import errno
 import logging
+import itertools
+from concurrent.futures import ThreadPoolExecutor
 
 from tldp.ldpcollection import LDPDocumentCollection
 
-from tldp.utils import md5files, stem_and_ext
+from tldp.utils import md5file, md5files, stem_and_ext, listentries
 from tldp.typeguesser import guess, knownextensions
 
 logger = logging.getLogger(__name__)
@@ -21,10 +24,21 @@ logger = logging.getLogger(__name__)
 IGNORABLE_SOURCE = ('index.sgml')
 
 
-def scansourcedirs(dirnames):
+def scansourcedirs(dirnames, scanjobs=1, stems=None, **kwargs):
     '''return a dict() of all SourceDocuments discovered in dirnames
     dirnames:  a list of directories containing SourceDocuments.
 
+    If stems is supplied, only entries matching one of these stem names are
+    considered, so no other document is examined (or even stat()ed).
+
+    Any keyword arguments (e.g. hashcache, hashjobs) are passed along to
+    each SourceDocument.
+
+    If scanjobs is greater than 1, the source directories are read, and the
+    SourceDocuments created (and their doctypes guessed), concurrently in
+    that many threads.  The result is identical to the serial scan; in
+    particular, duplicate stems are resolved in the same (sorted) order.
+
     scansourcedirs ensures it is operating on the absolute filesystem path for
     each of the source directories.
 
@@ -62,47 +76,94 @@ def scansourcedirs(dirnames):
                             sdir)
         raise IOError(errno.ENOENT, os.strerror(errno.ENOENT), sdir)
 
-    for sdir in sorted(dirs):
+    if stems is not None:
+        stems = set(stems)
+
+    def scandir(sdir):
         logger.debug("Scanning for source documents in %s.", sdir)
-        for fname in sorted(os.listdir(sdir)):
-            candidates = list()
-            possible = arg_issourcedoc(os.path.join(sdir, fname))
-            if possible:
-                candidates.append(SourceDocument(possible))
-            else:
-                logger.warning("Skipping non-document %s", fname)
-                continue
-            for candy in candidates:
-                if candy.stem in found:
-                    dup = found[candy.stem].filename
-                    logger.warning("Ignoring duplicate is %s", candy.filename)
-                    logger.warning("Existing dup-entry is %s", dup)
-                else:
-                    found[candy.stem] = candy
+        entries = listentries(sdir)
+        if stems is not None:
+            # -- a document directory (e.g. Foo.Bar-HOWTO) is its stem,
+            #    dots and all; a document file has an extension
+            entries = [x for x in entries if x.name in stems or
+                       os.path.splitext(x.name)[0] in stems]
+        return entries
+
+    def mkdoc(entry):
+        possible = sourcedoc_fromentry(entry)
+        if not possible:
+            logger.warning("Skipping non-document %s", entry.name)
+            return None
+        return SourceDocument(possible, **kwargs)
+
+    # -- pool.map() returns results in the order of its input, so the
+    #    documents come back in exactly the order of the serial scan
+    #
+    dirs = sorted(dirs)
+    if scanjobs > 1:
+        with ThreadPoolExecutor(max_workers=scanjobs) as pool:
+            entries = list(itertools.chain(*pool.map(scandir, dirs)))
+            docs = list(pool.map(mkdoc, entries))
+    else:
+        entries = list(itertools.chain(*[scandir(x) for x in dirs]))
+        docs = [mkdoc(x) for x in entries]
+    docs = [x for x in docs if x is not None]
+
+    for candy in docs:
+        if candy.stem in found:
+            dup = found[candy.stem].filename
+            logger.warning("Ignoring duplicate is %s", candy.filename)
+            logger.warning("Existing dup-entry is %s", dup)
+        else:
+            found[candy.stem] = candy
     logger.debug("Discovered %s source documents", len(found))
     return found
 
 
 def arg_issourcedoc(filename):
     filename = os.path.abspath(filename)
-    if os.path.isfile(filename):
+    try:
+        mode = os.stat(filename).st_mode
+    except OSError:
+        return None
+    if stat.S_ISREG(mode):
         if os.path.basename(filename) in IGNORABLE_SOURCE:
             return None
         return filename
-    elif os.path.isdir(filename):
+    elif stat.S_ISDIR(mode):
         return sourcedoc_fromdir(filename)
     return None
 
 
+def sourcedoc_fromentry(entry):
+    '''like arg_issourcedoc, but for an os.DirEntry from a directory scan
+
+    The file type comes from the directory listing, so (except for
+    symlinks) no stat() is needed to tell a document file from a document
+    directory.
+    '''
+    if entry.is_file():
+        if entry.name in IGNORABLE_SOURCE:
+            return None
+        return os.path.abspath(entry.path)
+    elif entry.is_dir():
+        return sourcedoc_fromdir(os.path.abspath(entry.path))
+    return None
+
+
 def sourcedoc_fromdir(name):
-    candidates = list()
-    if not os.path.isdir(name):
-        return None
+    '''return the main document file in directory name (or None)
+
+    The main document is named after the directory (the stem) plus any of
+    the knownextensions.  Reads the directory once, rather than probing for
+    each possible name.
+    '''
     stem = os.path.basename(name)
-    for ext in knownextensions:
-        possible = os.path.join(name, stem + ext)
-        if os.path.isfile(possible):
-            candidates.append(possible)
+    wanted = set(stem + ext for ext in knownextensions)
+    candidates = list()
+    for entry in listentries(name):
+        if entry.name in wanted and entry.is_file():
+            candidates.append(entry.path)
     if len(candidates) > 1:
         logger.warning("%s multiple document choices in dir %s, bailing....",
                        stem, name)
@@ -124,14 +185,15 @@ class SourceCollection(LDPDocumentCollection):
     The use of the stem as a key works conveniently with the
     OutputCollection which uses the same strategy on OutputDirectory.
     '''
-    def __init__(self, dirnames=None):
+    def __init__(self, dirnames=None, **kwargs):
         '''construct a SourceCollection
 
-        delegates most responsibility to function scansourcedirs
+        delegates most responsibility to function scansourcedirs (which
+        also accepts stems, to collect only particular documents)
         '''
         if dirnames is None:
             return
-        self.update(scansourcedirs(dirnames))
+        self.update(scansourcedirs(dirnames, **kwargs))
 
 
 class SourceDocument(object):
@@ -141,11 +203,19 @@ class SourceDocument(object):
         return '<%s:%s (%s)>' % \
                (self.__class__.__name__, self.filename, self.doctype)
 
-    def __init__(self, filename):
+    def __init__(self, filename, hashcache=None, hashjobs=1, hashfunc=md5file):
         '''construct a SourceDocument
 
         filename is a required parameter
 
+        hashcache is an optional tldp.hashcache.HashCache; when supplied, the
+        MD5 of any source file whose stat() information has not changed since
+        the last run is taken from the cache instead of rereading the file.
+
+        hashjobs is the number of files in the document to hash concurrently.
+
+        hashfunc is the function used to hash each file (see md5files).
+
         The filename is the main (and sometimes sole) document representing
         the source of the LDP HOWTO or Guide.  It is the document that is
         passed by name to be handled by any document processing toolchains
@@ -164,20 +234,22 @@ class SourceDocument(object):
         Note that it is not a fatal error if document type cannot be guessed,
         but the document will not be able to be processed.  Second, it is
         useful during the decision-making process to know if any of the source
-        files are newer than the output files. Thus, the stat() information
-        for every file in the source document directory (or just the single
-        source document file) will be collected.
+        files are newer than the output files. Thus, the MD5 hash of every
+        file in the source document directory (or just the single source
+        document file) will be collected, when first needed (see md5sums).
         '''
         self.filename = os.path.abspath(filename)
 
-        if not os.path.exists(self.filename):
+        try:
+            mode = os.stat(self.filename).st_mode
+        except OSError:
             fn = self.filename
             logger.critical("Missing source document: %s", fn)
             raise IOError(errno.ENOENT, os.strerror(errno.ENOENT), fn)
 
-        if os.path.isdir(self.filename):
+        if stat.S_ISDIR(mode):
             self.filename = sourcedoc_fromdir(self.filename)
-        elif os.path.isfile(self.filename):
+        elif stat.S_ISREG(mode):
             pass
         else:
             # -- we did not receive a useable document file or directory name
@@ -192,16 +264,105 @@ class SourceDocument(object):
         self.status = 'source'
         self.output = None
         self.working = None
-        self.differing = set()
+        self.hashcache = hashcache
+        self.hashjobs = hashjobs
+        self.hashfunc = hashfunc
+        self._md5sums = None
+        self._differing = None
+        self._isbroken = None
         self.dirname, self.basename = os.path.split(self.filename)
         self.stem, self.ext = stem_and_ext(self.basename)
-        parentbase = os.path.basename(self.dirname)
         logger.debug("%s found source %s", self.stem, self.filename)
-        if parentbase == self.stem:
-            parentdir = os.path.dirname(self.dirname)
-            self.md5sums = md5files(self.dirname, relative=parentdir)
-        else:
-            self.md5sums = md5files(self.filename, relative=self.dirname)
+
+    @property
+    def scope(self):
+        '''(name, relative) of the file or directory making up the document
+
+        A document in a directory of its own (named for the stem) is the
+        whole directory; otherwise, it is just the file.  The names in
+        md5sums are relative to relative.
+        '''
+        if os.path.basename(self.dirname) == self.stem:
+            return self.dirname, os.path.dirname(self.dirname)
+        return self.filename, self.dirname
+
+    @property
+    def md5sums(self):
+        '''MD5 hashes of all files in the document (computed on first use)'''
+        if self._md5sums is None:
+            name, relative = self.scope
+            self._md5sums = md5files(name, relative=relative,
+                                     cache=self.hashcache, jobs=self.hashjobs,
+                                     hashfunc=self.hashfunc)
+        return self._md5sums
+
+    @property
+    def files(self):
+        '''sorted absolute names of all files in the document'''
+        relative = self.scope[1]
+        return sorted(os.path.join(relative, x) for x in self.md5sums)
+
+    @property
+    def status(self):
+        '''the status of the document
+
+        The Inventory sets the status of a document with a matching output
+        directory to None, which means that the document is classified
+        (published, broken or stale) on first access.  Only this document's
+        output files and MD5 hashes are examined.
+        '''
+        if self._status is None:
+            status = 'published'
+            if self.isbroken:
+                status = 'broken'
+            if self.differing:
+                status = 'stale'
+            self._status = status
+        return self._status
+
+    @status.setter
+    def status(self, value):
+        self._status = value
+
+    @property
+    def isbroken(self):
+        '''True if the output directory is missing an expected output'''
+        if self._isbroken is None:
+            self._isbroken = bool(self.output) and not self.output.iscomplete
+        return self._isbroken
+
+    @property
+    def differing(self):
+        '''set of (why, filename) for source files not matching the output'''
+        if self._differing is None:
+            self._differing = set()
+            if self.output:
+                self._differing = self.md5differences()
+        return self._differing
+
+    @differing.setter
+    def differing(self, value):
+        self._differing = value
+
+    def md5differences(self):
+        '''compare the source MD5 hashes with those recorded in the output'''
+        changed = set()
+        stem = self.stem
+        omd5, smd5 = self.output.md5sums, self.md5sums
+        if omd5 == smd5:
+            return changed
+        logger.debug("%s differing MD5 sets %r %r", stem, smd5, omd5)
+        for gone in set(omd5.keys()).difference(smd5.keys()):
+            logger.debug("%s gone %s", stem, gone)
+            changed.add(('gone', gone))
+        for new in set(smd5.keys()).difference(omd5.keys()):
+            changed.add(('new', new))
+        for sfn in set(smd5.keys()).intersection(omd5.keys()):
+            if smd5[sfn] != omd5[sfn]:
+                changed.add(('changed', sfn))
+        for why, sfn in changed:
+            logger.debug("%s differing source %s (%s)", stem, sfn, why)
+        return changed
 
     def detail(self, widths, verbose, file=sys.stdout):
         '''produce a small tabular output about the document'''
@@ -0,0 +1,162 @@
+#! /usr/bin/python
+# -*- coding: utf8 -*-
+#
+# Copyright (c) 2016 Linux Documentation Project
+
+from __future__ import absolute_import, division, print_function
+from __future__ import unicode_literals
+
+import os
+import json
+import time
+import errno
+import codecs
+import logging
+import threading
+
+from tldp.utils import which, isexecutable, writejson
+
+logger = logging.getLogger(__name__)
+
+
+def pathsignature(path=None):
+    '''return $PATH and the mtime of each of its directories
+
+    Installing or removing a program changes the mtime of its directory, so
+    any change to the signature means that which() could give a different
+    answer for any program.
+    '''
+    if path is None:
+        path = os.environ.get('PATH', '')
+    dirs = list()
+    for dirname in path.split(os.pathsep):
+        dirname = dirname.strip('"')
+        try:
+            dirs.append([dirname, os.stat(dirname).st_mtime_ns])
+        except OSError:
+            dirs.append([dirname, None])
+    return dict(path=path, dirs=dirs)
+
+
+class ToolCache(object):
+    '''a persistent cache of the results of which() for the doctype tools
+
+    Each doctype looks up all of its tools on $PATH, which means a stat() of
+    every directory in $PATH for each tool not found early.  The ToolCache
+    remembers the answer (including "not found") along with the signature of
+    $PATH (see pathsignature()).  If the mtime of any directory in $PATH has
+    changed, all answers for that $PATH are forgotten.  A remembered tool
+    which is no longer executable is looked up again.
+
+    The answers are kept separately for each $PATH (up to maxpaths of them,
+    the least recently used are dropped), so that runs with different
+    environments (e.g. cron and an interactive shell) do not throw away each
+    other's answers.  Like the HashCache, the cache file is a small JSON
+    document which is replaced atomically and ignored if it is corrupt.
+    '''
+    version = 2
+    maxpaths = 8
+
+    def __repr__(self):
+        return '<%s:%s (%d entries)>' % (self.__class__.__name__,
+                                         self.filename, len(self.entries))
+
+    def __init__(self, filename):
+        self.filename = os.path.abspath(filename)
+        self.signature = pathsignature()
+        self.entries = dict()
+        self.dirty = False
+        self.lock = threading.Lock()
+        self.load()
+
+    def read(self):
+        '''return the answers for each $PATH in the cache file (a dict)'''
+        try:
+            with codecs.open(self.filename, encoding='utf-8') as f:
+                data = json.load(f)
+        except IOError as e:
+            if e.errno != errno.ENOENT:
+                logger.warning("Could not read tool cache %s: %s",
+                               self.filename, e)
+            return dict()
+        except ValueError as e:
+            logger.warning("Ignoring corrupt tool cache %s: %s",
+                           self.filename, e)
+            return dict()
+        if not isinstance(data, dict) or data.get('version') != self.version:
+            logger.warning("Ignoring tool cache %s with unknown version.",
+                           self.filename)
+            return dict()
+        paths = data.get('paths', dict())
+        if not isinstance(paths, dict):
+            logger.warning("Ignoring corrupt tool cache %s.", self.filename)
+            return dict()
+        return dict((k, v) for k, v in paths.items()
+                    if isinstance(v, dict) and
+                    isinstance(v.get('entries'), dict))
+
+    def load(self):
+        '''read the answers for this $PATH; tolerate any sort of corruption'''
+        saved = self.read().get(self.signature['path'])
+        if saved is None:
+            return
+        if saved.get('dirs') != self.signature['dirs']:
+            logger.debug("PATH changed since %s was written, forgetting it.",
+                         self.filename)
+            self.dirty = True
+            return
+        self.entries.update(saved['entries'])
+
+    def save(self):
+        '''atomically write the cache file, if anything changed
+
+        The answers for every other $PATH are read again, so that those
+        saved by another process in the meantime are kept.  A cache file
+        which cannot be written is only worth a warning; returns False.
+        '''
+        if not self.dirty:
+            return True
+        with self.lock:
+            saved = dict(dirs=self.signature['dirs'],
+                         entries=dict(self.entries), used=time.time())
+            self.dirty = False
+        paths = self.read()
+        paths[self.signature['path']] = saved
+        recent = sorted(paths, key=lambda x: paths[x].get('used', 0),
+                        reverse=True)
+        for path in recent[self.maxpaths:]:
+            del paths[path]
+        data = dict(version=self.version, paths=paths)
+        dirname = os.path.dirname(self.filename)
+        try:
+            if not os.path.isdir(dirname):
+                os.makedirs(dirname)
+            writejson(self.filename, data)
+        except (IOError, OSError) as e:
+            logger.warning("Could not write tool cache %s: %s",
+                           self.filename, e)
+            return False
+        logger.debug("Saved %d entries to tool cache %s.",
+                     len(saved['entries']), self.filename)
+        return True
+
+    def invalidate(self):
+        '''forget everything'''
+        with self.lock:
+            self.entries.clear()
+            self.dirty = True
+
+    def which(self, program):
+        '''return None or the full path to program (see tldp.utils.which)'''
+        if program in self.entries:
+            found = self.entries[program]
+            if found is None or isexecutable(found):
+                return found
+        found = which(program)
+        with self.lock:
+            self.entries[program] = found
+            self.dirty = True
+        return found
+
+#
+# -- end of file
@@ -7,7 +7,6 @@ from __future__ import absolute_import, division, print_function
 
 import os
 import codecs
-import inspect
 import logging
 
 import tldp.doctypes
@@ -18,19 +17,25 @@ logger = logging.getLogger(__name__)
 def getDoctypeMembers(membertype):
     '''returns a list of tldp.doctypes; convenience function'''
     found = list()
-    for name, member in inspect.getmembers(tldp.doctypes, membertype):
+    for name, member in sorted(vars(tldp.doctypes).items()):
+        if not membertype(member):
+            continue
         logger.debug("Located %s %s (%r).", membertype.__name__, name, member)
         found.append(member)
     return found
 
 
+def isclass(member):
+    return isinstance(member, type)
+
+
 def getDoctypeClasses():
     '''returns a list of the classes known in tldp.doctypes
 
     This is the canonical list of doctypes which are recognized and capable of
     being processed into outputs.  See tldp.doctypes for more information.
     '''
-    return getDoctypeMembers(inspect.isclass)
+    return getDoctypeMembers(isclass)
 
 
 def guess(fname):
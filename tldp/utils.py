@@ -7,14 +7,20 @@ from __future__ import absolute_import, division, print_function
 from __future__ import unicode_literals
 
 import os
+import json
+import mmap
+import stat
 import time
 import errno
 import codecs
+import shutil
 import hashlib
+import operator
 import subprocess
 import functools
 from functools import wraps
 from tempfile import mkstemp, mkdtemp
+from concurrent.futures import ThreadPoolExecutor
 import logging
 logger = logging.getLogger(__name__)
 
@@ -25,6 +31,31 @@ opj = os.path.join
 
 logdir = 'tldp-document-build-logs'
 
+# -- md5file() reads in chunks of this many bytes, so that memory use stays
+#    flat, no matter how large the file
+#
+MD5_BUFSIZE = 64 * 1024
+
+
+def currentumask():
+    '''return the umask of the process (read by setting it, then back)'''
+    mask = os.umask(0o022)
+    os.umask(mask)
+    return mask
+
+# -- the umask, read once at import, before there are any other threads which
+#    could create files in the moment the umask is changed by currentumask()
+#
+UMASK = currentumask()
+
+
+def cachedir():
+    '''return the name of the per-user ldptool cache directory (XDG)'''
+    base = os.environ.get('XDG_CACHE_HOME')
+    if not base:
+        base = os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'ldptool')
+
 
 def logtimings(logmethod):
     def anon(f):
@@ -40,6 +71,12 @@ def logtimings(logmethod):
     return anon
 
 
+def cputime():
+    '''return CPU seconds used by this process and its waited-for children'''
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
 def firstfoundfile(locations):
     '''return the first existing file from a list of filenames (or None)'''
     for option in locations:
@@ -116,20 +153,30 @@ def swapdirs(a, b):
 def logfilecontents(logmethod, prefix, fname):
     '''log all lines of a file with a prefix '''
     with codecs.open(fname, encoding='utf-8') as f:
-        for line in f:
-            logmethod("%s: %s", prefix, line.rstrip())
+        logtextcontents(logmethod, prefix, f)
+
+
+def logtextcontents(logmethod, prefix, lines):
+    '''log all lines (of a file or text) with a prefix '''
+    for line in lines:
+        logmethod("%s: %s", prefix, line.rstrip())
 
 
-def conditionallogging(result, prefix, fname):
+def conditionallogging(result, prefix, fname=None, text=None):
+    if text is not None:
+        lines = text.splitlines()
+        logcontents = functools.partial(logtextcontents, lines=lines)
+    else:
+        logcontents = functools.partial(logfilecontents, fname=fname)
     if logger.isEnabledFor(logging.DEBUG):
-        logfilecontents(logger.debug, prefix, fname)  # -- always
+        logcontents(logger.debug, prefix)  # -- always
     elif logger.isEnabledFor(logging.INFO):
         if result != 0:
-            logfilecontents(logger.info, prefix, fname)  # -- error
+            logcontents(logger.info, prefix)  # -- error
 
 
 def execute(cmd, stdin=None, stdout=None, stderr=None,
-            logdir=None, env=os.environ):
+            logdir=None, env=os.environ, cwd=None, capture=False):
     '''(yet another) wrapper around subprocess.Popen()
 
     The processing tools for handling DocBook SGML, DocBook XML and Linuxdoc
@@ -157,6 +204,11 @@ def execute(cmd, stdin=None, stdout=None, stderr=None,
       - stderr: if not supplied, STDERR (FD 2) will be connected
         to a named file in the logdir (and left for later inspection)
       - env: if not supplied, just use current environment
+      - cwd: if supplied, the working directory for the process; the
+        working directory of the calling process is never changed
+      - capture: if True, an unsupplied STDOUT or STDERR is collected in
+        memory instead; it is only written to a file in the logdir if the
+        process fails
 
     Returns: the numeric exit code of the process
 
@@ -187,21 +239,23 @@ def execute(cmd, stdin=None, stdout=None, stderr=None,
 
     # -- not remapping STDIN, because that doesn't make sense here
     mytfile = functools.partial(mkstemp, prefix=prefix, dir=logdir)
-    if stdout is None:
+    stdoutname = stderrname = None
+    if stdout is None and capture:
+        stdout = subprocess.PIPE
+    elif stdout is None:
         stdout, stdoutname = mytfile(suffix='.stdout')
-    else:
-        stdoutname = None
 
-    if stderr is None:
+    if stderr is None and capture:
+        stderr = subprocess.PIPE
+    elif stderr is None:
         stderr, stderrname = mytfile(suffix='.stderr')
-    else:
-        stderrname = None
 
     logger.debug("About to execute: %r", cmd)
     proc = subprocess.Popen(cmd, shell=False, close_fds=True,
                             stdin=stdin, stdout=stdout, stderr=stderr,
-                            env=env, preexec_fn=os.setsid)
-    result = proc.wait()
+                            env=env, cwd=cwd, start_new_session=True)
+    captured = proc.communicate()
+    result = proc.returncode
     if result != 0:
         logger.error("Non-zero exit (%s) for process: %r", result, cmd)
         logger.error("Find STDOUT/STDERR in %s/%s*", logdir, prefix)
@@ -211,6 +265,16 @@ def execute(cmd, stdin=None, stdout=None, stderr=None,
     if isinstance(stderr, int) and stderrname:
         os.close(stderr)
         conditionallogging(result, 'STDERR', stderrname)
+    for data, suffix, name in zip(captured, ('.stdout', '.stderr'),
+                                  ('STDOUT', 'STDERR')):
+        if data is None:
+            continue
+        text = data.decode('utf-8', 'replace')
+        if result != 0:
+            fd, _ = mytfile(suffix=suffix)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+        conditionallogging(result, name, text=text)
     return result
 
 
@@ -250,6 +314,42 @@ http://stackoverflow.com/questions/377017/test-if-executable-exists-in-python/37
     return None
 
 
+class LazyDefault(object):
+    '''an option default which is only computed when it is first needed
+
+    The doctypes register defaults for all of their tools and stylesheets,
+    which means searching $PATH and the filesystem.  A LazyDefault defers
+    this until resolvedefaults() is called for a doctype which is actually
+    going to build something; --version, --doctypes, --summary and the like
+    never pay for it.  The str() of a LazyDefault is its value (for --help).
+    '''
+
+    def __repr__(self):
+        return '<%s:%s%r>' % (self.__class__.__name__, self.func.__name__,
+                              self.args)
+
+    def __str__(self):
+        return str(self.resolve())
+
+    def __init__(self, func, *args):
+        self.func = func
+        self.args = args
+
+    def resolve(self, toolcache=None):
+        '''return the value; which() is answered by toolcache, if given'''
+        if toolcache is not None and self.func is which:
+            return toolcache.which(*self.args)
+        return self.func(*self.args)
+
+
+def resolvedefaults(config, names, toolcache=None):
+    '''replace any LazyDefault among the attributes names of config'''
+    for name in names:
+        value = getattr(config, name, None)
+        if isinstance(value, LazyDefault):
+            setattr(config, name, value.resolve(toolcache))
+
+
 def writemd5sums(fname, md5s, header=None):
     '''write an MD5SUM file from [(filename, MD5), ...]'''
     with codecs.open(fname, 'w', encoding='utf-8') as file:
@@ -259,11 +359,56 @@ def writemd5sums(fname, md5s, header=None):
             print(hashval + '  ' + fname, file=file)
 
 
-def md5file(name):
-    '''return MD5 hash for a single file name'''
+def writejson(fname, data):
+    '''atomically replace fname with a JSON dump of data'''
+    writetext(fname, json.dumps(data, separators=(',', ':')))
+
+
+def writetext(fname, text):
+    '''atomically replace fname with text
+
+    The file gets the mode of any newly created file (0666, less the umask),
+    rather than the private mode of the temporary file.
+    '''
+    dirname = os.path.dirname(os.path.abspath(fname))
+    prefix = '.' + os.path.basename(fname) + '-'
+    fd, tname = mkstemp(prefix=prefix, dir=dirname)
+    try:
+        os.fchmod(fd, 0o666 & ~UMASK)
+        with codecs.open(tname, 'w', encoding='utf-8') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.rename(tname, fname)
+    except Exception:
+        os.unlink(tname)
+        raise
+    finally:
+        os.close(fd)
+
+
+def md5file(name, bufsize=MD5_BUFSIZE, mmapsize=None):
+    '''return MD5 hash for a single file name
+
+    The file is read and hashed in chunks of bufsize bytes.  If mmapsize is
+    set and the file is at least that large, the file is mmap()ed instead of
+    read, and each bufsize window is released again once it is hashed.
+    Either way, memory use is constant, regardless of the size of the file.
+    '''
+    h = hashlib.md5()
     with open(name, 'rb') as f:
-        bs = f.read()
-    md5 = hashlib.md5(bs).hexdigest()
+        size = os.fstat(f.fileno()).st_size
+        if mmapsize and size and size >= mmapsize:
+            md5mmap(h, f, size, bufsize)
+        else:
+            buf = bytearray(bufsize)
+            view = memoryview(buf)
+            while True:
+                n = f.readinto(buf)
+                if not n:
+                    break
+                h.update(view[:n])
+    md5 = h.hexdigest()
     try:
         md5 = unicode(md5)
     except NameError:
@@ -271,6 +416,25 @@ def md5file(name):
     return md5
 
 
+def md5mmap(h, f, size, bufsize):
+    '''update hash h with the content of open file f (size bytes) via mmap'''
+    window = max(bufsize, mmap.PAGESIZE)
+    window = window - (window % mmap.PAGESIZE)
+    mm = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+    try:
+        view = memoryview(mm)
+        try:
+            for offset in range(0, size, window):
+                h.update(view[offset:offset + window])
+                if hasattr(mm, 'madvise'):
+                    length = min(window, size - offset)
+                    mm.madvise(mmap.MADV_DONTNEED, offset, length)
+        finally:
+            view.release()
+    finally:
+        mm.close()
+
+
 def statfile(name):
     '''return posix.stat_result (or None) for a single file name'''
     try:
@@ -282,9 +446,75 @@ def statfile(name):
     return st
 
 
-def md5files(name, relative=None):
-    '''get all of the MD5s for files from here downtree'''
-    return fileinfo(name, relative=relative, func=md5file)
+def md5files(name, relative=None, cache=None, jobs=1, hashfunc=md5file):
+    '''get all of the MD5s for files from here downtree
+
+    If a tldp.hashcache.HashCache is supplied as cache, consult it first, so
+    that only files with changed stat() information are read and hashed.
+
+    If jobs is greater than 1, hash up to that many files concurrently.
+
+    The hashfunc is called to hash each file; it defaults to md5file, but
+    could be, e.g. md5file with a different bufsize or mmapsize.
+    '''
+    func = hashfunc
+    if cache is not None:
+        cache.scanning(name)
+        func = functools.partial(cache.md5file, hashfunc=hashfunc)
+    return fileinfo(name, relative=relative, func=func, jobs=jobs)
+
+
+def listentries(name, key=None):
+    '''return a sorted list of os.DirEntry objects in directory name
+
+    The DirEntry objects carry the file type (from the directory listing
+    itself), so callers can use is_dir() and is_file() without another
+    stat() of each entry.  Returns an empty list if name does not exist or
+    is not a directory.  Entries are sorted by key (default: name).
+    '''
+    if key is None:
+        key = operator.attrgetter('name')
+    try:
+        with os.scandir(name) as it:
+            entries = list(it)
+    except OSError as e:
+        if e.errno not in (errno.ENOENT, errno.ENOTDIR):
+            raise
+        return list()
+    return sorted(entries, key=key)
+
+
+def walkfiles(name):
+    '''yield an os.DirEntry for every non-directory from here downtree
+
+    Like os.walk(), symlinks to directories are neither followed nor
+    returned.  Only symlinks need a stat() to determine their type.
+    '''
+    for entry in listentries(name):
+        if entry.is_dir(follow_symlinks=False):
+            for found in walkfiles(entry.path):
+                yield found
+        elif not entry.is_dir():
+            yield entry
+
+
+def linkorcopy(src, dst):
+    '''hardlink src to dst (replacing dst); copy, if a link is impossible
+
+    A symlink is reproduced as a symlink (to the same target).  Returns
+    False if the file had to be copied.
+    '''
+    if os.path.lexists(dst):
+        os.unlink(dst)
+    if os.path.islink(src):
+        os.symlink(os.readlink(src), dst)
+        return True
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+        return False
+    return True
 
 
 def statfiles(name, relative=None):
@@ -299,7 +529,7 @@ def statfiles(name, relative=None):
     return fileinfo(name, relative=relative, func=statfile)
 
 
-def fileinfo(name, relative=None, func=statfile):
+def fileinfo(name, relative=None, func=statfile, jobs=1):
     '''return a dict() with keys being filenames and posix.stat_result values
 
     Required:
@@ -307,7 +537,7 @@ def fileinfo(name, relative=None, func=statfile):
       name: the name should be an existing file, but accessing filesystems
             can be a racy proposition, so if the name is ENOENT, returns an
             empty dict()
-            if name is a directory, os.walk() over the entire subtree and
+            if name is a directory, walkfiles() over the entire subtree and
             record and return all stat() results
 
     Optional:
@@ -315,6 +545,10 @@ def fileinfo(name, relative=None, func=statfile):
       relative: if the filenames in the keys should be relative some other
                 directory, then supply that path here (see examples)
 
+      jobs: if greater than 1, call func on up to this many files
+            concurrently (in threads); hashlib releases the GIL, so this
+            helps when func is md5file; the result is identical
+
 
     Bugs:
       Dealing with filesystems is always potentially a racy affair.  They go
@@ -324,9 +558,13 @@ def fileinfo(name, relative=None, func=statfile):
       posix.stat_result.
     '''
     info = dict()
-    if not os.path.exists(name):
+    try:
+        st = os.stat(name)
+    except OSError as e:
+        if e.errno not in (errno.ENOENT, errno.ENOTDIR):
+            raise
         return info
-    if not os.path.isdir(name):
+    if not stat.S_ISDIR(st.st_mode):
         if relative:
             relpath = os.path.relpath(name, start=relative)
         else:
@@ -335,21 +573,22 @@ def fileinfo(name, relative=None, func=statfile):
         if info[relpath] is None:
             del info[relpath]
     else:
-        for root, dirs, files in os.walk(name):
-            inodes = list()
-            inodes.extend(dirs)
-            inodes.extend(files)
-            for x in inodes:
-                foundpath = os.path.join(root, x)
-                if os.path.isdir(foundpath):
-                    continue
-                if relative:
-                    relpath = os.path.relpath(foundpath, start=relative)
-                else:
-                    relpath = foundpath
-                info[relpath] = func(foundpath)
-                if info[relpath] is None:
-                    del info[relpath]
+        found = list()
+        for entry in walkfiles(name):
+            if relative:
+                relpath = os.path.relpath(entry.path, start=relative)
+            else:
+                relpath = entry.path
+            found.append((relpath, entry.path))
+        paths = [foundpath for _, foundpath in found]
+        if jobs > 1 and len(paths) > 1:
+            with ThreadPoolExecutor(max_workers=jobs) as pool:
+                results = list(pool.map(func, paths))
+        else:
+            results = [func(foundpath) for foundpath in paths]
+        for (relpath, _), result in zip(found, results):
+            if result is not None:
+                info[relpath] = result
     return info
 
 #
@@ -0,0 +1,147 @@
+#! /usr/bin/python
+# -*- coding: utf8 -*-
+#
+# Copyright (c) 2016 Linux Documentation Project
+
+from __future__ import absolute_import, division, print_function
+from __future__ import unicode_literals
+
+import os
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+XSLTPROC = 'xsltproc'
+LXML = 'lxml'
+ENGINES = (XSLTPROC, LXML)
+
+# -- lxml is optional, and only imported when first needed (see available())
+#
+etree = None
+importerror = None
+
+
+def available():
+    '''True if the in-process (lxml) XSLT engine can be used'''
+    global etree, importerror
+    if etree is None and importerror is None:
+        try:
+            from lxml import etree
+        except ImportError as e:
+            importerror = e
+    return etree is not None
+
+
+def parser(nonet):
+    '''return an XMLParser with the parse options used by xsltproc
+
+    xsltproc loads the DTD, applies default attributes, substitutes
+    entities and merges CDATA sections into text (XSLT_PARSE_OPTIONS).
+    '''
+    return etree.XMLParser(load_dtd=True, attribute_defaults=True,
+                           resolve_entities=True, strip_cdata=True,
+                           no_network=nonet)
+
+
+class Reusable(object):
+    '''compiled stylesheets or parsed documents, kept for the whole process
+
+    An lxml stylesheet or document must not be used by two threads at once,
+    but it may well be used by one thread after another.  So every thread of
+    the process (e.g. of --step-jobs, which starts new threads for every
+    document) checks out an idle object, if there is one, and returns it
+    when done; only a thread which finds none idle makes another.  With
+    latest, only the objects of the most recently used key are kept.
+    '''
+
+    def __init__(self, latest=False):
+        self.lock = threading.Lock()
+        self.idle = dict()
+        self.latest = latest
+
+    def clear(self):
+        with self.lock:
+            self.idle.clear()
+
+    @contextmanager
+    def checkout(self, key, factory):
+        with self.lock:
+            idle = self.idle.get(key)
+            obj = idle.pop() if idle else None
+        if obj is None:
+            obj = factory()
+        try:
+            yield obj
+        finally:
+            with self.lock:
+                if self.latest:
+                    for other in [x for x in self.idle if x != key]:
+                        del self.idle[other]
+                self.idle.setdefault(key, list()).append(obj)
+
+
+stylesheets = Reusable()
+sources = Reusable(latest=True)
+
+
+def stylesheet(fname, nonet=False):
+    '''check out the compiled XSLT for fname; compiled once per process
+    (unless used by several threads at the same time)'''
+    def make():
+        logger.debug("Compiling stylesheet %s.", fname)
+        access = etree.XSLTAccessControl(read_network=not nonet)
+        doc = etree.parse(fname, parser(nonet))
+        return etree.XSLT(doc, access_control=access)
+    return stylesheets.checkout((fname, nonet), make)
+
+
+def sourcedocument(fname, nonet=False):
+    '''check out the parsed source document fname
+
+    Only the most recent source document is kept; it is parsed again if the
+    file has changed since.  The steps of a document differ in nonet (e.g.
+    the HTML steps always use --nonet, the FO step only with --nonet), but
+    share the one parse:  whichever step parses first decides whether the
+    parser may use the network.
+    '''
+    def make():
+        logger.debug("Parsing source document %s.", fname)
+        return etree.parse(fname, parser(nonet))
+    st = os.stat(fname)
+    key = (fname, st.st_ino, st.st_size, st.st_mtime_ns)
+    return sources.checkout(key, make)
+
+
+def transform(xsl, source, params, output=None, nonet=False):
+    '''apply the stylesheet xsl to source; write the result to output
+
+    The params are (name, value) string parameters (cf. xsltproc
+    --stringparam).  Documents written by the stylesheet itself (e.g. the
+    chunks of chunk.xsl) are relative to the current working directory,
+    unless the stylesheet is given an absolute base.dir.  The result
+    is serialized according to xsl:output, just as xsltproc does (in UTF-8,
+    if xsl:output names no encoding, as in the DocBook FO stylesheets).
+
+    Returns True on success; any error is logged.
+    '''
+    try:
+        with stylesheet(xsl, nonet=nonet) as style, \
+                sourcedocument(source, nonet=nonet) as doc:
+            params = dict((k, etree.XSLT.strparam(v)) for k, v in params)
+            result = style(doc, **params)
+            for entry in style.error_log:
+                logger.debug("XSLT: %s", entry)
+            if output is not None:
+                with open(output, 'wb') as f:
+                    f.write(bytes(result))
+    except (etree.XMLSyntaxError, etree.XSLTError, IOError, OSError) as e:
+        logger.error("XSLT %s failed on %s: %s", xsl, source, e)
+        for entry in getattr(e, 'error_log', ()):
+            logger.info("XSLT: %s", entry)
+        return False
+    return True
+
+#
+# -- end of file